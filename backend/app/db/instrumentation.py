@@ -0,0 +1,196 @@
+"""
+SQL Query Instrumentation
+Per-statement latency histograms, row counts, originating route and a
+structured slow-query log, collected from SQLAlchemy engine events
+"""
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional
+import bisect
+import json
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SQL_INSTRUMENTATION_ENABLED = os.getenv("SQL_INSTRUMENTATION", "true").lower() == "true"
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 200))
+MAX_TRACKED_STATEMENTS = int(os.getenv("SQL_METRICS_MAX_STATEMENTS", 500))
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_current_scope: ContextVar[Optional[dict]] = ContextVar("sql_request_scope", default=None)
+
+_PARAMS = re.compile(r"%\(\w+\)s|\?")
+_PARAM_LISTS = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_statement(statement: str) -> str:
+    """Collapse a statement to a fingerprint shared by all executions of the same query"""
+    normalized = _PARAMS.sub("?", statement)
+    normalized = _PARAM_LISTS.sub("(?, ...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()[:1000]
+
+class LatencyStats:
+    """Running latency histogram and row totals for one statement or route"""
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.routes: Dict[str, int] = {}
+
+    def record(self, elapsed_ms: float, rows: int, route: Optional[str]):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        if route:
+            self.routes[route] = self.routes.get(route, 0) + 1
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Approximate percentile (bucket upper bound) in milliseconds"""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 2),
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "rows": self.rows,
+            "histogram": {
+                label: count
+                for label, count in zip(
+                    [f"le_{bound}ms" for bound in LATENCY_BUCKETS_MS] + ["gt_{}ms".format(LATENCY_BUCKETS_MS[-1])],
+                    self.buckets
+                )
+            },
+        }
+
+class SQLMetrics:
+    """Thread-safe registry of per-statement and per-route query statistics"""
+    def __init__(self, max_statements: int = MAX_TRACKED_STATEMENTS):
+        self.max_statements = max_statements
+        self.statements: Dict[str, LatencyStats] = {}
+        self.routes: Dict[str, LatencyStats] = {}
+        self.slow_queries = 0
+        self.started_at = datetime.utcnow()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed_ms: float, rows: int, route: Optional[str]):
+        fingerprint = normalize_statement(statement)
+        with self._lock:
+            stats = self.statements.get(fingerprint)
+            if stats is None:
+                if len(self.statements) >= self.max_statements:
+                    fingerprint = "<other>"
+                stats = self.statements.setdefault(fingerprint, LatencyStats())
+            stats.record(elapsed_ms, rows, route)
+
+            route_key = route or "<background>"
+            self.routes.setdefault(route_key, LatencyStats()).record(elapsed_ms, rows, None)
+
+            if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+                self.slow_queries += 1
+
+    def snapshot(self, limit: int = 20) -> dict:
+        with self._lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1].total_ms, reverse=True)
+            return {
+                "since": self.started_at.isoformat(),
+                "slow_query_threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+                "slow_queries": self.slow_queries,
+                "total_queries": sum(stats.count for stats in self.statements.values()),
+                "statements": [
+                    {"statement": statement, **stats.to_dict(), "routes": dict(stats.routes)}
+                    for statement, stats in statements[:limit]
+                ],
+                "routes": {route: stats.to_dict() for route, stats in self.routes.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.routes.clear()
+            self.slow_queries = 0
+            self.started_at = datetime.utcnow()
+
+sql_metrics = SQLMetrics()
+
+def current_route() -> Optional[str]:
+    """Route template ("GET /api/teacher/class/{teacher_id}/stats") of the request issuing a query"""
+    scope = _current_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    path = route.path if route is not None else scope.get("path", "")
+    return f"{scope.get('method', '')} {path}".strip()
+
+def bind_request_scope(scope: dict):
+    """Attribute queries issued from the current context to this request"""
+    return _current_scope.set(scope)
+
+def unbind_request_scope(token):
+    _current_scope.reset(token)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times = conn.info.get("query_start_time")
+    if not start_times:
+        return
+    elapsed_ms = (time.perf_counter() - start_times.pop()) * 1000
+    rows = cursor.rowcount if cursor.rowcount is not None else -1
+    route = current_route()
+
+    sql_metrics.record(statement, elapsed_ms, rows, route)
+
+    if elapsed_ms >= SLOW_QUERY_THRESHOLD_MS:
+        print(json.dumps({
+            "event": "slow_query",
+            "timestamp": datetime.utcnow().isoformat(),
+            "duration_ms": round(elapsed_ms, 2),
+            "rows": rows,
+            "route": route,
+            "statement": normalize_statement(statement),
+        }))
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_start_time"):
+        connection.info["query_start_time"].pop()
+
+def install_instrumentation(engine: Engine):
+    """Attach the timing listeners to an engine"""
+    if not SQL_INSTRUMENTATION_ENABLED:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def get_sql_metrics(limit: int = 20) -> dict:
+    """Aggregated query statistics, slowest statements (by total time) first"""
+    return sql_metrics.snapshot(limit)
+
+def reset_sql_metrics():
+    sql_metrics.reset()
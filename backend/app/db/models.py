@@ -3,7 +3,7 @@ Database models for PhonicsLearn
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, String, Integer, DateTime, Boolean, Float, ForeignKey, JSON, Text
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Float, ForeignKey, JSON, Text, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -23,13 +23,14 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    # Relationships
-    licenses = relationship("License", back_populates="user")
-    students = relationship("Student", back_populates="user")
-    payments = relationship("Payment", back_populates="user")
+    # Relationships (never lazy-loaded: use selectinload/joinedload explicitly,
+    # so serializing a list of users can't fan out into N+1 queries)
+    licenses = relationship("License", back_populates="user", lazy="raise_on_sql")
+    students = relationship("Student", back_populates="user", lazy="raise_on_sql")
+    payments = relationship("Payment", back_populates="user", lazy="raise_on_sql")
     # Teacher-Student relationship
-    enrolled_students = relationship("User", back_populates="teacher", foreign_keys="User.teacher_id")
-    teacher = relationship("User", back_populates="enrolled_students", foreign_keys=[teacher_id], remote_side=[id])
+    enrolled_students = relationship("User", back_populates="teacher", foreign_keys="User.teacher_id", lazy="raise_on_sql")
+    teacher = relationship("User", back_populates="enrolled_students", foreign_keys=[teacher_id], remote_side=[id], lazy="raise_on_sql")
 
 class License(Base):
     __tablename__ = "licenses"
@@ -38,8 +39,9 @@ class License(Base):
     license_key = Column(String, unique=True, index=True, nullable=False)
     license_type = Column(String, nullable=False)  # free_trial, parent, teacher, school
     user_id = Column(Integer, ForeignKey("users.id"))
+    user_email = Column(String, index=True)
     start_date = Column(DateTime, nullable=False)
-    end_date = Column(DateTime, nullable=False)
+    end_date = Column(DateTime, nullable=False, index=True)  # expiry sweeps are range scans
     is_active = Column(Boolean, default=True)
     max_students = Column(Integer, default=3)
     max_lessons = Column(Integer, default=10)
@@ -52,6 +54,15 @@ class License(Base):
     user = relationship("User", back_populates="licenses")
     usage_logs = relationship("UsageLog", back_populates="license")
 
+class LicenseRevocation(Base):
+    __tablename__ = "license_revocations"
+    
+    # The id doubles as the revocation list version clients sync from
+    id = Column(Integer, primary_key=True, index=True)
+    license_key = Column(String, index=True, nullable=False)
+    reason = Column(String, nullable=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
 class Student(Base):
     __tablename__ = "students"
     
@@ -84,29 +95,39 @@ class StudentProgress(Base):
     # Relationships
     student = relationship("Student", back_populates="progress")
 
+# activity_logs and usage_logs are range-partitioned by month on created_at
+# (see app/db/partitions.py), so created_at is part of the primary key.
 class ActivityLog(Base):
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        Index("ix_activity_logs_student_created", "student_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     student_id = Column(Integer, ForeignKey("students.id"))
     lesson_id = Column(String, nullable=False)
     activity_type = Column(String)  # lesson_start, lesson_complete, quiz, recording
     score = Column(Float, nullable=True)
     duration_seconds = Column(Integer, nullable=True)
     extra_data = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Relationships
     student = relationship("Student", back_populates="activity_logs")
 
 class UsageLog(Base):
     __tablename__ = "usage_logs"
+    __table_args__ = (
+        Index("ix_usage_logs_license_created", "license_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     license_id = Column(Integer, ForeignKey("licenses.id"))
     action = Column(String, nullable=False)  # lesson_accessed, feature_used, etc.
     details = Column(JSON, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
     
     # Relationships
     license = relationship("License", back_populates="usage_logs")
@@ -139,8 +160,47 @@ class EmailLog(Base):
     status = Column(String)  # sent, failed, pending
     sendgrid_message_id = Column(String, nullable=True)
     error_message = Column(Text, nullable=True)
+    dedupe_key = Column(String, index=True, nullable=True)  # Set for campaign emails
     created_at = Column(DateTime, default=datetime.utcnow)
 
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The worker claims due messages with a range scan on this index
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    recipient_email = Column(String, nullable=False)
+    email_type = Column(String, nullable=False)
+    subject = Column(String)
+    html_content = Column(Text, nullable=False)
+    status = Column(String, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # Retry time, or lease expiry while sending
+    last_error = Column(Text, nullable=True)
+    dedupe_key = Column(String, unique=True, nullable=True)  # Guarantees a campaign email is queued once
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class CampaignCheckpoint(Base):
+    __tablename__ = "campaign_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("campaign", "run_key", name="uq_campaign_checkpoints_run"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    campaign = Column(String, nullable=False)  # trial_reminder, expiration
+    run_key = Column(String, nullable=False)  # One run per campaign per day (YYYY-MM-DD)
+    status = Column(String, default="running")  # running, completed
+    last_end_date = Column(DateTime, nullable=True)  # Keyset position (end_date, id) of the last batch
+    last_license_id = Column(Integer, nullable=True)
+    enqueued = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
 class TeacherClass(Base):
     __tablename__ = "teacher_classes"
     
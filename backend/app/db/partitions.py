@@ -0,0 +1,263 @@
+"""
+Monthly range partitioning for activity_logs and usage_logs
+
+Both tables are declared with PARTITION BY RANGE (created_at) in models.py.
+This module creates the monthly partitions ahead of time and enforces the
+retention policy by archiving (gzip CSV) or dropping expired partitions.
+Everything here is a no-op on databases other than PostgreSQL.
+"""
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import asyncio
+import gzip
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+PARTITIONED_TABLES = ("activity_logs", "usage_logs")
+
+# Partition configuration
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+LOG_RETENTION_MONTHS = int(os.getenv("LOG_RETENTION_MONTHS", 24))
+LOG_RETENTION_MODE = os.getenv("LOG_RETENTION_MODE", "archive")  # archive, drop
+PARTITION_ARCHIVE_DIR = Path(os.getenv("PARTITION_ARCHIVE_DIR", "./archive"))
+PARTITION_MAINTENANCE_INTERVAL_HOURS = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL_HOURS", 6))
+# How long retention waits for the parent table lock before giving up until the next run
+PARTITION_LOCK_TIMEOUT_MS = int(os.getenv("PARTITION_LOCK_TIMEOUT_MS", 5000))
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+def month_start(value: datetime) -> datetime:
+    """Truncate a datetime to the first instant of its month"""
+    return datetime(value.year, value.month, 1)
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month-start datetime by a number of months"""
+    index = value.year * 12 + (value.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: datetime) -> str:
+    """Name of the partition holding rows for the given month"""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+def is_supported(bind) -> bool:
+    """Partitioning is only available on PostgreSQL"""
+    return bind.dialect.name == "postgresql"
+
+def ensure_partitions(
+    bind,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    start: Optional[datetime] = None,
+    now: Optional[datetime] = None
+) -> List[str]:
+    """
+    Create monthly partitions (plus a DEFAULT catch-all) for every partitioned table
+
+    Args:
+        bind: Engine or connection
+        months_ahead: Number of future months to pre-create
+        start: First month to create (defaults to the current month)
+        now: Reference time (defaults to utcnow)
+
+    Returns:
+        Names of the partitions that were checked or created
+    """
+    if not is_supported(bind):
+        return []
+
+    now = now or datetime.utcnow()
+    first = month_start(start or now)
+    last = add_months(month_start(now), months_ahead)
+
+    names = []
+    with _begin(bind) as conn:
+        for table in PARTITIONED_TABLES:
+            month = first
+            while month <= last:
+                name = partition_name(table, month)
+                conn.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                names.append(name)
+                month = add_months(month, 1)
+
+            # Rows outside the pre-created range land here instead of failing the insert
+            conn.execute(text(
+                f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT'
+            ))
+
+    return names
+
+def list_partitions(bind, table: str) -> Dict[str, datetime]:
+    """
+    List the monthly partitions attached to a table
+
+    Returns:
+        Mapping of partition name to the month it covers
+    """
+    if not is_supported(bind):
+        return {}
+
+    with _begin(bind) as conn:
+        rows = conn.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = :table
+        """), {"table": table})
+        names = [row[0] for row in rows]
+
+    partitions = {}
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match and match.group("table") == table:
+            partitions[name] = datetime(int(match.group("year")), int(match.group("month")), 1)
+    return partitions
+
+def archive_partition(
+    bind,
+    name: str,
+    archive_dir: Path = PARTITION_ARCHIVE_DIR,
+    before: Optional[datetime] = None
+) -> Path:
+    """
+    Stream a partition's rows into a gzip-compressed CSV file
+
+    Args:
+        bind: Engine or connection
+        name: Partition table name
+        archive_dir: Directory for archive files
+        before: Only archive rows created before this time (used for the DEFAULT partition)
+
+    Returns:
+        Path of the written archive
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    query = f'SELECT * FROM "{name}"'
+    if before is not None:
+        query += f" WHERE created_at < '{before.isoformat()}'"
+        # Expired rows keep arriving in the DEFAULT partition, so each purge gets its own file
+        path = archive_dir / f"{name}_before_{before:%Y%m%d}_{datetime.utcnow():%Y%m%d%H%M%S}.csv.gz"
+    else:
+        path = archive_dir / f"{name}.csv.gz"
+    tmp_path = path.with_suffix(".gz.tmp")
+
+    engine = getattr(bind, "engine", bind)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with gzip.open(tmp_path, "wb") as archive:
+            cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH CSV HEADER", archive)
+        cursor.close()
+        raw.commit()
+    finally:
+        raw.close()
+
+    tmp_path.replace(path)
+    return path
+
+def apply_retention(
+    bind,
+    retention_months: int = LOG_RETENTION_MONTHS,
+    mode: str = LOG_RETENTION_MODE,
+    archive_dir: Path = PARTITION_ARCHIVE_DIR,
+    now: Optional[datetime] = None
+) -> Dict[str, List[str]]:
+    """
+    Archive and/or drop partitions older than the retention window
+
+    Args:
+        bind: Engine or connection
+        retention_months: Number of whole months to keep (plus the current one)
+        mode: "archive" to write a compressed copy before dropping, "drop" to discard
+        archive_dir: Directory for archive files
+        now: Reference time (defaults to utcnow)
+
+    Rows that landed in a table's DEFAULT partition are not covered by any
+    monthly partition, so expired ones are archived and deleted from it.
+
+    Returns:
+        Dictionary with the archived and dropped partition names, and the
+        DEFAULT partitions expired rows were purged from
+    """
+    result = {"archived": [], "dropped": [], "purged": []}
+    if not is_supported(bind) or retention_months <= 0:
+        return result
+
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+
+    for table in PARTITIONED_TABLES:
+        for name, month in sorted(list_partitions(bind, table).items(), key=lambda item: item[1]):
+            if month >= cutoff:
+                continue
+
+            if mode == "archive":
+                archive_partition(bind, name, archive_dir)
+                result["archived"].append(name)
+
+            # DETACH takes an ACCESS EXCLUSIVE lock on the parent (DETACH ... CONCURRENTLY
+            # is not allowed while a DEFAULT partition exists), so keep the transaction
+            # short and give up rather than queue every reader and writer behind the lock
+            with _begin(bind) as conn:
+                conn.execute(text(f"SET LOCAL lock_timeout = {PARTITION_LOCK_TIMEOUT_MS}"))
+                conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+                conn.execute(text(f'DROP TABLE "{name}"'))
+            result["dropped"].append(name)
+
+        default = f"{table}_default"
+        with _begin(bind) as conn:
+            if conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar() is None:
+                continue
+            expired = conn.execute(
+                text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE created_at < :cutoff)'),
+                {"cutoff": cutoff}
+            ).scalar()
+        if not expired:
+            continue
+        if mode == "archive":
+            result["archived"].append(archive_partition(bind, default, archive_dir, before=cutoff).name)
+        with _begin(bind) as conn:
+            conn.execute(text(f'DELETE FROM "{default}" WHERE created_at < :cutoff'), {"cutoff": cutoff})
+        result["purged"].append(default)
+
+    return result
+
+def run_maintenance(bind) -> Dict[str, List[str]]:
+    """Pre-create upcoming partitions and enforce retention"""
+    created = ensure_partitions(bind)
+    result = apply_retention(bind)
+    result["ensured"] = created
+    return result
+
+async def partition_maintenance_loop(bind, interval_hours: float = PARTITION_MAINTENANCE_INTERVAL_HOURS):
+    """
+    Background task that periodically runs partition maintenance
+
+    Runs the blocking DDL in a worker thread so the event loop stays responsive.
+    """
+    while True:
+        try:
+            result = await asyncio.to_thread(run_maintenance, bind)
+            if result["archived"] or result["dropped"] or result["purged"]:
+                print(
+                    f"✓ Partition retention: archived {len(result['archived'])}, dropped {len(result['dropped'])}, "
+                    f"purged expired rows from {len(result['purged'])} default partitions"
+                )
+        except Exception as e:
+            print(f"⚠️  Partition maintenance failed: {e}")
+        await asyncio.sleep(interval_hours * 3600)
+
+@contextmanager
+def _begin(bind):
+    """Open a transaction on an engine, or reuse an existing connection"""
+    if isinstance(bind, Engine):
+        with bind.begin() as conn:
+            yield conn
+    else:
+        yield bind
@@ -0,0 +1,130 @@
+"""
+Query budget harness
+Counts SQL statements per block or per request and fails when an endpoint
+issues more queries than its budget (catches N+1 regressions)
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+import json
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# off: no counting, warn: log violations, enforce: turn violations into 500s
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off")
+
+# Maximum statements per request, keyed by route path (auth lookup included)
+ENDPOINT_QUERY_BUDGETS: Dict[str, int] = {
+    "/auth/login": 2,
+    "/auth/me": 1,
+    "/auth/logout": 1,
+    "/auth/check-access": 1,
+    "/auth/change-password": 2,
+    "/auth/update-profile": 3,
+    "/auth/teacher/students": 2,
+    "/auth/teacher/classes": 2,
+    "/auth/admin/mark-paid/{user_id}": 4,
+}
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block of code issues more SQL statements than allowed"""
+
+class QueryCounter:
+    """Collects the statements executed while it is active"""
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, statement: str):
+        self.statements.append(statement)
+
+_active_counter: ContextVar[Optional[QueryCounter]] = ContextVar("active_query_counter", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_request_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _active_counter.get()
+    if counter is not None:
+        counter.record(statement)
+
+@contextmanager
+def count_queries(bind: Engine):
+    """
+    Count every statement executed on an engine inside the block
+
+    Works across threads (e.g. requests made through a TestClient), so it is
+    meant for tests and scripts rather than concurrent production traffic.
+
+    Yields:
+        QueryCounter for the block
+    """
+    counter = QueryCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.record(statement)
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+@contextmanager
+def assert_query_budget(bind: Engine, max_queries: int, label: str = "block"):
+    """
+    Fail if the block executes more than max_queries statements
+
+    Raises:
+        QueryBudgetExceeded: Listing the statements that were executed
+    """
+    with count_queries(bind) as counter:
+        yield counter
+    check_budget(counter, max_queries, label)
+
+def check_budget(counter: QueryCounter, max_queries: int, label: str):
+    """Raise QueryBudgetExceeded if a counter went over budget"""
+    if counter.count > max_queries:
+        listing = "\n".join(f"  {i + 1}. {s}" for i, s in enumerate(counter.statements))
+        raise QueryBudgetExceeded(
+            f"{label} executed {counter.count} queries (budget {max_queries}):\n{listing}"
+        )
+
+@contextmanager
+def track_request_queries():
+    """
+    Count the statements issued while handling the current request
+
+    The counter lives in a context variable, so it only sees queries made
+    from this request's task and the threads it spawns.
+    """
+    counter = QueryCounter()
+    token = _active_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _active_counter.reset(token)
+
+def endpoint_budget_violation(route_path: str, counter: QueryCounter) -> Optional[dict]:
+    """
+    Check a finished request against its endpoint budget
+
+    Returns:
+        Violation details, or None if the endpoint has no budget or stayed within it
+    """
+    budget = ENDPOINT_QUERY_BUDGETS.get(route_path)
+    if budget is None or counter.count <= budget:
+        return None
+
+    violation = {
+        "event": "query_budget_exceeded",
+        "route": route_path,
+        "queries": counter.count,
+        "budget": budget,
+        "statements": counter.statements,
+    }
+    print(json.dumps(violation))
+    return violation
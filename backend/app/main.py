@@ -3,8 +3,6 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-# from slowapi import _rate_limit_exceeded_handler
-# from slowapi.errors import RateLimitExceeded
 from app.db.connection import db
 from app.routes.lessons import router as lessons_router
 from app.routes.learning import router as learning_router
@@ -15,8 +13,21 @@ from app.routes.payment import router as payment_router
 from app.routes.tracking import router as tracking_router
 from app.routes.auth import router as auth_router
 from app.services.lesson_service import LessonService
-from app.db.database import init_db, close_db
-# from app.middleware.security import limiter, add_security_headers
+from app.services.auth_service import password_hash_pool
+from app.services.license_service import license_expiry_sweep_loop
+from app.services.ttl_store import ttl_store_sweeper_loop
+from app.services.captcha_service import close_captcha_client
+from app.services.email_outbox import email_outbox_worker_loop
+from app.services.email_campaigns import campaign_scheduler_loop
+from app.services.ws_hub import ws_heartbeat_loop
+from app.services.pubsub import bus as pubsub_bus
+from app.services.dashboard_stream import dashboard_flush_loop
+from app.services.presence import presence_loop
+from app.db.database import init_db, close_db, engine
+from app.db.partitions import partition_maintenance_loop
+from app.db.instrumentation import bind_request_scope, unbind_request_scope
+from app.db.query_budget import QUERY_BUDGET_MODE, track_request_queries, endpoint_budget_violation
+import asyncio
 import os
 
 @asynccontextmanager
@@ -29,11 +40,41 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"⚠️  Database initialization skipped: {e}")
     
+    # Monthly log partitions and retention
+    partition_task = asyncio.create_task(partition_maintenance_loop(engine))
+    
+    # License expiry sweeps
+    license_sweep_task = asyncio.create_task(license_expiry_sweep_loop())
+    
+    # Expired verification codes, registration and CAPTCHA tokens
+    ttl_sweep_task = asyncio.create_task(ttl_store_sweeper_loop())
+    
+    # Outbound email delivery
+    email_task = asyncio.create_task(email_outbox_worker_loop())
+    campaign_task = asyncio.create_task(campaign_scheduler_loop())
+    
+    # Dashboard broadcasts across workers, and dead socket reaping
+    await pubsub_bus.start()
+    ws_heartbeat_task = asyncio.create_task(ws_heartbeat_loop())
+    dashboard_task = asyncio.create_task(dashboard_flush_loop())
+    presence_task = asyncio.create_task(presence_loop())
+    
     print("✓ Application startup complete")
     
     yield
     
     # Shutdown
+    partition_task.cancel()
+    license_sweep_task.cancel()
+    ttl_sweep_task.cancel()
+    email_task.cancel()
+    campaign_task.cancel()
+    ws_heartbeat_task.cancel()
+    dashboard_task.cancel()
+    presence_task.cancel()
+    await pubsub_bus.close()
+    await password_hash_pool.close()
+    await close_captcha_client()
     await close_db()
     print("✓ Application shutdown complete")
 
@@ -44,9 +85,7 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Add rate limiter state (commented out until dependencies installed)
-# app.state.limiter = limiter
-# app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Rate limits are applied per route (see app/services/rate_limiter.py)
 
 # Security: CORS middleware (allow all origins for testing)
 app.add_middleware(
@@ -72,6 +111,27 @@ async def add_security_headers_middleware(request: Request, call_next):
     response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
     return response
 
+# Attribute SQL statements to the route that issued them
+@app.middleware("http")
+async def sql_route_context_middleware(request: Request, call_next):
+    token = bind_request_scope(request.scope)
+    try:
+        return await call_next(request)
+    finally:
+        unbind_request_scope(token)
+
+# Per-endpoint SQL query budgets (development/CI: catches N+1 regressions)
+if QUERY_BUDGET_MODE in ("warn", "enforce"):
+    @app.middleware("http")
+    async def query_budget_middleware(request: Request, call_next):
+        with track_request_queries() as counter:
+            response = await call_next(request)
+        route = request.scope.get("route")
+        violation = endpoint_budget_violation(route.path, counter) if route else None
+        if violation and QUERY_BUDGET_MODE == "enforce":
+            return JSONResponse(status_code=500, content={"detail": "Query budget exceeded", **violation})
+        return response
+
 # HTTPS redirect (production only)
 if os.getenv("FORCE_HTTPS", "false").lower() == "true":
     @app.middleware("http")
@@ -106,4 +166,11 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("app.main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run(
+        "app.main:app", host="0.0.0.0", port=port, reload=True,
+        # Compress WebSocket frames when the client offers permessage-deflate
+        ws_per_message_deflate=os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true",
+        # Protocol-level ping/pong detects dead dashboards (browsers answer it automatically)
+        ws_ping_interval=float(os.getenv("WS_PING_INTERVAL_SECONDS", 20)),
+        ws_ping_timeout=float(os.getenv("WS_PING_TIMEOUT_SECONDS", 20))
+    )
@@ -0,0 +1,72 @@
+"""
+License entitlement checks for API routes
+Resolves a signed X-License-Token (verified locally) or the X-License-Key
+header (cached entitlement mask), so a per-request feature check is a
+signature check or a dictionary lookup, plus a bitwise AND
+"""
+from typing import Optional
+from fastapi import Header, HTTPException, status
+
+from ..services.license_service import FEATURE_FLAGS, Entitlements, license_store
+from ..services.license_tokens import LicenseTokenError, entitlements_from_claims, verify_license_token
+
+LICENSE_KEY_HEADER = "X-License-Key"
+LICENSE_TOKEN_HEADER = "X-License-Token"
+
+def require_features(*features: str):
+    """
+    Build a dependency that rejects requests whose license lacks any of the features
+
+    Usage:
+        @router.get("/analytics", dependencies=[Depends(require_features("analytics"))])
+
+    Args:
+        features: Feature names (see FEATURE_FLAGS)
+
+    Returns:
+        Dependency returning the license's Entitlements
+
+    Raises:
+        ValueError: If a feature name is unknown (at import time, not per request)
+    """
+    unknown = [feature for feature in features if feature not in FEATURE_FLAGS]
+    if unknown:
+        raise ValueError(f"Unknown license features: {', '.join(unknown)}")
+
+    mask = 0
+    for feature in features:
+        mask |= FEATURE_FLAGS[feature]
+
+    async def check_entitlements(
+        license_key: Optional[str] = Header(None, alias=LICENSE_KEY_HEADER),
+        license_token: Optional[str] = Header(None, alias=LICENSE_TOKEN_HEADER)
+    ) -> Entitlements:
+        if license_token:
+            try:
+                entitlements = entitlements_from_claims(verify_license_token(license_token))
+            except LicenseTokenError as e:
+                raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+        elif license_key:
+            entitlements = license_store.get_entitlements(license_key)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="License key required"
+            )
+
+        if not entitlements.is_valid():
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="License is invalid or expired"
+            )
+
+        if entitlements.features & mask != mask:
+            missing = [f for f in features if not entitlements.features & FEATURE_FLAGS[f]]
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"License does not include: {', '.join(missing)}"
+            )
+
+        return entitlements
+
+    return check_entitlements
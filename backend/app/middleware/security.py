@@ -4,16 +4,10 @@ Rate limiting, input sanitization, and security headers
 """
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
 import bleach
 from typing import Optional
 import re
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
-
 # HTML sanitization configuration
 ALLOWED_TAGS = ['b', 'i', 'u', 'em', 'strong', 'p', 'br']
 ALLOWED_ATTRIBUTES = {}
@@ -122,7 +116,7 @@ def add_security_headers(response: JSONResponse) -> JSONResponse:
     response.headers["Content-Security-Policy"] = "default-src 'self'"
     return response
 
-# Rate limit configurations by endpoint type
+# Rate limit configurations by endpoint type (apply with app.services.rate_limiter.rate_limit)
 RATE_LIMITS = {
     "auth": "5/minute",      # Login/register attempts
     "api": "100/minute",     # General API calls
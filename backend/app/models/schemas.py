@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Literal, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any, Set
 from datetime import datetime
 import json
 
@@ -110,19 +110,29 @@ class StudentSession(BaseModel):
     """Real-time student session in teacher class"""
     student_id: str
     student_name: str
-    status: Literal["active", "practicing", "idle"] = "idle"
+    status: Literal["active", "practicing", "idle", "offline"] = "idle"
     mastery_level: float = 0.0  # 0.0 to 1.0
     accuracy: float = 0.0  # 0 to 100
     practice_time: int = 0  # minutes
     current_phoneme: str = ""
     current_activity: str = ""
     streak: int = 0
-    mastered_phonemes: List[str] = []
+    mastered_phonemes: Set[str] = set()
     error_patterns: Dict[str, int] = {}  # phoneme -> error count
     joined_at: datetime = None
     last_active: Optional[datetime] = None
 
 
+class StudentProgressMessage(BaseModel):
+    """Practice result sent over the student WebSocket"""
+    type: Literal["progress"] = "progress"
+    teacher_id: str
+    phoneme: str = Field(min_length=1, max_length=32)
+    activity: str = Field(max_length=64)
+    quality: int = Field(ge=0, le=5)  # Recall quality, 0 to 5
+    accuracy: float = Field(ge=0, le=100)
+
+
 class ClassStats(BaseModel):
     """Aggregated classroom statistics"""
     total_students: int
@@ -2,8 +2,18 @@
 Admin routes for teacher/admin dashboard
 """
 from fastapi import APIRouter, HTTPException
+import asyncio
 from typing import Dict, List
 from app.services.learning_algorithm import learning_algorithm
+from app.db.instrumentation import get_sql_metrics, reset_sql_metrics
+from app.services.auth_cache import get_auth_cache_stats
+from app.services.ttl_store import get_ttl_store_stats
+from app.services.ws_hub import hub as ws_hub
+from app.services.pubsub import bus as pubsub_bus
+from app.services.dashboard_stream import coalescer
+from app.services.presence import presence_tracker
+from app.services.email_outbox import get_outbox_stats
+from app.services.email_campaigns import CAMPAIGNS, run_campaign, list_campaign_runs
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -136,6 +146,60 @@ async def get_student_analytics(user_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get student analytics: {str(e)}")
 
+@router.get("/sql-metrics")
+async def get_sql_query_metrics(limit: int = 20):
+    """Get SQL latency histograms, row counts and per-route query statistics"""
+    try:
+        return get_sql_metrics(limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get SQL metrics: {str(e)}")
+
+@router.post("/sql-metrics/reset")
+async def reset_sql_query_metrics():
+    """Reset collected SQL metrics"""
+    reset_sql_metrics()
+    return {"message": "SQL metrics reset"}
+
+@router.get("/auth-cache")
+async def get_auth_cache_metrics():
+    """Get hit/miss counters for the token claims and user caches"""
+    return get_auth_cache_stats()
+
+@router.get("/ttl-stores")
+async def get_ttl_store_metrics():
+    """Get size, hit/miss and expiry counters for the short-lived token stores"""
+    return get_ttl_store_stats()
+
+@router.get("/websockets")
+async def get_websocket_metrics():
+    """Get live dashboard connections, eviction counters, pub/sub, coalescing and presence activity"""
+    return {
+        **ws_hub.get_stats(),
+        "pubsub": pubsub_bus.get_stats(),
+        "stream": coalescer.get_stats(),
+        "presence": presence_tracker.get_stats()
+    }
+
+@router.get("/email-outbox")
+async def get_email_outbox_metrics():
+    """Get queued/sent/failed email counts and the outbox backlog age"""
+    try:
+        return get_outbox_stats()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Email outbox unavailable: {e}")
+
+@router.get("/campaigns")
+async def get_campaign_runs(limit: int = 20):
+    """Get the most recent trial-reminder and expiration campaign runs"""
+    return {"campaigns": list(CAMPAIGNS), "runs": list_campaign_runs(limit)}
+
+@router.post("/campaigns/{name}/run")
+async def trigger_campaign(name: str):
+    """Run (or resume) today's run of a campaign now"""
+    if name not in CAMPAIGNS:
+        raise HTTPException(status_code=404, detail=f"Unknown campaign: {name}")
+    return await asyncio.to_thread(run_campaign, name)
+
 @router.get("/system-health")
 async def get_system_health():
     """Get system health and performance metrics"""
@@ -4,7 +4,7 @@ User registration, login, logout, and profile management
 """
 from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only, raiseload
 from pydantic import BaseModel, EmailStr
 from typing import Optional
 from datetime import datetime, timedelta
@@ -12,14 +12,22 @@ from datetime import datetime, timedelta
 from ..db.database import get_db
 from ..db.models import User
 from ..services.auth_service import (
-    hash_password,
-    verify_password,
+    hash_password_async,
+    verify_password_async,
     create_access_token,
     decode_access_token,
     validate_password_strength
 )
+from ..services.auth_cache import get_cached_claims, cache_claims, get_cached_user, cache_user, invalidate_user
 from ..middleware.security import sanitize_input, validate_email
-# from ..middleware.security import limiter  # Disabled until slowapi is installed
+from ..services.rate_limiter import (
+    enforce,
+    make_limiter,
+    rate_limit,
+    RATE_LIMIT_LOGIN,
+    RATE_LIMIT_LOGIN_IP,
+    RATE_LIMIT_REGISTER
+)
 from ..services.spam_service import (
     check_honeypot,
     detect_spam_content,
@@ -30,10 +38,14 @@ from ..services.spam_service import (
     verify_registration_token
 )
 from ..services.captcha_service import verify_recaptcha, verify_hcaptcha
+from ..services.class_registry import class_registry
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
 
+# Failed-guess protection per account; the per-IP login limit is much looser
+login_account_limiter = make_limiter("login_account", RATE_LIMIT_LOGIN)
+
 # Pydantic models for request/response
 class UserRegister(BaseModel):
     email: EmailStr
@@ -64,6 +76,35 @@ class UserResponse(BaseModel):
     full_name: Optional[str]
     created_at: str
 
+# Columns needed to serialize an enrolled student
+STUDENT_SUMMARY_COLUMNS = (User.id, User.email, User.full_name, User.has_paid, User.created_at)
+
+def query_enrolled_students(db: Session, teacher_id: int):
+    """
+    Query a teacher's active students, loading only the summary columns
+
+    raiseload("*") makes any relationship access during serialization fail
+    loudly instead of silently issuing one query per student.
+    """
+    return db.query(User).options(
+        load_only(*STUDENT_SUMMARY_COLUMNS),
+        raiseload("*")
+    ).filter(
+        User.teacher_id == teacher_id,
+        User.role == "student",
+        User.is_active == True
+    )
+
+def serialize_student(student: User) -> dict:
+    """Serialize an enrolled student for teacher views"""
+    return {
+        "id": student.id,
+        "email": student.email,
+        "full_name": student.full_name,
+        "has_paid": student.has_paid,
+        "created_at": student.created_at.isoformat() if student.created_at else None
+    }
+
 # Dependency to get current user from JWT token
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -83,7 +124,12 @@ async def get_current_user(
         HTTPException: If token is invalid or user not found
     """
     token = credentials.credentials
-    payload = decode_access_token(token)
+    
+    # Skip signature verification for recently verified tokens
+    payload = get_cached_claims(token)
+    if payload is None:
+        payload = decode_access_token(token)
+        cache_claims(token, payload)
     
     user_id = payload.get("user_id")
     if user_id is None:
@@ -92,17 +138,25 @@ async def get_current_user(
             detail="Invalid authentication credentials"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    # Skip the user lookup for recently loaded users
+    user = get_cached_user(db, user_id)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        cache_user(user)
     
     return user
 
-@router.post("/register", response_model=TokenResponse, status_code=status.HTTP_201_CREATED)
-# @limiter.limit("5/minute")  # Disabled until slowapi installed
+@router.post(
+    "/register",
+    response_model=TokenResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(rate_limit(RATE_LIMIT_REGISTER, "register"))]
+)
 async def register(user_data: UserRegister, request: Request, db: Session = Depends(get_db)):
     """
     Register a new user with anti-spam protection
@@ -167,19 +221,12 @@ async def register(user_data: UserRegister, request: Request, db: Session = Depe
     # Find teacher if teacher_code provided (for student enrollment)
     teacher_id = None
     if user_data.role == "student" and user_data.teacher_code:
-        try:
-            from ..db.models import TeacherClass
-            teacher_class = db.query(TeacherClass).filter(
-                TeacherClass.class_code == user_data.teacher_code,
-                TeacherClass.is_active == True
-            ).first()
-            if teacher_class:
-                teacher_id = teacher_class.teacher_id
-        except Exception as e:
-            print(f"Teacher enrollment lookup failed: {e}")
+        teacher_class = class_registry.get_by_code(user_data.teacher_code)
+        if teacher_class and teacher_class.persisted:
+            teacher_id = int(teacher_class.teacher_id)
     
     # Create new user (password hashing disabled for testing)
-    # hashed_password = hash_password(user_data.password)
+    # hashed_password = await hash_password_async(user_data.password)
     hashed_password = user_data.password  # Plain text for testing only
     new_user = User(
         email=user_data.email,
@@ -220,8 +267,11 @@ async def register(user_data: UserRegister, request: Request, db: Session = Depe
         }
     }
 
-@router.post("/login", response_model=TokenResponse)
-# @limiter.limit("5/minute")  # Disabled until slowapi installed
+@router.post(
+    "/login",
+    response_model=TokenResponse,
+    dependencies=[Depends(rate_limit(RATE_LIMIT_LOGIN_IP, "login"))]
+)
 async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     """
     Login with email and password (with optional CAPTCHA)
@@ -232,6 +282,8 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     
     Returns JWT access token
     """
+    enforce(login_account_limiter, credentials.email.lower(), "Too many login attempts, please wait")
+    
     # Verify CAPTCHA if provided
     if credentials.captcha_token:
         await verify_recaptcha(credentials.captcha_token, "login")
@@ -244,8 +296,8 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Incorrect email or password"
         )
     
-    # Verify password
-    if not verify_password(credentials.password, user.password_hash):
+    # Verify password (in the hashing pool, off the event loop)
+    if not await verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
@@ -269,21 +321,8 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     enrolled_students = []
     if user.role == "teacher":
         try:
-            students = db.query(User).filter(
-                User.teacher_id == user.id,
-                User.role == "student",
-                User.is_active == True
-            ).all()
-            enrolled_students = [
-                {
-                    "id": s.id,
-                    "email": s.email,
-                    "full_name": s.full_name,
-                    "has_paid": s.has_paid,
-                    "created_at": s.created_at.isoformat() if s.created_at else None
-                }
-                for s in students
-            ]
+            students = query_enrolled_students(db, user.id).all()
+            enrolled_students = [serialize_student(s) for s in students]
         except Exception as e:
             print(f"Failed to fetch enrolled students: {e}")
     
@@ -328,10 +367,10 @@ async def logout(current_user: User = Depends(get_current_user)):
     Note: JWT tokens are stateless, so client should delete the token.
     For added security, implement token blacklist in production.
     """
+    invalidate_user(current_user.id)
     return {"message": "Successfully logged out"}
 
-@router.put("/change-password")
-# @limiter.limit("3/minute")  # Disabled until slowapi installed
+@router.put("/change-password", dependencies=[Depends(rate_limit("3/minute", "change_password"))])
 async def change_password(
     current_password: str,
     new_password: str,
@@ -345,7 +384,7 @@ async def change_password(
     - **new_password**: New strong password
     """
     # Verify current password
-    if not verify_password(current_password, current_user.password_hash):
+    if not await verify_password_async(current_password, current_user.password_hash, login=False):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Current password is incorrect"
@@ -355,8 +394,9 @@ async def change_password(
     validate_password_strength(new_password)
     
     # Update password
-    current_user.password_hash = hash_password(new_password)
+    current_user.password_hash = await hash_password_async(new_password)
     db.commit()
+    invalidate_user(current_user.id)
     
     return {"message": "Password changed successfully"}
 
@@ -377,6 +417,7 @@ async def update_profile(
     
     current_user.updated_at = datetime.utcnow()
     db.commit()
+    invalidate_user(current_user.id)
     db.refresh(current_user)
     
     return {
@@ -426,34 +467,16 @@ async def create_teacher_class(
     Create a new class for teacher
     Returns unique class code for student enrollment
     """
-    import random
-    import string
-    from ..db.models import TeacherClass
-    
-    # Generate unique class code
-    class_code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-    
-    # Check if code already exists
-    while db.query(TeacherClass).filter(TeacherClass.class_code == class_code).first():
-        class_code = ''.join(random.choices (string.ascii_uppercase + string.digits, k=8))
-    
-    new_class = TeacherClass(
-        teacher_id=current_user.id,
-        class_name=class_name,
-        class_code=class_code,
-        description=description,
-        max_students=max_students,
-        is_active=True
-    )
-    
     try:
-        db.add(new_class)
-        db.commit()
-        db.refresh(new_class)
+        # The code is derived from the new row's id, so no uniqueness probing is needed
+        new_class = class_registry.create_class(
+            current_user.id, class_name, description=description, max_students=max_students,
+            db=db, allow_unpersisted=False
+        )
         
         return {
             "message": "Class created successfully",
-            "class_code": class_code,
+            "class_code": new_class.class_code,
             "class_name": class_name,
             "max_students": max_students
         }
@@ -473,24 +496,11 @@ async def get_enrolled_students(
     Get all students enrolled with this teacher
     """
     try:
-        students = db.query(User).filter(
-            User.teacher_id == current_user.id,
-            User.role == "student",
-            User.is_active == True
-        ).all()
+        students = query_enrolled_students(db, current_user.id).all()
         
         return {
             "total_students": len(students),
-            "students": [
-                {
-                    "id": s.id,
-                    "email": s.email,
-                    "full_name": s.full_name,
-                    "has_paid": s.has_paid,
-                    "created_at": s.created_at.isoformat() if s.created_at else None
-                }
-                for s in students
-            ]
+            "students": [serialize_student(s) for s in students]
         }
     except Exception as e:
         raise HTTPException(
@@ -564,6 +574,7 @@ async def mark_student_paid(
     
     try:
         db.commit()
+        invalidate_user(student.id)
         db.refresh(student)
         
         return {
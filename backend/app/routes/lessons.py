@@ -1,19 +1,18 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from app.models.schemas import LessonResponse, LessonFeedback, Lesson
 from app.services.lesson_service import LessonService, ProgressService, RecordingService
+from app.services.rate_limiter import rate_limit, RATE_LIMIT_FEEDBACK
+from app.services.recording_upload import (
+    RECORDING_MAX_DURATION_MS, RECORDING_UPLOAD_OPENAPI, discard_recording, receive_recording
+)
 from app.utils.audio_generator import generate_phoneme_audio
 import random
 import os
-import uuid
-from pathlib import Path
 from urllib.parse import unquote
 
 router = APIRouter(prefix="/api", tags=["lessons"])
 
-UPLOAD_DIR = Path("./uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
 @router.get("/lesson", response_model=LessonResponse)
 async def get_lesson():
     """Get a random lesson"""
@@ -45,26 +44,43 @@ async def get_lesson_by_phoneme(phoneme: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/feedback", response_model=LessonFeedback)
-async def submit_recording(
-    lesson_id: str = Form(...),
-    duration_ms: int = Form(...),
-    audio: UploadFile = File(...),
-    user_id: str = Form(default="demo_user"),
-):
-    """Submit a recording and get feedback"""
+@router.post(
+    "/feedback",
+    response_model=LessonFeedback,
+    dependencies=[Depends(rate_limit(RATE_LIMIT_FEEDBACK, "feedback"))],
+    openapi_extra=RECORDING_UPLOAD_OPENAPI
+)
+async def submit_recording(request: Request):
+    """
+    Submit a recording and get feedback
+    
+    Form fields: lesson_id, duration_ms, user_id (default demo_user) and the
+    audio file. The audio is streamed to disk as it arrives (see
+    app.services.recording_upload) rather than read into memory.
+    """
+    fields, recording = await receive_recording(request)
     try:
-        # Save audio file
-        file_ext = audio.filename.split(".")[-1] if audio.filename else "wav"
-        file_name = f"{uuid.uuid4().hex}.{file_ext}"
-        file_path = UPLOAD_DIR / file_name
-        
-        contents = await audio.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        lesson_id = fields["lesson_id"]
+        duration_ms = int(fields["duration_ms"])
+    except (KeyError, ValueError):
+        await discard_recording(recording)
+        raise HTTPException(status_code=422, detail="lesson_id and an integer duration_ms are required")
+    user_id = fields.get("user_id") or "demo_user"
+    if recording.duration_ms is not None:
+        duration_ms = recording.duration_ms  # Measured from the file beats the client's figure
+    if duration_ms > RECORDING_MAX_DURATION_MS:
+        await discard_recording(recording)
+        raise HTTPException(
+            status_code=413,
+            detail=f"Recording too long. Maximum length is {RECORDING_MAX_DURATION_MS / 1000:g}s"
+        )
 
+    try:
         # Save recording metadata
-        await RecordingService.save_recording(user_id, lesson_id, duration_ms, str(file_path))
+        await RecordingService.save_recording(
+            user_id, lesson_id, duration_ms, str(recording.path),
+            size_bytes=recording.size_bytes, sha256=recording.sha256
+        )
 
         # Simple scoring logic (in real system, would use ML model)
         score = random.uniform(0.5, 1.0)
@@ -1,13 +1,17 @@
 """
 License Management API Routes
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import List, Optional
 from ..services.license_service import (
     create_license, validate_license, get_license_info,
     upgrade_license, extend_license, check_feature_access,
-    LicenseType, get_days_remaining
+    check_features_batch, LicenseType, get_days_remaining
+)
+from ..services.license_tokens import (
+    issue_license_token, verify_license_token, get_revocations_since,
+    get_public_key, LicenseTokenError, LICENSE_TOKEN_ALGORITHM
 )
 
 router = APIRouter()
@@ -25,10 +29,20 @@ class LicenseUpgradeRequest(BaseModel):
     new_type: str
     duration_days: int = 30
 
+class LicenseTokenRequest(BaseModel):
+    token: str
+
 class FeatureCheckRequest(BaseModel):
     license_key: str
     feature: str
 
+MAX_BATCH_LICENSES = 500
+MAX_BATCH_FEATURES = 32
+
+class FeatureBatchCheckRequest(BaseModel):
+    license_keys: List[str]
+    features: List[str]
+
 @router.post("/license/create")
 async def create_new_license(request: LicenseCreateRequest):
     """Create a new license (e.g., when user signs up for trial or subscription)"""
@@ -128,6 +142,19 @@ async def check_feature(request: FeatureCheckRequest):
         "has_access": has_access
     }
 
+@router.post("/license/check-features")
+async def check_features(request: FeatureBatchCheckRequest):
+    """Check several features for several licenses in one call"""
+    if len(request.license_keys) > MAX_BATCH_LICENSES or len(request.features) > MAX_BATCH_FEATURES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_LICENSES} license keys and {MAX_BATCH_FEATURES} features per call"
+        )
+    
+    return {
+        "results": check_features_batch(request.license_keys, request.features)
+    }
+
 @router.get("/license/trial")
 async def start_free_trial(email: EmailStr):
     """Quick endpoint to start a free trial"""
@@ -139,3 +166,48 @@ async def start_free_trial(email: EmailStr):
         "message": "14-day free trial activated!",
         "instructions": "Save this license key to continue using the app after your session."
     }
+
+@router.post("/license/token")
+async def issue_token(request: LicenseValidateRequest):
+    """Issue a signed token that clients can verify offline"""
+    is_valid, license, message = validate_license(request.license_key)
+    
+    if not license:
+        raise HTTPException(status_code=404, detail="License not found")
+    if not is_valid:
+        raise HTTPException(status_code=403, detail=message)
+    
+    return {
+        "token": issue_license_token(license),
+        "algorithm": LICENSE_TOKEN_ALGORITHM,
+        "expires_at": license.end_date.isoformat()
+    }
+
+@router.post("/license/token/verify")
+async def verify_token(request: LicenseTokenRequest):
+    """Verify a license token server-side (for clients that cannot verify locally)"""
+    try:
+        claims = verify_license_token(request.token)
+    except LicenseTokenError as e:
+        return {"valid": False, "message": str(e)}
+    
+    return {"valid": True, "claims": claims}
+
+@router.get("/license/token/key")
+async def get_token_key():
+    """Verification key for offline token checks (Ed25519 public key; none for HMAC tokens)"""
+    return {
+        "algorithm": LICENSE_TOKEN_ALGORITHM,
+        "public_key": get_public_key()
+    }
+
+@router.get("/license/revocations")
+async def get_revocations(since: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000)):
+    """Revoked license keys added after version `since`, for delta sync"""
+    revoked = get_revocations_since(since, limit)
+    
+    return {
+        "version": revoked[-1]["version"] if revoked else since,
+        "revoked": revoked,
+        "has_more": len(revoked) == limit
+    }
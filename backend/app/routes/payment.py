@@ -5,7 +5,6 @@ from fastapi import APIRouter, HTTPException, Request, Depends
 from pydantic import BaseModel, EmailStr
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import datetime, timedelta
 
 from ..services.payment_service import (
     create_checkout_session,
@@ -14,7 +13,8 @@ from ..services.payment_service import (
     handle_stripe_webhook
 )
 from ..services.email_service import send_license_key_email, send_payment_success_email
-from ..services.license_service import create_license, LicenseType
+from ..services.license_service import create_license, license_store, LicenseType
+from ..services.license_tokens import revoke_license
 from ..db.database import get_db
 from ..db.models import User, License, Payment
 
@@ -92,29 +92,17 @@ async def verify_payment(request: PaymentVerification, db: Session = Depends(get
         
         duration_days = 365 if "yearly" in plan_type else 30
         
-        # Create license
+        # Create the license and record the payment in one transaction, so neither
+        # can be stored without the other
         license = create_license(
             email=session_data["email"],
             license_type=license_type,
-            duration_days=duration_days
-        )
-        
-        # Save license to database
-        db_license = License(
-            license_key=license.license_key,
-            license_type=license.license_type.value,
+            duration_days=duration_days,
             user_id=user.id,
-            start_date=license.start_date,
-            end_date=license.end_date,
-            is_active=True,
-            max_students=license.max_students,
-            max_lessons=license.features.max_lessons,
-            features=license.features.dict(),
-            stripe_subscription_id=session_data.get("subscription_id")
+            stripe_subscription_id=session_data.get("subscription_id"),
+            db=db
         )
-        db.add(db_license)
         
-        # Record payment
         payment = Payment(
             user_id=user.id,
             amount=session_data.get("amount_total", 0),
@@ -126,7 +114,12 @@ async def verify_payment(request: PaymentVerification, db: Session = Depends(get
             metadata={"plan_type": plan_type}
         )
         db.add(payment)
-        db.commit()
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        license_store.remember(license)
         
         # Send email with license key
         await send_payment_success_email(
@@ -183,6 +176,8 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
             if license:
                 license.is_active = False
                 db.commit()
+                license_store.invalidate(license.license_key)
+                revoke_license(license.license_key, reason="subscription_canceled")
                 print(f"❌ License {license.license_key} deactivated")
                 
         elif event_type == "invoice.payment_failed":
@@ -212,6 +207,8 @@ async def cancel_user_subscription(subscription_id: str, db: Session = Depends(g
             if license:
                 license.is_active = False
                 db.commit()
+                license_store.invalidate(license.license_key)
+                revoke_license(license.license_key, reason="subscription_canceled")
             
             return {"success": True, "message": "Subscription canceled"}
         else:
@@ -3,49 +3,161 @@ Teacher Dashboard Routes
 Handles real-time student monitoring, class management, and progress tracking
 """
 
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from collections import Counter
+import math
 from typing import List, Dict, Optional
-import json
 from datetime import datetime
 from ..models.schemas import (
     StudentSession,
     ClassStats,
+    StudentProgressMessage,
     UserProgress,
     TeacherClass
 )
+from ..services.ws_hub import hub
+from ..services.pubsub import broadcast
+from ..services.dashboard_stream import coalescer
+from ..services.ws_codec import accept, receive_message
+from ..services.class_registry import ClassRecord, class_registry
+from ..services.presence import presence_tracker
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
 
-# In-memory storage for classes and connections
-classes_db: Dict[str, TeacherClass] = {}
-active_connections: Dict[str, List[WebSocket]] = {}
+# Live session state (connected students, running aggregates) for classes in
+# the class registry, keyed by teacher; dashboard sockets live in the broadcast hub
+live_classes: Dict[str, TeacherClass] = {}
+
+def teacher_channel(teacher_id: str) -> str:
+    return f"teacher:{teacher_id}"
+
+# Phonemes tracked on the class dashboard; mastery_level is the mastered share
+CLASS_PHONEMES = ['a', 'e', 'i', 'o', 'u', 'b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm']
 
 class TeacherClass:
-    """Represents a teacher's classroom"""
-    def __init__(self, teacher_id: str, class_name: str = "My Class"):
-        self.teacher_id = teacher_id
-        self.class_code = f"TEACHER{teacher_id[-6:].upper()}"
-        self.class_name = class_name
+    """
+    Represents a teacher's classroom
+
+    Class-wide sums, per-status and per-phoneme counts are kept up to date as
+    students join, leave, progress and change presence, so stats are read
+    without scanning students. Mutate sessions through add_student,
+    remove_student, record_progress and set_status only.
+    """
+    def __init__(self, record: ClassRecord):
+        self.class_id = record.id
+        self.teacher_id = record.teacher_id
+        self.class_code = record.class_code
+        self.class_name = record.class_name
         self.students: Dict[str, StudentSession] = {}
         self.created_at = datetime.now()
+        self.status_counts: Counter = Counter()
+        self.mastery_sum = 0.0
+        self.accuracy_sum = 0.0
+        self.practice_time_sum = 0
+        self.phoneme_mastered: Counter = Counter()
+        self.phoneme_practicing: Counter = Counter()  # Current phoneme, not yet mastered
+
+    def _account(self, session: StudentSession, sign: int):
+        """Add (sign=1) or remove (sign=-1) a session's share of the aggregates"""
+        self.status_counts[session.status] += sign
+        self.mastery_sum += sign * session.mastery_level
+        self.accuracy_sum += sign * session.accuracy
+        self.practice_time_sum += sign * session.practice_time
+        for phoneme in session.mastered_phonemes:
+            self.phoneme_mastered[phoneme] += sign
+        if session.current_phoneme and session.current_phoneme not in session.mastered_phonemes:
+            self.phoneme_practicing[session.current_phoneme] += sign
         
     def add_student(self, student_id: str, student_name: str):
         """Add a student to the class"""
-        self.students[student_id] = StudentSession(
+        self.remove_student(student_id)
+        session = StudentSession(
             student_id=student_id,
             student_name=student_name,
             status="active",
             joined_at=datetime.now()
         )
+        self.students[student_id] = session
+        self._account(session, 1)
         
     def remove_student(self, student_id: str):
         """Remove a student from the class"""
-        if student_id in self.students:
-            del self.students[student_id]
+        session = self.students.pop(student_id, None)
+        if session is not None:
+            self._account(session, -1)
+            if not self.students:
+                # Reset float sums so rounding error cannot accumulate forever
+                self.mastery_sum = self.accuracy_sum = 0.0
+
+    def set_status(self, student_id: str, status: str) -> bool:
+        """
+        Change a student's presence status
+
+        Returns:
+            True if the status changed
+        """
+        session = self.students.get(student_id)
+        if session is None or session.status == status:
+            return False
+        self.status_counts[session.status] -= 1
+        session.status = status
+        self.status_counts[status] += 1
+        return True
+
+    @property
+    def active_students(self) -> int:
+        return self.status_counts["active"] + self.status_counts["practicing"]
+
+    @property
+    def online_students(self) -> int:
+        return len(self.students) - self.status_counts["offline"]
+
+    def presence_counts(self) -> dict:
+        return {
+            "online": self.online_students,
+            "active": self.active_students,
+            "idle": self.status_counts["idle"],
+            "offline": self.status_counts["offline"]
+        }
+
+    def record_progress(self, student_id: str, phoneme: str, activity: str, quality: int, accuracy: float):
+        """
+        Apply one practice result to a student and the class aggregates
+
+        Raises:
+            KeyError: If the student is not in the class
+            TypeError, ValueError: If quality or accuracy is not a number, or is
+                out of range (quality 0-5, accuracy 0-100, as in StudentProgressMessage)
+        """
+        session = self.students[student_id]
+        # Everything that can fail happens before the aggregates are touched
+        phoneme = str(phoneme)
+        activity = str(activity)
+        quality = int(quality)
+        accuracy = float(accuracy)
+        if not 0 <= quality <= 5:
+            raise ValueError(f"Quality must be between 0 and 5, got {quality}")
+        if not math.isfinite(accuracy) or not 0 <= accuracy <= 100:
+            raise ValueError(f"Accuracy must be between 0 and 100, got {accuracy}")
+        # Update mastery based on quality
+        mastered = session.mastered_phonemes
+        if quality >= 4 and phoneme not in mastered:
+            mastered = mastered | {phoneme}
+        
+        self._account(session, -1)
+        session.current_phoneme = phoneme
+        session.current_activity = activity
+        session.accuracy = accuracy
+        session.last_active = datetime.now()
+        if mastered is not session.mastered_phonemes:
+            session.mastered_phonemes = mastered
+            session.mastery_level = len(mastered) / len(CLASS_PHONEMES)
+        self._account(session, 1)
             
     def get_stats(self) -> ClassStats:
-        """Calculate class statistics"""
-        if not self.students:
+        """Class statistics from the running aggregates"""
+        total = len(self.students)
+        if not total:
             return ClassStats(
                 total_students=0,
                 active_students=0,
@@ -53,21 +165,29 @@ class TeacherClass:
                 average_accuracy=0,
                 total_practice_time=0
             )
-            
-        active = sum(1 for s in self.students.values() if s.status == "active")
-        avg_mastery = sum(s.mastery_level for s in self.students.values()) / len(self.students)
-        avg_accuracy = sum(s.accuracy for s in self.students.values()) / len(self.students)
-        total_time = sum(s.practice_time for s in self.students.values())
         
         return ClassStats(
-            total_students=len(self.students),
-            active_students=active,
-            average_mastery=avg_mastery,
-            average_accuracy=avg_accuracy,
-            total_practice_time=total_time
+            total_students=total,
+            active_students=self.active_students,
+            average_mastery=self.mastery_sum / total,
+            average_accuracy=self.accuracy_sum / total,
+            total_practice_time=self.practice_time_sum
         )
 
 
+def get_live_class(teacher_id: str) -> Optional[TeacherClass]:
+    """The teacher's live class, loaded from the class registry on first use"""
+    teacher_class = live_classes.get(teacher_id)
+    if teacher_class is None:
+        record = class_registry.get_for_teacher(teacher_id)
+        if record is None:
+            return None
+        teacher_class = live_classes.setdefault(teacher_id, TeacherClass(record))
+    return teacher_class
+
+presence_tracker.attach(get_live_class, teacher_channel)
+
+
 @router.post("/class/create")
 async def create_class(teacher_id: str, class_name: str = "My Class"):
     """
@@ -80,11 +200,13 @@ async def create_class(teacher_id: str, class_name: str = "My Class"):
     Returns:
         Class code and information
     """
-    if teacher_id in classes_db:
+    if get_live_class(teacher_id) is not None:
         raise HTTPException(status_code=400, detail="Teacher already has an active class")
     
-    teacher_class = TeacherClass(teacher_id, class_name)
-    classes_db[teacher_id] = teacher_class
+    # Unauthenticated, so the class lives in memory only (as before); persisted
+    # classes with enrollment codes come from /auth/teacher/create-class
+    teacher_class = TeacherClass(class_registry.create_class(teacher_id, class_name, persist=False))
+    live_classes[teacher_id] = teacher_class
     
     return {
         "success": True,
@@ -112,12 +234,14 @@ async def add_student_to_class(
     Returns:
         Confirmation of student added
     """
-    if teacher_id not in classes_db:
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
         # Auto-create class if doesn't exist
-        classes_db[teacher_id] = TeacherClass(teacher_id)
+        teacher_class = TeacherClass(class_registry.create_class(teacher_id, "My Class", persist=False))
+        live_classes[teacher_id] = teacher_class
     
-    teacher_class = classes_db[teacher_id]
     teacher_class.add_student(student_id, student_name)
+    presence_tracker.touch(teacher_id, student_id)
     
     return {
         "success": True,
@@ -137,10 +261,10 @@ async def get_class_students(teacher_id: str):
     Returns:
         List of students and their current status
     """
-    if teacher_id not in classes_db:
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    teacher_class = classes_db[teacher_id]
     
     students = []
     for student_id, session in teacher_class.students.items():
@@ -175,10 +299,10 @@ async def get_class_stats(teacher_id: str):
     Returns:
         Class statistics including averages and trends
     """
-    if teacher_id not in classes_db:
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    teacher_class = classes_db[teacher_id]
     stats = teacher_class.get_stats()
     
     return {
@@ -186,11 +310,30 @@ async def get_class_stats(teacher_id: str):
         "active_students": stats.active_students,
         "average_mastery": round(stats.average_mastery, 2),
         "average_accuracy": round(stats.average_accuracy, 2),
+        "online_students": teacher_class.online_students,
         "total_practice_time": stats.total_practice_time,
         "phoneme_completion": calculate_class_phoneme_progress(teacher_class)
     }
 
 
+@router.get("/class/{teacher_id}/presence")
+async def get_class_presence(teacher_id: str):
+    """
+    Get how many students are online, active, idle and offline
+    
+    Args:
+        teacher_id: Teacher's ID
+        
+    Returns:
+        Presence counts (kept up to date by the presence tracker)
+    """
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
+        raise HTTPException(status_code=404, detail="Class not found")
+    
+    return teacher_class.presence_counts()
+
+
 @router.get("/class/{teacher_id}/student/{student_id}")
 async def get_student_details(teacher_id: str, student_id: str):
     """
@@ -203,10 +346,10 @@ async def get_student_details(teacher_id: str, student_id: str):
     Returns:
         Detailed student progress and performance metrics
     """
-    if teacher_id not in classes_db:
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    teacher_class = classes_db[teacher_id]
     if student_id not in teacher_class.students:
         raise HTTPException(status_code=404, detail="Student not found in class")
     
@@ -220,7 +363,7 @@ async def get_student_details(teacher_id: str, student_id: str):
         "accuracy": student.accuracy,
         "practice_time": student.practice_time,
         "streak": student.streak,
-        "mastered_phonemes": student.mastered_phonemes,
+        "mastered_phonemes": sorted(student.mastered_phonemes),
         "current_phoneme": student.current_phoneme,
         "current_activity": student.current_activity,
         "error_patterns": student.error_patterns,
@@ -229,14 +372,48 @@ async def get_student_details(teacher_id: str, student_id: str):
     }
 
 
+def apply_student_progress(
+    teacher_id: str,
+    student_id: str,
+    phoneme: str,
+    activity: str,
+    quality: int,
+    accuracy: float
+) -> Optional[str]:
+    """
+    Record a practice result in the class and queue it for the teacher's dashboard
+
+    Returns:
+        Error message if the class or student does not exist, else None
+    """
+    teacher_class = get_live_class(teacher_id)
+    if teacher_class is None:
+        return "Teacher class not found"
+    
+    if student_id not in teacher_class.students:
+        return "Student not in this class"
+    
+    teacher_class.record_progress(student_id, phoneme, activity, quality, accuracy)
+    presence_tracker.touch(teacher_id, student_id)
+    
+    # Sent to the teacher in the next coalesced class_delta frame
+    coalescer.record(
+        teacher_channel(teacher_id),
+        student_id,
+        {"phoneme": phoneme, "activity": activity, "accuracy": accuracy, "quality": quality},
+        {"attempts": 1, "high_quality": int(quality >= 4)}
+    )
+    return None
+
+
 @router.post("/student/{student_id}/update-progress")
 async def update_student_progress(
     student_id: str,
     teacher_id: str,
     phoneme: str,
     activity: str,
-    quality: int,
-    accuracy: float
+    quality: int = Query(ge=0, le=5),
+    accuracy: float = Query(ge=0, le=100, allow_inf_nan=False)
 ):
     """
     Update student progress in real-time
@@ -250,33 +427,9 @@ async def update_student_progress(
         quality: Quality score (0-5)
         accuracy: Accuracy percentage
     """
-    if teacher_id not in classes_db:
-        return {"error": "Teacher class not found"}
-    
-    teacher_class = classes_db[teacher_id]
-    if student_id not in teacher_class.students:
-        return {"error": "Student not in this class"}
-    
-    student = teacher_class.students[student_id]
-    student.current_phoneme = phoneme
-    student.current_activity = activity
-    student.accuracy = accuracy
-    student.last_active = datetime.now()
-    
-    # Update mastery based on quality
-    if quality >= 4:
-        if phoneme not in student.mastered_phonemes:
-            student.mastered_phonemes.append(phoneme)
-            student.mastery_level = len(student.mastered_phonemes) / 15
-    
-    # Broadcast update to teacher
-    await broadcast_class_update(teacher_id, {
-        "type": "student_progress",
-        "student_id": student_id,
-        "phoneme": phoneme,
-        "accuracy": accuracy,
-        "quality": quality
-    })
+    error = apply_student_progress(teacher_id, student_id, phoneme, activity, quality, accuracy)
+    if error:
+        return {"error": error}
     
     return {"success": True, "message": "Progress updated"}
 
@@ -286,35 +439,42 @@ async def websocket_teacher_endpoint(websocket: WebSocket, teacher_id: str):
     """
     WebSocket endpoint for real-time teacher dashboard
     Sends real-time student updates to teacher
-    """
-    await websocket.accept()
-    
-    if teacher_id not in active_connections:
-        active_connections[teacher_id] = []
     
-    active_connections[teacher_id].append(websocket)
+    Offer the "phonics.msgpack" or "phonics.struct" subprotocol for binary
+    frames; without one, frames are JSON text.
+    """
+    codec = await accept(websocket)
+    connection = hub.register(websocket, teacher_channel(teacher_id), codec)
     
     try:
         while True:
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = await receive_message(websocket, codec)
+            except ValueError:
+                continue  # Undecodable frame: drop it, keep the socket
+            connection.touch()
             
             if message.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                connection.send({"type": "pong"})
             elif message.get("type") == "get_class_stats":
-                if teacher_id in classes_db:
-                    stats = classes_db[teacher_id].get_stats()
-                    await websocket.send_json({
+                teacher_class = get_live_class(teacher_id)
+                if teacher_class is not None:
+                    stats = teacher_class.get_stats()
+                    connection.send({
                         "type": "class_stats",
                         "stats": {
                             "total_students": stats.total_students,
                             "active_students": stats.active_students,
+                            "online_students": teacher_class.online_students,
                             "average_mastery": stats.average_mastery
                         }
                     })
     
-    except WebSocketDisconnect:
-        active_connections[teacher_id].remove(websocket)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the hub closed the socket (slow consumer or heartbeat timeout)
+        pass
+    finally:
+        await hub.unregister(connection)
 
 
 @router.websocket("/ws/student/{student_id}")
@@ -322,38 +482,75 @@ async def websocket_student_endpoint(websocket: WebSocket, student_id: str):
     """
     WebSocket endpoint for student to teacher connection
     Allows students to send real-time updates to teacher dashboard
+    
+    {"type": "progress", "teacher_id", "phoneme", "activity", "quality", "accuracy"}
+    messages are recorded like update-progress and reach the dashboard in the
+    next class_delta frame (and have a compact struct frame); other messages
+    are relayed one by one as {"type": "student_update", "student_id", "data"}.
+    Undecodable frames and invalid progress messages are dropped.
     """
-    await websocket.accept()
+    codec = await accept(websocket)
+    teacher_ids = set()
+    unknown_classes = set()
     
     try:
         while True:
-            data = await websocket.receive_text()
-            update = json.loads(data)
+            try:
+                update = await receive_message(websocket, codec)
+            except ValueError:
+                continue
             
-            # Broadcast to teacher
             teacher_id = update.get("teacher_id")
-            if teacher_id and teacher_id in active_connections:
-                for teacher_ws in active_connections[teacher_id]:
-                    await teacher_ws.send_json({
-                        "type": "student_update",
-                        "student_id": student_id,
-                        "data": update
-                    })
+            if not teacher_id or not isinstance(teacher_id, str):
+                continue
+            teacher_ids.add(teacher_id)
+            if update.get("type") == "progress":
+                try:
+                    progress = StudentProgressMessage.model_validate(update)
+                    error = apply_student_progress(
+                        teacher_id, student_id, progress.phoneme, progress.activity,
+                        progress.quality, progress.accuracy
+                    )
+                    if error:
+                        # Class state is per worker (see services/pubsub.py): the student may have
+                        # joined through another one. Still relay the result to the dashboard.
+                        if teacher_id not in unknown_classes:
+                            unknown_classes.add(teacher_id)
+                            print(f"⚠️  Progress from student {student_id} for {teacher_id} not recorded here: {error}")
+                        coalescer.record(
+                            teacher_channel(teacher_id),
+                            student_id,
+                            {"phoneme": progress.phoneme, "activity": progress.activity,
+                             "accuracy": progress.accuracy, "quality": progress.quality},
+                            {"attempts": 1, "high_quality": int(progress.quality >= 4)}
+                        )
+                except (KeyError, ValueError, TypeError) as e:
+                    print(f"⚠️  Dropped progress message from student {student_id}: {e}")
+            else:
+                # Not a progress snapshot, so it is relayed as-is rather than coalesced
+                presence_tracker.touch(teacher_id, student_id)
+                await broadcast(teacher_channel(teacher_id), {
+                    "type": "student_update",
+                    "student_id": student_id,
+                    "data": update
+                })
     
     except WebSocketDisconnect:
         pass
+    finally:
+        for teacher_id in teacher_ids:
+            presence_tracker.disconnect(teacher_id, student_id)
 
 
 async def broadcast_class_update(teacher_id: str, message: dict):
     """
     Broadcast an update to all connected teachers in a class
+
+    The message is serialized once, published on the pub/sub bus so every
+    worker receives it, and queued per connection; slow or dead sockets are
+    evicted by the hub instead of delaying the others.
     """
-    if teacher_id in active_connections:
-        for websocket in active_connections[teacher_id]:
-            try:
-                await websocket.send_json(message)
-            except:
-                pass
+    await broadcast(teacher_channel(teacher_id), message)
 
 
 @router.post("/class/{teacher_id}/send-message")
@@ -370,7 +567,7 @@ async def send_message_to_class(
         student_id: Specific student (or None for whole class)
         message: Message content
     """
-    if teacher_id not in classes_db:
+    if get_live_class(teacher_id) is None:
         raise HTTPException(status_code=404, detail="Class not found")
     
     # Broadcast message via WebSocket
@@ -389,21 +586,15 @@ async def send_message_to_class(
 
 
 def calculate_class_phoneme_progress(teacher_class: TeacherClass) -> dict:
-    """Calculate overall phoneme mastery across the class"""
-    all_phonemes = ['a', 'e', 'i', 'o', 'u', 'b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm']
-    
-    if not teacher_class.students:
-        return {p: {"mastered": 0, "practicing": 0, "learning": 0} for p in all_phonemes}
-    
-    phoneme_stats = {p: {"mastered": 0, "practicing": 0, "learning": 0} for p in all_phonemes}
-    
-    for student in teacher_class.students.values():
-        for phoneme in all_phonemes:
-            if phoneme in student.mastered_phonemes:
-                phoneme_stats[phoneme]["mastered"] += 1
-            elif phoneme == student.current_phoneme:
-                phoneme_stats[phoneme]["practicing"] += 1
-            else:
-                phoneme_stats[phoneme]["learning"] += 1
-    
+    """Overall phoneme mastery across the class, from the per-phoneme counters"""
+    total = len(teacher_class.students)
+    phoneme_stats = {}
+    for phoneme in CLASS_PHONEMES:
+        mastered = teacher_class.phoneme_mastered[phoneme]
+        practicing = teacher_class.phoneme_practicing[phoneme]
+        phoneme_stats[phoneme] = {
+            "mastered": mastered,
+            "practicing": practicing,
+            "learning": total - mastered - practicing
+        }
     return phoneme_stats
@@ -1,18 +1,27 @@
 """
 Usage Tracking API Routes
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, tuple_
+import asyncio
+import json
 
 from ..db.database import get_db
 from ..db.models import ActivityLog, UsageLog, Student, StudentProgress, License
+from ..middleware.entitlements import require_features
+from ..services.export_service import export_activity_logs, summarize_exported_activity
+from ..utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter()
 
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+
 class ActivityCreate(BaseModel):
     student_id: int
     lesson_id: str
@@ -134,7 +143,7 @@ async def log_usage(usage: UsageLogCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/tracking/student/{student_id}/summary")
+@router.get("/tracking/student/{student_id}/summary", dependencies=[Depends(require_features("progress_tracking"))])
 async def get_student_summary(student_id: int, db: Session = Depends(get_db)):
     """
     Get student activity summary
@@ -188,28 +197,120 @@ async def get_student_summary(student_id: int, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/tracking/student/{student_id}/progress")
-async def get_student_progress(student_id: int, limit: int = 20, db: Session = Depends(get_db)):
+def _ndjson_response(query, serialize) -> StreamingResponse:
+    """
+    Stream query results as newline-delimited JSON
+
+    Rows are fetched through a server-side cursor (yield_per) so only one
+    batch is held in the API process at a time. The request's session stays
+    open until the body is fully sent (get_db exits after the response).
+    """
+    def generate():
+        for row in query.yield_per(STREAM_BATCH_SIZE):
+            yield json.dumps(serialize(row)) + "\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+def _serialize_progress(p: StudentProgress) -> dict:
+    return {
+        "phoneme": p.phoneme,
+        "mastery_level": p.mastery_level,
+        "attempts": p.attempts,
+        "correct_attempts": p.correct_attempts,
+        "last_practiced": p.last_practiced.isoformat()
+    }
+
+def _serialize_activity(log: ActivityLog) -> dict:
+    return {
+        "id": log.id,
+        "lesson_id": log.lesson_id,
+        "activity_type": log.activity_type,
+        "score": log.score,
+        "duration_seconds": log.duration_seconds,
+        "created_at": log.created_at.isoformat()
+    }
+
+def _serialize_usage(log: UsageLog) -> dict:
+    return {
+        "id": log.id,
+        "action": log.action,
+        "details": log.details,
+        "created_at": log.created_at.isoformat()
+    }
+
+@router.get("/tracking/student/{student_id}/progress", dependencies=[Depends(require_features("progress_tracking"))])
+async def get_student_progress(
+    student_id: int,
+    limit: int = Query(default=20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
     """
     Get detailed student progress by phoneme
+    
+    Pages are ordered by most recently practiced; pass `next_cursor` back as
+    `cursor` for the following page. `format=ndjson` streams every remaining row.
     """
+    after = decode_cursor(cursor, 2)
     try:
-        progress_data = db.query(StudentProgress).filter(
+        query = db.query(StudentProgress).filter(
             StudentProgress.student_id == student_id
-        ).order_by(desc(StudentProgress.last_practiced)).limit(limit).all()
+        )
+        if after:
+            query = query.filter(
+                tuple_(StudentProgress.last_practiced, StudentProgress.id) < tuple_(*after)
+            )
+        query = query.order_by(desc(StudentProgress.last_practiced), desc(StudentProgress.id))
+        
+        if format == "ndjson":
+            return _ndjson_response(query, _serialize_progress)
+        
+        progress_data = query.limit(limit).all()
+        last = progress_data[-1] if len(progress_data) == limit else None
         
         return {
             "student_id": student_id,
-            "progress": [
-                {
-                    "phoneme": p.phoneme,
-                    "mastery_level": p.mastery_level,
-                    "attempts": p.attempts,
-                    "correct_attempts": p.correct_attempts,
-                    "last_practiced": p.last_practiced.isoformat()
-                }
-                for p in progress_data
-            ]
+            "progress": [_serialize_progress(p) for p in progress_data],
+            "next_cursor": encode_cursor(last.last_practiced, last.id) if last else None
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tracking/student/{student_id}/activity", dependencies=[Depends(require_features("progress_tracking"))])
+async def get_student_activity(
+    student_id: int,
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    days: Optional[int] = None,
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Get a student's activity log, newest first, with keyset pagination
+    
+    `format=ndjson` streams every remaining row.
+    """
+    after = decode_cursor(cursor, 2)
+    try:
+        query = db.query(ActivityLog).filter(ActivityLog.student_id == student_id)
+        if days is not None:
+            query = query.filter(ActivityLog.created_at >= datetime.utcnow() - timedelta(days=days))
+        if after:
+            query = query.filter(tuple_(ActivityLog.created_at, ActivityLog.id) < tuple_(*after))
+        query = query.order_by(desc(ActivityLog.created_at), desc(ActivityLog.id))
+        
+        if format == "ndjson":
+            return _ndjson_response(query, _serialize_activity)
+        
+        logs = query.limit(limit).all()
+        last = logs[-1] if len(logs) == limit else None
+        
+        return {
+            "student_id": student_id,
+            "activity": [_serialize_activity(log) for log in logs],
+            "next_cursor": encode_cursor(last.created_at, last.id) if last else None
         }
         
     except Exception as e:
@@ -228,27 +329,88 @@ async def get_license_usage(license_key: str, days: int = 30, db: Session = Depe
         if not license:
             raise HTTPException(status_code=404, detail="License not found")
         
-        # Get usage logs from last N days
-        since_date = datetime.utcnow() - timedelta(days=days)
-        usage_logs = db.query(UsageLog).filter(
+        # Aggregate usage from last N days in the database (bounded on both
+        # sides so only the monthly partitions covering the window are scanned)
+        until_date = datetime.utcnow()
+        since_date = until_date - timedelta(days=days)
+        breakdown = db.query(
+            UsageLog.action,
+            func.count(UsageLog.id),
+            func.min(UsageLog.created_at),
+            func.max(UsageLog.created_at)
+        ).filter(
             UsageLog.license_id == license.id,
-            UsageLog.created_at >= since_date
-        ).all()
+            UsageLog.created_at >= since_date,
+            UsageLog.created_at <= until_date
+        ).group_by(UsageLog.action).all()
         
-        # Count actions
-        action_counts = {}
-        for log in usage_logs:
-            action_counts[log.action] = action_counts.get(log.action, 0) + 1
+        action_counts = {action: count for action, count, _, _ in breakdown}
+        first_activity = min((first for _, _, first, _ in breakdown), default=None)
+        last_activity = max((last for _, _, _, last in breakdown), default=None)
         
         return {
             "license_key": license_key,
             "period_days": days,
-            "total_actions": len(usage_logs),
+            "total_actions": sum(action_counts.values()),
             "actions_breakdown": action_counts,
-            "first_activity": usage_logs[-1].created_at.isoformat() if usage_logs else None,
-            "last_activity": usage_logs[0].created_at.isoformat() if usage_logs else None
+            "first_activity": first_activity.isoformat() if first_activity else None,
+            "last_activity": last_activity.isoformat() if last_activity else None
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tracking/license/{license_key}/usage/logs")
+async def get_license_usage_logs(
+    license_key: str,
+    days: int = 30,
+    limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: str = "json",
+    db: Session = Depends(get_db)
+):
+    """
+    Get raw license usage logs, newest first, with keyset pagination
+    
+    `format=ndjson` streams every remaining row, for exporting months of usage.
+    """
+    after = decode_cursor(cursor, 2)
+    try:
+        license = db.query(License).filter(
+            License.license_key == license_key
+        ).first()
+        
+        if not license:
+            raise HTTPException(status_code=404, detail="License not found")
+        
+        until_date = datetime.utcnow()
+        since_date = until_date - timedelta(days=days)
+        query = db.query(UsageLog).filter(
+            UsageLog.license_id == license.id,
+            UsageLog.created_at >= since_date,
+            UsageLog.created_at <= until_date
+        )
+        if after:
+            query = query.filter(tuple_(UsageLog.created_at, UsageLog.id) < tuple_(*after))
+        query = query.order_by(desc(UsageLog.created_at), desc(UsageLog.id))
+        
+        if format == "ndjson":
+            return _ndjson_response(query, _serialize_usage)
+        
+        logs = query.limit(limit).all()
+        last = logs[-1] if len(logs) == limit else None
+        
+        return {
+            "license_key": license_key,
+            "period_days": days,
+            "logs": [_serialize_usage(log) for log in logs],
+            "next_cursor": encode_cursor(last.created_at, last.id) if last else None
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -271,14 +433,17 @@ async def get_analytics_overview(db: Session = Depends(get_db)):
         total_students = db.query(func.count(Student.id)).scalar()
         
         # Total activities (last 30 days)
-        since_date = datetime.utcnow() - timedelta(days=30)
+        until_date = datetime.utcnow()
+        since_date = until_date - timedelta(days=30)
         recent_activities = db.query(func.count(ActivityLog.id)).filter(
-            ActivityLog.created_at >= since_date
+            ActivityLog.created_at >= since_date,
+            ActivityLog.created_at <= until_date
         ).scalar()
         
         # Lessons completed (last 30 days)
         recent_lessons = db.query(func.count(ActivityLog.id)).filter(
             ActivityLog.created_at >= since_date,
+            ActivityLog.created_at <= until_date,
             ActivityLog.activity_type == "lesson_complete"
         ).scalar()
         
@@ -292,3 +457,40 @@ async def get_analytics_overview(db: Session = Depends(get_db)):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tracking/export/activity", dependencies=[Depends(require_features("analytics"))])
+async def export_activity_history(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    format: Optional[str] = None
+):
+    """
+    Export activity history to cold storage (Parquet, or gzip CSV without pyarrow)
+    """
+    try:
+        manifest = await asyncio.to_thread(
+            export_activity_logs, since=since, until=until, fmt=format
+        )
+        return {"success": True, **manifest}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/tracking/export/student/{student_id}/summary", dependencies=[Depends(require_features("analytics"))])
+async def get_exported_student_summary(
+    student_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """
+    Get a student activity summary computed from exported files (no database access)
+    """
+    try:
+        return await asyncio.to_thread(
+            summarize_exported_activity, student_id, since=since, until=until
+        )
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,145 @@
+"""
+Authentication Cache
+Short-lived, size-bounded cache of verified JWT claims and user rows so
+authenticated requests skip the signature check and the user lookup
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+import hashlib
+import os
+import threading
+import time
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..db.models import User
+
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+class TTLCache:
+    """LRU cache whose entries also expire after a per-entry deadline"""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+_claims_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES)
+_user_cache = TTLCache(AUTH_CACHE_MAX_ENTRIES)
+_user_tokens: Dict[int, Set[str]] = {}
+_user_tokens_lock = threading.Lock()
+
+_USER_COLUMNS = [attr.key for attr in inspect(User).column_attrs]
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def get_cached_claims(token: str) -> Optional[dict]:
+    """Return previously verified claims for a token, if still cached"""
+    return _claims_cache.get(_token_key(token))
+
+def cache_claims(token: str, claims: dict):
+    """
+    Cache verified claims for a token
+
+    Entries never outlive the token's own expiry.
+    """
+    ttl = AUTH_CACHE_TTL_SECONDS
+    if "exp" in claims:
+        ttl = min(ttl, claims["exp"] - time.time())
+
+    key = _token_key(token)
+    _claims_cache.set(key, claims, ttl)
+
+    user_id = claims.get("user_id")
+    if user_id is not None:
+        with _user_tokens_lock:
+            tokens = {k for k in _user_tokens.pop(user_id, set()) if k in _claims_cache}
+            tokens.add(key)
+            _user_tokens[user_id] = tokens
+            # Oldest users first; their claims have long been evicted from the LRU
+            while len(_user_tokens) > AUTH_CACHE_MAX_ENTRIES:
+                _user_tokens.pop(next(iter(_user_tokens)))
+
+def get_cached_user(db: Session, user_id: int) -> Optional[User]:
+    """
+    Return a cached user attached to the given session, without a query
+
+    The cached row is rebuilt as a detached instance and added to the session,
+    so changes made by the endpoint are flushed as usual on commit.
+    """
+    snapshot = _user_cache.get(user_id)
+    if snapshot is None:
+        return None
+
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+def cache_user(user: User):
+    """Cache the column values of a freshly loaded user"""
+    _user_cache.set(user.id, {key: getattr(user, key) for key in _USER_COLUMNS}, AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_user(user_id: int):
+    """
+    Drop a user's cached row and every cached token claim for that user
+
+    Call after logout, password change, role change or any other change that
+    affects authentication or authorization.
+    """
+    _user_cache.pop(user_id)
+    with _user_tokens_lock:
+        keys = _user_tokens.pop(user_id, set())
+    for key in keys:
+        _claims_cache.pop(key)
+
+def get_auth_cache_stats() -> dict:
+    """Hit/miss counters for the claims and user caches"""
+    return {
+        "claims": {"size": len(_claims_cache), "hits": _claims_cache.hits, "misses": _claims_cache.misses},
+        "users": {"size": len(_user_cache), "hits": _user_cache.hits, "misses": _user_cache.misses},
+        "ttl_seconds": AUTH_CACHE_TTL_SECONDS
+    }
@@ -3,12 +3,18 @@ Authentication and Security Service
 Handles JWT tokens, password hashing, and user authentication
 """
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+import asyncio
+import itertools
 import os
 import secrets
+import time
+
 
 # Security Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_urlsafe(32))  # Generate random if not set
@@ -16,7 +22,14 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))  # Tune with benchmark_password_hashing.py
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Password hashing pool (bcrypt releases the GIL, so threads hash in parallel)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+PASSWORD_HASH_LOGIN_RESERVE = int(os.getenv("PASSWORD_HASH_LOGIN_RESERVE", 16))  # Slots only logins may use
+PASSWORD_HASH_MAX_WAIT_SECONDS = float(os.getenv("PASSWORD_HASH_MAX_WAIT_SECONDS", 5))
 
 def hash_password(password: str) -> str:
     """
@@ -45,6 +58,189 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHashPool:
+    """
+    Bounded pool that runs bcrypt off the event loop
+
+    Jobs wait in a priority queue served by a fixed number of worker threads:
+    logins are served before registration/password-change hashing, and a
+    share of the queue is reserved for them, so a login storm at the start of
+    the school day degrades other account operations first. When the queue is
+    full, or a job has waited longer than max_wait, the request is rejected
+    with 503 instead of piling up behind the pool.
+    """
+    LOGIN = 0
+    ACCOUNT = 1
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        login_reserve: int = PASSWORD_HASH_LOGIN_RESERVE,
+        max_wait: float = PASSWORD_HASH_MAX_WAIT_SECONDS
+    ):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.login_reserve = min(login_reserve, max_pending)
+        self.max_wait = max_wait
+        self.pending = {self.LOGIN: 0, self.ACCOUNT: 0}
+        self.completed = 0
+        self.rejected = 0
+        self.latencies_ms = deque(maxlen=1000)
+        self._sequence = itertools.count()
+        self._loop = None
+        self._queue = None
+        self._executor = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _reject(self, detail: str):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": "1"}
+        )
+
+    async def run(self, func: Callable, *args, priority: int = ACCOUNT):
+        """
+        Run a hashing function in the pool
+
+        Raises:
+            HTTPException: 503 if the pool is saturated
+        """
+        self._ensure_started()
+
+        total_pending = sum(self.pending.values())
+        limit = self.max_pending if priority == self.LOGIN else self.max_pending - self.login_reserve
+        if total_pending >= limit:
+            self._reject("Server busy, please try again")
+
+        future = self._loop.create_future()
+        started = time.monotonic()
+        self.pending[priority] += 1
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), started, future, func, args))
+            result = await future
+        finally:
+            self.pending[priority] -= 1
+
+        self.completed += 1
+        self.latencies_ms.append((time.monotonic() - started) * 1000)
+        return result
+
+    async def _worker(self):
+        while True:
+            priority, _, enqueued, future, func, args = await self._queue.get()
+            if future.done():
+                continue
+            if time.monotonic() - enqueued > self.max_wait:
+                self.rejected += 1
+                future.set_exception(HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server busy, please try again",
+                    headers={"Retry-After": "1"}
+                ))
+                continue
+            try:
+                result = await self._loop.run_in_executor(self._executor, func, *args)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+    def get_stats(self) -> Dict:
+        """Queue depth, throughput and latency percentiles"""
+        latencies = sorted(self.latencies_ms)
+
+        def percentile(fraction):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 2)
+
+        return {
+            "workers": self.workers,
+            "bcrypt_rounds": BCRYPT_ROUNDS,
+            "pending_logins": self.pending[self.LOGIN],
+            "pending_other": self.pending[self.ACCOUNT],
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "p50_ms": percentile(0.5),
+            "p99_ms": percentile(0.99)
+        }
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+        self._loop = None
+
+password_hash_pool = PasswordHashPool()
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password in the hashing pool without blocking the event loop
+
+    Raises:
+        HTTPException: 503 if the hashing pool is saturated
+    """
+    return await password_hash_pool.run(hash_password, password, priority=PasswordHashPool.ACCOUNT)
+
+async def verify_password_async(plain_password: str, hashed_password: str, login: bool = True) -> bool:
+    """
+    Verify a password in the hashing pool without blocking the event loop
+
+    Args:
+        plain_password: Plain text password to verify
+        hashed_password: Hashed password from database
+        login: Whether this is a login (served ahead of other hashing work)
+
+    Raises:
+        HTTPException: 503 if the hashing pool is saturated
+    """
+    priority = PasswordHashPool.LOGIN if login else PasswordHashPool.ACCOUNT
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password, priority=priority)
+
+def benchmark_work_factor(target_p99_ms: float, rounds_range=range(10, 15), samples: int = 20) -> Dict:
+    """
+    Measure bcrypt verify latency per work factor on this machine
+
+    Args:
+        target_p99_ms: Latency budget for a single verification
+        rounds_range: Work factors to try
+        samples: Verifications timed per work factor
+
+    Returns:
+        Dictionary with per-round p50/p99 and the highest work factor within budget
+    """
+    results = {}
+    recommended = None
+    for rounds in rounds_range:
+        context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+        hashed = context.hash("Benchmark1Password")
+        timings = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            context.verify("Benchmark1Password", hashed)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(0.99 * len(timings)))]
+        results[rounds] = {"p50_ms": round(timings[len(timings) // 2], 2), "p99_ms": round(p99, 2)}
+        if p99 <= target_p99_ms:
+            recommended = rounds
+
+    return {"target_p99_ms": target_p99_ms, "rounds": results, "recommended_rounds": recommended}
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create a JWT access token
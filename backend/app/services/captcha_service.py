@@ -3,10 +3,15 @@ CAPTCHA Integration Service
 Support for Google reCAPTCHA v3 and hCaptcha
 """
 from fastapi import HTTPException, status
+import asyncio
+import hashlib
 import httpx
 import os
+import time
 from typing import Optional
 
+from .ttl_store import TTLStore
+
 # CAPTCHA Configuration
 RECAPTCHA_SECRET_KEY = os.getenv("RECAPTCHA_SECRET_KEY", "")
 RECAPTCHA_VERIFY_URL = "https://www.google.com/recaptcha/api/siteverify"
@@ -15,6 +20,138 @@ RECAPTCHA_MIN_SCORE = 0.5  # reCAPTCHA v3 score threshold (0.0-1.0)
 HCAPTCHA_SECRET_KEY = os.getenv("HCAPTCHA_SECRET_KEY", "")
 HCAPTCHA_VERIFY_URL = "https://hcaptcha.com/siteverify"
 
+# "stub" verifies locally without network calls (load tests); tokens starting with "fail" are rejected
+CAPTCHA_PROVIDER = os.getenv("CAPTCHA_PROVIDER", "")
+CAPTCHA_STUB_LATENCY_MS = float(os.getenv("CAPTCHA_STUB_LATENCY_MS", 0))
+
+# Outbound verification client
+CAPTCHA_TIMEOUT_SECONDS = float(os.getenv("CAPTCHA_TIMEOUT_SECONDS", 2.0))
+CAPTCHA_MAX_CONNECTIONS = int(os.getenv("CAPTCHA_MAX_CONNECTIONS", 20))
+CAPTCHA_BREAKER_FAILURES = int(os.getenv("CAPTCHA_BREAKER_FAILURES", 5))
+CAPTCHA_BREAKER_RESET_SECONDS = float(os.getenv("CAPTCHA_BREAKER_RESET_SECONDS", 30))
+
+# Tokens are single-use; remember verified ones for longer than providers accept them
+CAPTCHA_TOKEN_TTL_SECONDS = 300
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a cool-down period
+
+    After `failure_threshold` consecutive failures the breaker opens; once
+    `reset_timeout` has passed one trial call is let through (half-open), and
+    its outcome closes or re-opens the breaker.
+    """
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def release_trial(self):
+        """Let another trial through after one ended without an outcome (e.g. cancelled)"""
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+captcha_breaker = CircuitBreaker(CAPTCHA_BREAKER_FAILURES, CAPTCHA_BREAKER_RESET_SECONDS)
+verified_tokens = TTLStore("captcha_tokens", CAPTCHA_TOKEN_TTL_SECONDS)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive client for CAPTCHA verification calls"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(CAPTCHA_TIMEOUT_SECONDS, connect=min(1.0, CAPTCHA_TIMEOUT_SECONDS)),
+            limits=httpx.Limits(
+                max_connections=CAPTCHA_MAX_CONNECTIONS,
+                max_keepalive_connections=CAPTCHA_MAX_CONNECTIONS
+            )
+        )
+    return _http_client
+
+async def close_captcha_client():
+    """Close the shared client (application shutdown)"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _check_replay(token: str):
+    if _token_key(token) in verified_tokens:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CAPTCHA token already used"
+        )
+
+async def _stub_siteverify(token: str, action: Optional[str]) -> dict:
+    if CAPTCHA_STUB_LATENCY_MS:
+        await asyncio.sleep(CAPTCHA_STUB_LATENCY_MS / 1000)
+    success = bool(token) and not token.startswith("fail")
+    return {"success": success, "score": 0.9 if success else 0.0, "action": action}
+
+async def _siteverify(url: str, secret: str, token: str, action: Optional[str] = None) -> Optional[dict]:
+    """
+    Call a provider's siteverify endpoint through the shared client
+
+    Returns:
+        Provider response, or None if the provider is unavailable (fail open)
+    """
+    if CAPTCHA_PROVIDER == "stub":
+        return await _stub_siteverify(token, action)
+
+    if not captcha_breaker.allow_request():
+        return None
+
+    try:
+        response = await get_http_client().post(url, data={"secret": secret, "response": token})
+        if response.status_code >= 500:
+            raise httpx.HTTPStatusError("CAPTCHA provider error", request=response.request, response=response)
+        result = response.json()
+    except (httpx.HTTPError, ValueError) as e:
+        captcha_breaker.record_failure()
+        print(f"⚠️  CAPTCHA verification unavailable ({captcha_breaker.state}): {e}")
+        return None
+    except BaseException:
+        # Cancelled (client disconnected) or an unexpected error: no verdict on the
+        # provider, but a half-open breaker must not wait for this trial forever
+        captcha_breaker.release_trial()
+        raise
+
+    captcha_breaker.record_success()
+    return result
+
 async def verify_recaptcha(token: str, action: str = "login") -> bool:
     """
     Verify Google reCAPTCHA v3 token
@@ -29,49 +166,41 @@ async def verify_recaptcha(token: str, action: str = "login") -> bool:
     Raises:
         HTTPException: If verification failed
     """
-    if not RECAPTCHA_SECRET_KEY:
+    if not RECAPTCHA_SECRET_KEY and CAPTCHA_PROVIDER != "stub":
         # Skip in development if not configured
         return True
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                RECAPTCHA_VERIFY_URL,
-                data={
-                    "secret": RECAPTCHA_SECRET_KEY,
-                    "response": token
-                }
-            )
-            
-            result = response.json()
-            
-            if not result.get("success"):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="CAPTCHA verification failed"
-                )
-            
-            # Check score (v3 only)
-            score = result.get("score", 0)
-            if score < RECAPTCHA_MIN_SCORE:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Bot activity detected"
-                )
-            
-            # Verify action matches
-            if result.get("action") != action:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid CAPTCHA action"
-                )
-            
-            return True
-            
-        except httpx.RequestError:
-            # Allow requests to pass if CAPTCHA service is down (fail open)
-            # In production, consider failing closed for security
-            return True
+    _check_replay(token)
+    result = await _siteverify(RECAPTCHA_VERIFY_URL, RECAPTCHA_SECRET_KEY, token, action)
+    
+    if result is None:
+        # Allow requests to pass if CAPTCHA service is down (fail open)
+        # In production, consider failing closed for security
+        return True
+    
+    if not result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CAPTCHA verification failed"
+        )
+    
+    # Check score (v3 only)
+    score = result.get("score", 0)
+    if score < RECAPTCHA_MIN_SCORE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Bot activity detected"
+        )
+    
+    # Verify action matches
+    if result.get("action") != action:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid CAPTCHA action"
+        )
+    
+    verified_tokens.set(_token_key(token), True)
+    return True
 
 async def verify_hcaptcha(token: str) -> bool:
     """
@@ -86,33 +215,25 @@ async def verify_hcaptcha(token: str) -> bool:
     Raises:
         HTTPException: If verification failed
     """
-    if not HCAPTCHA_SECRET_KEY:
+    if not HCAPTCHA_SECRET_KEY and CAPTCHA_PROVIDER != "stub":
         # Skip in development if not configured
         return True
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                HCAPTCHA_VERIFY_URL,
-                data={
-                    "secret": HCAPTCHA_SECRET_KEY,
-                    "response": token
-                }
-            )
-            
-            result = response.json()
-            
-            if not result.get("success"):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="CAPTCHA verification failed"
-                )
-            
-            return True
-            
-        except httpx.RequestError:
-            # Fail open if service is down
-            return True
+    _check_replay(token)
+    result = await _siteverify(HCAPTCHA_VERIFY_URL, HCAPTCHA_SECRET_KEY, token)
+    
+    if result is None:
+        # Fail open if service is down
+        return True
+    
+    if not result.get("success"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CAPTCHA verification failed"
+        )
+    
+    verified_tokens.set(_token_key(token), True)
+    return True
 
 def get_captcha_config() -> dict:
     """
@@ -122,7 +243,7 @@ def get_captcha_config() -> dict:
         Dictionary with CAPTCHA settings
     """
     return {
-        "enabled": bool(RECAPTCHA_SECRET_KEY or HCAPTCHA_SECRET_KEY),
-        "provider": "recaptcha" if RECAPTCHA_SECRET_KEY else "hcaptcha" if HCAPTCHA_SECRET_KEY else None,
+        "enabled": bool(RECAPTCHA_SECRET_KEY or HCAPTCHA_SECRET_KEY or CAPTCHA_PROVIDER == "stub"),
+        "provider": "recaptcha" if RECAPTCHA_SECRET_KEY else "hcaptcha" if HCAPTCHA_SECRET_KEY else CAPTCHA_PROVIDER or None,
         "site_key": os.getenv("RECAPTCHA_SITE_KEY", "") or os.getenv("HCAPTCHA_SITE_KEY", "")
     }
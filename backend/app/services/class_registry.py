@@ -0,0 +1,277 @@
+"""
+Class Registry
+The single store of teacher classes (the teacher_classes table) with cached
+code -> class and teacher -> class indexes, so enrollment and dashboard
+lookups do not query the database on every request
+
+Class codes are derived from the row id through a fixed permutation of the
+8-character code space, so allocating one is an insert plus an update with
+no "is this code taken?" loop, and consecutive classes get unrelated codes.
+"""
+from typing import Dict, NamedTuple, Optional, Union
+import itertools
+import os
+import secrets
+import string
+import threading
+import uuid
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db.database import get_db_context
+from ..db.models import TeacherClass as ClassRow
+from .auth_cache import TTLCache
+
+CLASS_CACHE_TTL_SECONDS = float(os.getenv("CLASS_CACHE_TTL_SECONDS", 300))
+CLASS_NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv("CLASS_NEGATIVE_CACHE_TTL_SECONDS", 10))
+CLASS_CACHE_MAX_ENTRIES = int(os.getenv("CLASS_CACHE_MAX_ENTRIES", 50000))
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+CODE_SPACE = len(CODE_ALPHABET) ** CODE_LENGTH
+
+# id -> (id * multiplier + offset) mod CODE_SPACE is a bijection because the
+# multiplier shares no factor (2 or 3) with 36^8
+_CODE_MULTIPLIER = 1_181_783_497_277
+_CODE_OFFSET = 492_748_161_301
+
+# A row whose code is already taken by a legacy (random) code falls back to
+# the code of id + stride; ids stay far below the stride
+_CODE_VARIANT_STRIDE = 2 ** 40
+_CODE_VARIANTS = 2
+
+# In-memory classes (dashboard classes, or any class created while the
+# database is unavailable) take ids from the top of the code space, above
+# every persisted id and its variants. Each process starts at a random point
+# in that range, so workers do not hand out the same codes.
+_LOCAL_ID_SPAN = 2 ** 39
+_LOCAL_ID_BASE = CODE_SPACE - _LOCAL_ID_SPAN
+
+def encode_class_code(class_id: int) -> str:
+    """
+    Class code for a class id (unique for ids below CODE_SPACE)
+
+    Raises:
+        ValueError: If the id is outside the code space
+    """
+    if not 0 < class_id < CODE_SPACE:
+        raise ValueError(f"Class id {class_id} is outside the class code space")
+    value = (class_id * _CODE_MULTIPLIER + _CODE_OFFSET) % CODE_SPACE
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, digit = divmod(value, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[digit])
+    return "".join(reversed(chars))
+
+def normalize_class_code(code: str) -> str:
+    return code.strip().upper()
+
+class ClassRecord(NamedTuple):
+    id: int
+    teacher_id: str
+    class_name: str
+    class_code: str
+    description: Optional[str]
+    max_students: int
+    is_active: bool
+    persisted: bool = True
+
+_NOT_FOUND = object()
+
+class ClassRegistry:
+    """Database-backed class store with read-through code and teacher caches"""
+    def __init__(self, cache_ttl: float = CLASS_CACHE_TTL_SECONDS, max_entries: int = CLASS_CACHE_MAX_ENTRIES):
+        self.cache_ttl = cache_ttl
+        self._by_code = TTLCache(max_entries)
+        self._by_teacher = TTLCache(max_entries)
+        # Classes that could not be written (database unavailable); served from memory
+        self._unpersisted: Dict[str, ClassRecord] = {}
+        self._local_ids = itertools.count(_LOCAL_ID_BASE + secrets.randbelow(_LOCAL_ID_SPAN // 2))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _from_row(row: ClassRow) -> ClassRecord:
+        return ClassRecord(
+            id=row.id,
+            teacher_id=str(row.teacher_id),
+            class_name=row.class_name,
+            class_code=row.class_code,
+            description=row.description,
+            max_students=row.max_students if row.max_students is not None else 30,
+            is_active=bool(row.is_active)
+        )
+
+    def _remember(self, record: ClassRecord):
+        self._by_code.set(record.class_code, record, self.cache_ttl)
+        if record.is_active:
+            self._by_teacher.set(record.teacher_id, record, self.cache_ttl)
+
+    def _insert(self, db: Session, teacher_id: int, class_name: str,
+                description: Optional[str], max_students: int) -> ClassRecord:
+        # The code depends on the id, which only exists after the insert
+        row = ClassRow(
+            teacher_id=teacher_id,
+            class_name=class_name,
+            class_code=f"pending-{uuid.uuid4().hex}",
+            description=description,
+            max_students=max_students,
+            is_active=True
+        )
+        db.add(row)
+        db.flush()
+        for variant in range(_CODE_VARIANTS):
+            try:
+                with db.begin_nested():
+                    row.class_code = encode_class_code(row.id + variant * _CODE_VARIANT_STRIDE)
+            except IntegrityError:
+                # Only possible against a legacy random code; try the id's alternate code
+                continue
+            db.commit()
+            return self._from_row(row)
+        db.rollback()
+        raise RuntimeError("Could not allocate a class code")
+
+    def _create_local(self, teacher_id: Union[int, str], class_name: str, description: Optional[str],
+                      max_students: int) -> ClassRecord:
+        class_id = next(self._local_ids)
+        record = ClassRecord(
+            id=class_id,
+            teacher_id=str(teacher_id),
+            class_name=class_name,
+            class_code=encode_class_code(class_id),
+            description=description,
+            max_students=max_students,
+            is_active=True,
+            persisted=False
+        )
+        with self._lock:
+            self._unpersisted[record.class_code] = record
+        return record
+
+    def create_class(self, teacher_id: Union[int, str], class_name: str, description: Optional[str] = None,
+                     max_students: int = 30, db: Optional[Session] = None,
+                     allow_unpersisted: bool = True, persist: bool = True) -> ClassRecord:
+        """
+        Create a class with a freshly allocated code
+
+        Args:
+            teacher_id: Owning teacher's user id
+            class_name: Display name
+            description: Optional description
+            max_students: Enrollment limit
+            db: Session to use (a new one is opened if omitted)
+            allow_unpersisted: Keep the class in memory if it cannot be stored
+            persist: Store the class; False keeps it in memory only (callers that
+                have not authenticated the teacher; such codes are not honored at
+                registration)
+
+        Returns:
+            The stored class
+
+        Raises:
+            Exception: The database error, if allow_unpersisted is False
+        """
+        if not persist:
+            record = self._create_local(teacher_id, class_name, description, max_students)
+            self._remember(record)
+            return record
+        try:
+            if not str(teacher_id).isdigit():
+                raise ValueError(f"teacher id {teacher_id!r} is not a user id")
+            if db is not None:
+                record = self._insert(db, int(teacher_id), class_name, description, max_students)
+            else:
+                with get_db_context() as session:
+                    record = self._insert(session, int(teacher_id), class_name, description, max_students)
+        except Exception as e:
+            if db is not None:
+                db.rollback()
+            if not allow_unpersisted:
+                raise
+            record = self._create_local(teacher_id, class_name, description, max_students)
+            print(f"⚠️  Class {record.class_code} kept in memory only: {e}")
+
+        self._remember(record)
+        return record
+
+    def get_by_code(self, class_code: str) -> Optional[ClassRecord]:
+        """
+        Look up an active class by enrollment code
+
+        Returns:
+            The class, or None if the code is unknown or the class is inactive
+        """
+        class_code = normalize_class_code(class_code)
+        cached = self._by_code.get(class_code)
+        if cached is None:
+            cached = self._unpersisted.get(class_code)
+        if cached is None:
+            try:
+                with get_db_context() as db:
+                    row = db.query(ClassRow).filter(ClassRow.class_code == class_code).first()
+                    cached = self._from_row(row) if row else _NOT_FOUND
+            except Exception as e:
+                print(f"⚠️  Class lookup failed for {class_code}: {e}")
+                return None
+            if cached is _NOT_FOUND:
+                self._by_code.set(class_code, _NOT_FOUND, CLASS_NEGATIVE_CACHE_TTL_SECONDS)
+            else:
+                self._remember(cached)
+
+        if cached is _NOT_FOUND or not cached.is_active:
+            return None
+        return cached
+
+    def get_for_teacher(self, teacher_id: Union[int, str]) -> Optional[ClassRecord]:
+        """
+        A teacher's most recently created active class (their dashboard class)
+
+        Returns:
+            The class, or None if the teacher has no active class
+        """
+        teacher_id = str(teacher_id)
+        cached = self._by_teacher.get(teacher_id)
+        if cached is not None:
+            return None if cached is _NOT_FOUND else cached
+
+        local = [r for r in self._unpersisted.values() if r.teacher_id == teacher_id and r.is_active]
+        if local:
+            return max(local, key=lambda record: record.id)
+        if not teacher_id.isdigit():
+            return None
+
+        try:
+            with get_db_context() as db:
+                row = db.query(ClassRow).filter(
+                    ClassRow.teacher_id == int(teacher_id),
+                    ClassRow.is_active == True
+                ).order_by(ClassRow.id.desc()).first()
+                record = self._from_row(row) if row else None
+        except Exception as e:
+            print(f"⚠️  Class lookup failed for teacher {teacher_id}: {e}")
+            return None
+
+        if record is None:
+            self._by_teacher.set(teacher_id, _NOT_FOUND, CLASS_NEGATIVE_CACHE_TTL_SECONDS)
+            return None
+        self._remember(record)
+        return record
+
+    def invalidate(self, class_code: Optional[str] = None, teacher_id: Union[int, str, None] = None):
+        """Drop cached entries after a class was changed outside the registry"""
+        if class_code is not None:
+            self._by_code.pop(normalize_class_code(class_code))
+        if teacher_id is not None:
+            self._by_teacher.pop(str(teacher_id))
+
+    def get_stats(self) -> dict:
+        return {
+            "cached_codes": len(self._by_code),
+            "cached_teachers": len(self._by_teacher),
+            "code_hits": self._by_code.hits,
+            "code_misses": self._by_code.misses,
+            "unpersisted": len(self._unpersisted)
+        }
+
+class_registry = ClassRegistry()
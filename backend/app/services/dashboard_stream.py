@@ -0,0 +1,140 @@
+"""
+Dashboard Progress Streaming
+Coalesces student activity per class into one delta frame per tick, so the
+traffic a teacher's dashboard receives is bounded by the tick rate and the
+class size rather than by how fast students tap
+
+Within a tick each student's latest fields win and their counters add up;
+at the tick every class with changes gets a single frame listing only the
+students that changed.
+
+Every worker flushes its own frames onto the shared pub/sub channel, so a
+dashboard can receive interleaved frames from several workers. Frames carry
+a "stream" id (unique per worker and channel) and a "seq" that counts up by
+one within that stream. Gap detection is per stream. A channel idle for
+DASHBOARD_STREAM_IDLE_SECONDS forgets its stream, and later frames start a
+new stream at seq 1.
+"""
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import itertools
+import os
+import secrets
+import time
+
+from .pubsub import broadcast
+
+DASHBOARD_TICK_SECONDS = float(os.getenv("DASHBOARD_TICK_SECONDS", 0.25))
+DASHBOARD_STREAM_IDLE_SECONDS = float(os.getenv("DASHBOARD_STREAM_IDLE_SECONDS", 300))
+
+# Identifies this worker's streams (pids alone repeat across hosts and restarts)
+WORKER_STREAM_PREFIX = f"{os.getpid():x}{secrets.token_hex(3)}"
+_stream_numbers = itertools.count(1)
+
+class _Stream:
+    __slots__ = ("stream_id", "seq", "last_active")
+
+    def __init__(self, stream_id: str, now: float):
+        self.stream_id = stream_id
+        self.seq = 0
+        self.last_active = now
+
+class ProgressCoalescer:
+    """Per-channel aggregation windows flushed as delta frames"""
+    def __init__(self, publish: Callable[[str, dict], Awaitable],
+                 stream_idle_seconds: float = DASHBOARD_STREAM_IDLE_SECONDS):
+        self.publish = publish
+        self.stream_idle_seconds = stream_idle_seconds
+        self._windows: Dict[str, Dict[str, dict]] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self._next_prune = 0.0
+        self.metrics = {"events": 0, "frames": 0, "student_deltas": 0, "streams_expired": 0}
+
+    def record(self, channel: str, student_id: str, latest: dict, counters: Optional[Dict[str, int]] = None):
+        """
+        Add one student event to the channel's current window
+
+        Args:
+            channel: Dashboard channel (see teacher.teacher_channel)
+            student_id: Student the event belongs to
+            latest: Fields where the newest value wins (phoneme, accuracy, ...)
+            counters: Fields summed over the window (attempts, ...)
+        """
+        window = self._windows.setdefault(channel, {})
+        entry = window.get(student_id)
+        if entry is None:
+            entry = window[student_id] = {"student_id": student_id, "events": 0}
+        entry.update(latest)
+        entry["events"] += 1
+        if counters:
+            for name, value in counters.items():
+                entry[name] = entry.get(name, 0) + value
+        self.metrics["events"] += 1
+
+    def drain(self, now: Optional[float] = None) -> List[Tuple[str, dict]]:
+        """Close the current windows and build one delta frame per channel"""
+        now = time.monotonic() if now is None else now
+        windows, self._windows = self._windows, {}
+        frames = []
+        for channel, students in windows.items():
+            stream = self._streams.get(channel)
+            if stream is None or now - stream.last_active >= self.stream_idle_seconds:
+                stream = self._streams[channel] = _Stream(
+                    f"{WORKER_STREAM_PREFIX}.{next(_stream_numbers)}", now
+                )
+            stream.seq += 1
+            stream.last_active = now
+            frames.append((channel, {
+                "type": "class_delta",
+                "stream": stream.stream_id,
+                "seq": stream.seq,
+                "events": sum(entry["events"] for entry in students.values()),
+                "students": list(students.values())
+            }))
+            self.metrics["student_deltas"] += len(students)
+        self.metrics["frames"] += len(frames)
+        if now >= self._next_prune:
+            self._prune(now)
+        return frames
+
+    def _prune(self, now: float):
+        """Forget the streams of channels that have gone quiet (closed classes, stray teacher ids)"""
+        idle = [
+            channel for channel, stream in self._streams.items()
+            if now - stream.last_active >= self.stream_idle_seconds
+        ]
+        for channel in idle:
+            del self._streams[channel]
+        self.metrics["streams_expired"] += len(idle)
+        self._next_prune = now + self.stream_idle_seconds / 2
+
+    async def flush(self) -> int:
+        """
+        Publish every pending delta frame
+
+        Returns:
+            Number of frames published
+        """
+        frames = self.drain()
+        for channel, frame in frames:
+            await self.publish(channel, frame)
+        return len(frames)
+
+    def get_stats(self) -> dict:
+        return {
+            "pending_channels": len(self._windows),
+            "streams": len(self._streams),
+            "tick_seconds": DASHBOARD_TICK_SECONDS,
+            **self.metrics
+        }
+
+coalescer = ProgressCoalescer(broadcast)
+
+async def dashboard_flush_loop(tick_seconds: float = DASHBOARD_TICK_SECONDS):
+    """Flush coalesced student activity to dashboards at the tick rate"""
+    while True:
+        await asyncio.sleep(tick_seconds)
+        try:
+            await coalescer.flush()
+        except Exception as e:
+            print(f"⚠️  Dashboard flush failed: {e}")
@@ -0,0 +1,213 @@
+"""
+Email Campaigns
+Daily trial-reminder and expiration campaigns: walk the licenses in a
+campaign's end_date window in keyset batches, skip anyone already emailed and
+queue the rest in the email outbox, checkpointing each batch so an interrupted
+run resumes where it stopped without sending twice
+"""
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+import asyncio
+import math
+import os
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from ..db.database import get_db_context
+from ..db.models import CampaignCheckpoint, EmailLog, EmailOutbox, License as LicenseRecord, User
+from .email_templates import render_many
+from .license_service import TIER_FEATURE_MASKS, LicenseFeatures, LicenseType, feature_mask
+
+CAMPAIGNS_ENABLED = os.getenv("CAMPAIGNS_ENABLED", "true").lower() == "true"
+CAMPAIGN_BATCH_SIZE = int(os.getenv("CAMPAIGN_BATCH_SIZE", 1000))
+CAMPAIGN_INTERVAL_SECONDS = int(os.getenv("CAMPAIGN_INTERVAL_SECONDS", 3600))
+TRIAL_REMINDER_DAYS = int(os.getenv("TRIAL_REMINDER_DAYS", 3))  # Remind when a trial ends within N days
+EXPIRATION_NOTICE_DAYS = int(os.getenv("EXPIRATION_NOTICE_DAYS", 7))  # Notify licenses that ended in the last N days
+
+class Campaign(NamedTuple):
+    name: str  # Also the template and email type
+    window: Callable[[datetime], Tuple[datetime, datetime]]  # end_date range [start, end)
+    criteria: Callable[[], list]
+    fields: Callable[[object, datetime], Dict]
+
+def _tier_label(row) -> str:
+    license_type = row.license_type
+    if license_type == LicenseType.EXPIRED.value and row.features:
+        # The expiry sweep overwrites the tier; recover it from the feature set
+        mask = feature_mask(LicenseFeatures(**row.features))
+        license_type = next(
+            (tier.value for tier, tier_mask in TIER_FEATURE_MASKS.items() if tier_mask == mask),
+            license_type
+        )
+    return license_type.replace("_", " ").title()
+
+CAMPAIGNS: Dict[str, Campaign] = {
+    "trial_reminder": Campaign(
+        name="trial_reminder",
+        window=lambda now: (now, now + timedelta(days=TRIAL_REMINDER_DAYS)),
+        criteria=lambda: [
+            LicenseRecord.license_type == LicenseType.FREE_TRIAL.value,
+            LicenseRecord.is_active == True
+        ],
+        fields=lambda row, now: {
+            "days_remaining": max(1, math.ceil((row.end_date - now).total_seconds() / 86400)),
+            "license_key": row.license_key
+        }
+    ),
+    "expiration": Campaign(
+        name="expiration",
+        window=lambda now: (now - timedelta(days=EXPIRATION_NOTICE_DAYS), now),
+        criteria=lambda: [],
+        fields=lambda row, now: {"license_type": _tier_label(row)}
+    ),
+}
+
+def dedupe_key(campaign: str, license_key: str, end_date: datetime) -> str:
+    """One email per campaign per license term (an extended license is a new term)"""
+    return f"{campaign}:{license_key}:{end_date:%Y-%m-%d}"
+
+def _checkpoint_summary(checkpoint: CampaignCheckpoint) -> dict:
+    return {
+        "campaign": checkpoint.campaign,
+        "run_key": checkpoint.run_key,
+        "status": checkpoint.status,
+        "enqueued": checkpoint.enqueued,
+        "skipped": checkpoint.skipped,
+        "started_at": checkpoint.started_at.isoformat() if checkpoint.started_at else None,
+        "completed_at": checkpoint.completed_at.isoformat() if checkpoint.completed_at else None,
+    }
+
+def _start_or_resume(name: str, run_key: str) -> Tuple[int, bool]:
+    """Return (checkpoint id, already completed) for today's run, creating it if needed"""
+    with get_db_context() as db:
+        checkpoint = db.query(CampaignCheckpoint).filter(
+            CampaignCheckpoint.campaign == name,
+            CampaignCheckpoint.run_key == run_key
+        ).first()
+        if checkpoint is None:
+            checkpoint = CampaignCheckpoint(campaign=name, run_key=run_key, status="running", enqueued=0, skipped=0)
+            db.add(checkpoint)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker created the run first; share its checkpoint
+                db.rollback()
+                return _start_or_resume(name, run_key)
+        return checkpoint.id, checkpoint.status == "completed"
+
+def _process_batch(campaign: Campaign, checkpoint_id: int, now: datetime, batch_size: int) -> bool:
+    """
+    Queue the next batch of a run and advance its checkpoint in the same transaction
+
+    Returns:
+        False once the run has no licenses left
+    """
+    start, end = campaign.window(now)
+    with get_db_context() as db:
+        checkpoint = db.get(CampaignCheckpoint, checkpoint_id)
+
+        query = db.query(
+            LicenseRecord.id,
+            LicenseRecord.license_key,
+            LicenseRecord.license_type,
+            LicenseRecord.end_date,
+            LicenseRecord.features,
+            func.coalesce(LicenseRecord.user_email, User.email).label("email")
+        ).outerjoin(User, User.id == LicenseRecord.user_id).filter(
+            LicenseRecord.end_date >= start,
+            LicenseRecord.end_date < end,
+            *campaign.criteria()
+        )
+        if checkpoint.last_end_date is not None:
+            query = query.filter(
+                tuple_(LicenseRecord.end_date, LicenseRecord.id)
+                > tuple_(checkpoint.last_end_date, checkpoint.last_license_id)
+            )
+        rows = query.order_by(LicenseRecord.end_date, LicenseRecord.id).limit(batch_size).all()
+
+        if not rows:
+            checkpoint.status = "completed"
+            checkpoint.completed_at = datetime.utcnow()
+            db.commit()
+            return False
+
+        candidates = {
+            dedupe_key(campaign.name, row.license_key, row.end_date): row
+            for row in rows if row.email
+        }
+        already_sent = {
+            key for (key,) in db.query(EmailOutbox.dedupe_key).filter(EmailOutbox.dedupe_key.in_(candidates))
+        } | {
+            key for (key,) in db.query(EmailLog.dedupe_key).filter(EmailLog.dedupe_key.in_(candidates))
+        }
+        pending = [(key, row) for key, row in candidates.items() if key not in already_sent]
+
+        rendered = render_many(campaign.name, [campaign.fields(row, now) for _, row in pending])
+        db.add_all([
+            EmailOutbox(
+                recipient_email=row.email,
+                email_type=campaign.name,
+                subject=subject,
+                html_content=html_content,
+                status="pending",
+                next_attempt_at=datetime.utcnow(),
+                dedupe_key=key
+            )
+            for (key, row), (subject, html_content) in zip(pending, rendered)
+        ])
+
+        checkpoint.last_end_date = rows[-1].end_date
+        checkpoint.last_license_id = rows[-1].id
+        checkpoint.enqueued += len(pending)
+        checkpoint.skipped += len(rows) - len(pending)
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent run queued some of these first; redo the batch without them
+            db.rollback()
+        return True
+
+def run_campaign(name: str, now: Optional[datetime] = None, batch_size: int = CAMPAIGN_BATCH_SIZE) -> dict:
+    """
+    Run (or resume) today's run of a campaign to completion
+
+    Args:
+        name: Campaign name (see CAMPAIGNS)
+        now: Override the current time (local time, like license dates)
+        batch_size: Licenses per batch/transaction
+
+    Returns:
+        Checkpoint summary with enqueued and skipped counts
+
+    Raises:
+        KeyError: If the campaign does not exist
+    """
+    campaign = CAMPAIGNS[name]
+    now = now or datetime.now()
+    checkpoint_id, completed = _start_or_resume(name, now.date().isoformat())
+
+    if not completed:
+        while _process_batch(campaign, checkpoint_id, now, batch_size):
+            pass
+
+    with get_db_context() as db:
+        return _checkpoint_summary(db.get(CampaignCheckpoint, checkpoint_id))
+
+def list_campaign_runs(limit: int = 20) -> List[dict]:
+    """Most recent campaign runs, newest first"""
+    with get_db_context() as db:
+        checkpoints = db.query(CampaignCheckpoint).order_by(CampaignCheckpoint.id.desc()).limit(limit).all()
+        return [_checkpoint_summary(checkpoint) for checkpoint in checkpoints]
+
+async def campaign_scheduler_loop(interval_seconds: int = CAMPAIGN_INTERVAL_SECONDS):
+    """Run each campaign once per day; later ticks resume unfinished runs or return immediately"""
+    while CAMPAIGNS_ENABLED:
+        for name in CAMPAIGNS:
+            try:
+                summary = await asyncio.to_thread(run_campaign, name)
+                if summary["enqueued"]:
+                    print(f"✓ Campaign {name} {summary['run_key']}: {summary['enqueued']} emails queued")
+            except Exception as e:
+                print(f"⚠️  Campaign {name} failed: {e}")
+        await asyncio.sleep(interval_seconds)
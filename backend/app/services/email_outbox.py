@@ -0,0 +1,190 @@
+"""
+Email Outbox Worker
+Delivers queued emails in batches with bounded concurrency and a send rate
+limit, retries failures with exponential backoff and records every final
+outcome in EmailLog
+"""
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import asyncio
+import os
+import random
+
+from sqlalchemy import func
+
+from ..db.database import get_db_context
+from ..db.models import EmailLog, EmailOutbox
+from .email_service import deliver_email
+from .rate_limiter import MemoryBackend, RateLimiter, TokenBucket
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", 50))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", 2))
+EMAIL_SEND_CONCURRENCY = int(os.getenv("EMAIL_SEND_CONCURRENCY", 8))
+EMAIL_SEND_RATE_PER_SECOND = float(os.getenv("EMAIL_SEND_RATE_PER_SECOND", 50))  # Per process; 0 disables
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+EMAIL_RETRY_MAX_SECONDS = float(os.getenv("EMAIL_RETRY_MAX_SECONDS", 3600))
+
+# A claimed message is retried by any worker if not finished within the lease
+EMAIL_SEND_LEASE_SECONDS = int(os.getenv("EMAIL_SEND_LEASE_SECONDS", 300))
+
+# Keeps bulk sends (campaigns) within the provider's rate limit
+send_rate_limiter = (
+    RateLimiter("email_send", TokenBucket(EMAIL_SEND_RATE_PER_SECOND, 1), MemoryBackend(max_keys=1))
+    if EMAIL_SEND_RATE_PER_SECOND > 0 else None
+)
+
+async def acquire_send_slot():
+    """Wait until the send rate limit allows another message"""
+    if send_rate_limiter is None:
+        return
+    while True:
+        result = send_rate_limiter.hit("outbox")
+        if result.allowed:
+            return
+        await asyncio.sleep(result.retry_after)
+
+def retry_delay(attempts: int) -> float:
+    """Backoff before the next attempt (seconds), with jitter so retries spread out"""
+    delay = min(EMAIL_RETRY_MAX_SECONDS, EMAIL_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+def claim_batch(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> List[Dict]:
+    """
+    Lease the next due messages to this worker
+
+    Pending messages whose retry time has come, and sending messages whose lease
+    ran out (a worker died mid-send), are both due. On PostgreSQL rows locked by
+    another worker are skipped, so several workers can drain the outbox at once.
+
+    Returns:
+        Claimed messages as plain dicts
+    """
+    now = datetime.utcnow()
+    with get_db_context() as db:
+        query = db.query(EmailOutbox).filter(
+            EmailOutbox.status.in_(["pending", "sending"]),
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size)
+
+        if db.bind.dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+
+        rows = query.all()
+        for row in rows:
+            row.status = "sending"
+            row.attempts = (row.attempts or 0) + 1
+            row.next_attempt_at = now + timedelta(seconds=EMAIL_SEND_LEASE_SECONDS)
+
+        messages = [
+            {
+                "id": row.id,
+                "recipient_email": row.recipient_email,
+                "email_type": row.email_type,
+                "subject": row.subject,
+                "html_content": row.html_content,
+                "attempts": row.attempts,
+                "dedupe_key": row.dedupe_key,
+            }
+            for row in rows
+        ]
+        db.commit()
+        return messages
+
+def record_results(results: List[Tuple[Dict, Dict]]):
+    """
+    Store delivery outcomes: sent, rescheduled with backoff, or failed for good
+
+    Sent and permanently failed messages are also written to EmailLog.
+    """
+    now = datetime.utcnow()
+    with get_db_context() as db:
+        rows = {
+            row.id: row for row in db.query(EmailOutbox).filter(
+                EmailOutbox.id.in_([message["id"] for message, _ in results])
+            )
+        }
+
+        for message, result in results:
+            row = rows.get(message["id"])
+            if row is None:
+                continue
+
+            if result.get("success"):
+                row.status = "sent"
+                row.sent_at = now
+                row.last_error = None
+                final_status = "sent"
+            elif message["attempts"] >= EMAIL_MAX_ATTEMPTS:
+                row.status = "failed"
+                row.last_error = result.get("error")
+                final_status = "failed"
+            else:
+                row.status = "pending"
+                row.last_error = result.get("error")
+                row.next_attempt_at = now + timedelta(seconds=retry_delay(message["attempts"]))
+                continue
+
+            db.add(EmailLog(
+                recipient_email=message["recipient_email"],
+                email_type=message["email_type"],
+                subject=message["subject"],
+                status=final_status,
+                sendgrid_message_id=result.get("message_id"),
+                error_message=result.get("error"),
+                dedupe_key=message.get("dedupe_key")
+            ))
+
+        db.commit()
+
+async def process_outbox_batch(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE) -> int:
+    """
+    Claim one batch, send it concurrently and record the results
+
+    Returns:
+        Number of messages processed
+    """
+    messages = await asyncio.to_thread(claim_batch, batch_size)
+    if not messages:
+        return 0
+
+    semaphore = asyncio.Semaphore(EMAIL_SEND_CONCURRENCY)
+
+    async def send(message: Dict):
+        async with semaphore:
+            await acquire_send_slot()
+            result = await asyncio.to_thread(
+                deliver_email, message["recipient_email"], message["subject"], message["html_content"]
+            )
+            return message, result
+
+    results = await asyncio.gather(*(send(message) for message in messages))
+    await asyncio.to_thread(record_results, results)
+    return len(messages)
+
+async def email_outbox_worker_loop():
+    """Drain the outbox continuously; poll when it is empty"""
+    while True:
+        try:
+            processed = await process_outbox_batch()
+        except Exception as e:
+            print(f"⚠️  Email outbox batch failed: {e}")
+            processed = 0
+
+        if processed < EMAIL_OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(EMAIL_OUTBOX_POLL_SECONDS)
+
+def get_outbox_stats() -> dict:
+    """Message counts by status and the age of the oldest pending message"""
+    with get_db_context() as db:
+        counts = dict(
+            db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all()
+        )
+        oldest = db.query(func.min(EmailOutbox.created_at)).filter(
+            EmailOutbox.status.in_(["pending", "sending"])
+        ).scalar()
+
+    return {
+        "counts": counts,
+        "oldest_pending_seconds": (datetime.utcnow() - oldest).total_seconds() if oldest else None
+    }
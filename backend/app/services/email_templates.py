@@ -0,0 +1,366 @@
+"""
+Email Templates
+Each template is compiled once: CSS from its <style> block is inlined into the
+markup, and the result is split into static chunks and field slots, so a
+render only escapes and joins the dynamic values
+"""
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import html
+import re
+
+# Template sources: {{ field }} placeholders (HTML-escaped in the body, plain in the subject)
+TEMPLATE_SOURCES: Dict[str, Dict[str, str]] = {
+    "welcome": {
+        "subject": "Welcome to PhonicsLearn! 🎉",
+        "html": """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                   color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; }
+        .button { background: #667eea; color: white; padding: 12px 30px; text-decoration: none;
+                  border-radius: 5px; display: inline-block; margin: 20px 0; }
+        .footer { text-align: center; color: #666; padding: 20px; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📚 Welcome to PhonicsLearn!</h1>
+        </div>
+        <div class="content">
+            <h2>Hi {{ user_name }}!</h2>
+            <p>Thank you for joining PhonicsLearn. We're excited to help your children master phonics!</p>
+            <p><strong>Here's what you can do next:</strong></p>
+            <ul>
+                <li>Explore our 81+ interactive lessons</li>
+                <li>Track your child's progress in real-time</li>
+                <li>Access personalized learning recommendations</li>
+            </ul>
+            <a href="http://localhost:3000/license-activation.html" class="button">Get Started →</a>
+            <p>If you have any questions, feel free to reach out to our support team.</p>
+        </div>
+        <div class="footer">
+            <p>© 2025 PhonicsLearn. All rights reserved.</p>
+            <p>Questions? Email us at support@phonicslearn.com</p>
+        </div>
+    </div>
+</body>
+</html>
+""",
+    },
+    "license_key": {
+        "subject": "Your PhonicsLearn License Key 🔑",
+        "html": """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); 
+                   color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; }
+        .license-box { background: white; border: 2px dashed #667eea; padding: 20px;
+                       text-align: center; margin: 20px 0; border-radius: 8px; }
+        .license-key { font-size: 20px; font-weight: bold; color: #667eea; 
+                       letter-spacing: 2px; margin: 10px 0; }
+        .button { background: #667eea; color: white; padding: 12px 30px; text-decoration: none;
+                  border-radius: 5px; display: inline-block; margin: 20px 0; }
+        .footer { text-align: center; color: #666; padding: 20px; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>🔑 Your PhonicsLearn License Key</h1>
+        </div>
+        <div class="content">
+            <h2>Congratulations!</h2>
+            <p>Your <strong>{{ license_type }}</strong> license is ready.</p>
+            
+            <div class="license-box">
+                <p>Your License Key:</p>
+                <div class="license-key">{{ license_key }}</div>
+                <p style="font-size: 12px; color: #666;">Valid for {{ days_valid }} days</p>
+            </div>
+            
+            <p><strong>How to activate:</strong></p>
+            <ol>
+                <li>Click the button below</li>
+                <li>Enter your license key</li>
+                <li>Start learning immediately!</li>
+            </ol>
+            
+            <a href="http://localhost:3000/license-activation.html" class="button">Activate License →</a>
+            
+            <p style="margin-top: 30px; font-size: 14px; color: #666;">
+                <strong>Important:</strong> Save this email! You'll need your license key to access the app.
+            </p>
+        </div>
+        <div class="footer">
+            <p>© 2025 PhonicsLearn. All rights reserved.</p>
+            <p>Need help? Contact support@phonicslearn.com</p>
+        </div>
+    </div>
+</body>
+</html>
+""",
+    },
+    "trial_reminder": {
+        "subject": "Your Trial Ends in {{ days_remaining }} Days ⏰",
+        "html": """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #ff9800 0%, #ff5722 100%); 
+                   color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; }
+        .alert { background: #fff3cd; border: 2px solid #ffc107; padding: 15px;
+                 border-radius: 8px; margin: 20px 0; }
+        .button { background: #667eea; color: white; padding: 12px 30px; text-decoration: none;
+                  border-radius: 5px; display: inline-block; margin: 20px 0; }
+        .footer { text-align: center; color: #666; padding: 20px; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>⏰ Your Trial Ends in {{ days_remaining }} Days</h1>
+        </div>
+        <div class="content">
+            <div class="alert">
+                <strong>Don't lose access!</strong> Your free trial is ending soon.
+            </div>
+            
+            <p>We hope you've enjoyed exploring PhonicsLearn with your children!</p>
+            
+            <p><strong>What happens next?</strong></p>
+            <ul>
+                <li>Your trial expires in {{ days_remaining }} days</li>
+                <li>Upgrade now to keep all your progress</li>
+                <li>Choose from flexible monthly or yearly plans</li>
+            </ul>
+            
+            <a href="http://localhost:3000/landing.html#pricing" class="button">View Plans & Upgrade →</a>
+            
+            <p style="margin-top: 30px;">
+                <strong>Questions?</strong> Our team is here to help you choose the right plan.
+            </p>
+        </div>
+        <div class="footer">
+            <p>© 2025 PhonicsLearn. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+""",
+    },
+    "expiration": {
+        "subject": "Your PhonicsLearn License Has Expired",
+        "html": """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: #f44336; color: white; padding: 30px; text-align: center; 
+                   border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; }
+        .button { background: #667eea; color: white; padding: 12px 30px; text-decoration: none;
+                  border-radius: 5px; display: inline-block; margin: 20px 0; }
+        .footer { text-align: center; color: #666; padding: 20px; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>Your License Has Expired</h1>
+        </div>
+        <div class="content">
+            <p>Your <strong>{{ license_type }}</strong> license has expired.</p>
+            
+            <p><strong>Don't worry - your progress is saved!</strong></p>
+            <p>Renew your license to continue where you left off.</p>
+            
+            <a href="http://localhost:3000/landing.html#pricing" class="button">Renew License →</a>
+            
+            <p>We'd love to have you back. Contact us if you have any questions.</p>
+        </div>
+        <div class="footer">
+            <p>© 2025 PhonicsLearn. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+""",
+    },
+    "payment_success": {
+        "subject": "Payment Successful - PhonicsLearn ✅",
+        "html": """
+<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .container { max-width: 600px; margin: 0 auto; padding: 20px; }
+        .header { background: linear-gradient(135deg, #4caf50 0%, #2e7d32 100%); 
+                   color: white; padding: 30px; text-align: center; border-radius: 10px 10px 0 0; }
+        .content { background: #f9f9f9; padding: 30px; }
+        .success-box { background: #e8f5e9; border: 2px solid #4caf50; padding: 20px;
+                       border-radius: 8px; margin: 20px 0; }
+        .license-key { font-size: 18px; font-weight: bold; color: #667eea; 
+                       letter-spacing: 2px; margin: 10px 0; }
+        .button { background: #667eea; color: white; padding: 12px 30px; text-decoration: none;
+                  border-radius: 5px; display: inline-block; margin: 20px 0; }
+        .footer { text-align: center; color: #666; padding: 20px; font-size: 12px; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>✅ Payment Successful!</h1>
+        </div>
+        <div class="content">
+            <div class="success-box">
+                <h2 style="margin-top: 0; color: #4caf50;">Thank You!</h2>
+                <p>Your payment of <strong>${{ amount }}</strong> for <strong>{{ plan_type }}</strong> has been processed.</p>
+            </div>
+            
+            <p><strong>Your License Key:</strong></p>
+            <div class="license-key">{{ license_key }}</div>
+            
+            <p><strong>What's Next?</strong></p>
+            <ul>
+                <li>Your license is now active</li>
+                <li>Access all features immediately</li>
+                <li>Receipt sent to this email</li>
+            </ul>
+            
+            <a href="http://localhost:3000/index.html" class="button">Start Learning →</a>
+        </div>
+        <div class="footer">
+            <p>© 2025 PhonicsLearn. All rights reserved.</p>
+        </div>
+    </div>
+</body>
+</html>
+""",
+    },
+}
+
+_FIELD = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_STYLE_BLOCK = re.compile(r"<style[^>]*>(.*?)</style>\s*", re.S | re.I)
+_CSS_RULE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_START_TAG = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)((?:\s[^<>]*?)?)(/?)>")
+_CLASS_ATTR = re.compile(r"""\sclass\s*=\s*["']([^"']*)["']""")
+_STYLE_ATTR = re.compile(r"""\sstyle\s*=\s*["']([^"']*)["']""")
+
+def _normalize_declarations(declarations: str) -> str:
+    parts = [" ".join(part.split()) for part in declarations.split(";")]
+    return "; ".join(part for part in parts if part)
+
+def inline_css(source: str) -> str:
+    """
+    Move the rules of <style> blocks into style attributes
+
+    Supports the selectors the templates use: tag names and single classes
+    (comma-separated lists allowed). Tag rules apply before class rules, and
+    existing style attributes win over both.
+    """
+    rules: Dict[str, List[str]] = {}
+    for block in _STYLE_BLOCK.findall(source):
+        for selectors, declarations in _CSS_RULE.findall(block):
+            declarations = _normalize_declarations(declarations)
+            for selector in selectors.split(","):
+                rules.setdefault(selector.strip(), []).append(declarations)
+
+    if not rules:
+        return source
+
+    def apply(match: "re.Match") -> str:
+        tag, attributes, self_closing = match.groups()
+        styles = list(rules.get(tag.lower(), []))
+        class_match = _CLASS_ATTR.search(attributes)
+        if class_match:
+            for class_name in class_match.group(1).split():
+                styles.extend(rules.get(f".{class_name}", []))
+        if not styles:
+            return match.group(0)
+
+        style_match = _STYLE_ATTR.search(attributes)
+        if style_match:
+            styles.append(_normalize_declarations(style_match.group(1)))
+            attributes = attributes[:style_match.start()] + attributes[style_match.end():]
+        style = html.escape("; ".join(styles), quote=True)
+        return f'<{tag}{attributes} style="{style}"{self_closing}>'
+
+    return _START_TAG.sub(apply, _STYLE_BLOCK.sub("", source))
+
+class CompiledTemplate(NamedTuple):
+    """Static chunks interleaved with field names: chunks[i], fields[i], chunks[i + 1], ..."""
+    chunks: Tuple[str, ...]
+    fields: Tuple[str, ...]
+    escape: bool = True  # HTML-escape values (off for plain-text subjects)
+
+    def render(self, values: Dict) -> str:
+        """
+        Render with the given field values
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        convert = html.escape if self.escape else lambda value: value
+        parts = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            parts.append(convert(str(values[field])))
+            parts.append(chunk)
+        return "".join(parts)
+
+def compile_template(source: str, escape: bool = True) -> CompiledTemplate:
+    """Split a template source into static chunks and field slots"""
+    pieces = _FIELD.split(source)
+    return CompiledTemplate(chunks=tuple(pieces[0::2]), fields=tuple(pieces[1::2]), escape=escape)
+
+class EmailTemplate(NamedTuple):
+    subject: CompiledTemplate
+    html: CompiledTemplate
+
+def compile_all(sources: Dict[str, Dict[str, str]] = TEMPLATE_SOURCES) -> Dict[str, EmailTemplate]:
+    """Inline CSS and compile every template"""
+    return {
+        name: EmailTemplate(
+            subject=compile_template(source["subject"], escape=False),
+            html=compile_template(inline_css(source["html"]))
+        )
+        for name, source in sources.items()
+    }
+
+COMPILED_TEMPLATES = compile_all()
+
+def render_email(name: str, **values) -> Tuple[str, str]:
+    """
+    Render a template
+
+    Returns:
+        (subject, html)
+    """
+    template = COMPILED_TEMPLATES[name]
+    return template.subject.render(values), template.html.render(values)
+
+def render_many(name: str, rows: Iterable[Dict]) -> List[Tuple[str, str]]:
+    """Render one template for many recipients (mass sends); returns (subject, html) pairs"""
+    template = COMPILED_TEMPLATES[name]
+    subject, body = template.subject, template.html
+    if not subject.fields:
+        static_subject = subject.chunks[0]
+        return [(static_subject, body.render(values)) for values in rows]
+    return [(subject.render(values), body.render(values)) for values in rows]
@@ -0,0 +1,367 @@
+"""
+Activity History Export Service
+Streams activity_logs out of the primary database into columnar cold-storage
+files and answers offline report queries from those files
+"""
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import csv
+import gzip
+import json
+import os
+import re
+
+from sqlalchemy.orm import Session
+
+from ..db.database import get_db_context
+from ..db.models import ActivityLog
+
+# Parquet output is used when pyarrow is installed, gzip CSV otherwise
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_dataset
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pa_dataset = None
+    pq = None
+
+EXPORT_DIR = Path(os.getenv("ACTIVITY_EXPORT_DIR", "./exports"))
+EXPORT_BATCH_SIZE = int(os.getenv("ACTIVITY_EXPORT_BATCH_SIZE", 5000))
+
+# activity_logs_<since>_<until>_<first id>-<last id>.<suffix>
+_EXPORT_NAME = re.compile(r"^activity_logs_\w+?_\w+?_(\d+)-(\d+)\.(parquet|csv\.gz)$")
+
+EXPORT_COLUMNS = (
+    "id", "student_id", "lesson_id", "activity_type",
+    "score", "duration_seconds", "extra_data", "created_at"
+)
+
+if pa is not None:
+    EXPORT_SCHEMA = pa.schema([
+        ("id", pa.int64()),
+        ("student_id", pa.int64()),
+        ("lesson_id", pa.string()),
+        ("activity_type", pa.string()),
+        ("score", pa.float64()),
+        ("duration_seconds", pa.int64()),
+        ("extra_data", pa.string()),  # JSON-encoded
+        ("created_at", pa.timestamp("us")),
+    ])
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert an aware datetime to naive UTC (how created_at is stored and exported)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def default_format() -> str:
+    """Best export format available in this environment"""
+    return "parquet" if pq is not None else "csv"
+
+def iter_activity_batches(
+    db: Session,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    after_id: Optional[int] = None
+) -> Iterator[List[Dict]]:
+    """
+    Page through activity_logs with keyset pagination on id
+
+    Each page is a fresh indexed range query (id > last seen id), so the cost
+    per page stays constant no matter how deep into the table the export is,
+    and only one page of rows is held in memory at a time.
+
+    Args:
+        db: Database session
+        since: Inclusive lower bound on created_at
+        until: Exclusive upper bound on created_at
+        batch_size: Rows per page
+        after_id: Only rows with a larger id (resumes a previous export)
+
+    Yields:
+        Lists of row dictionaries keyed by EXPORT_COLUMNS
+    """
+    columns = [getattr(ActivityLog, name) for name in EXPORT_COLUMNS]
+    last_id = after_id
+
+    while True:
+        query = db.query(*columns)
+        if since is not None:
+            query = query.filter(ActivityLog.created_at >= since)
+        if until is not None:
+            query = query.filter(ActivityLog.created_at < until)
+        if last_id is not None:
+            query = query.filter(ActivityLog.id > last_id)
+
+        rows = query.order_by(ActivityLog.id).limit(batch_size).all()
+        if not rows:
+            return
+
+        yield [dict(zip(EXPORT_COLUMNS, row)) for row in rows]
+        last_id = rows[-1][0]
+
+class _ParquetWriter:
+    """Writes row batches as Parquet row groups"""
+    suffix = ".parquet"
+
+    def __init__(self, path: Path):
+        self._writer = pq.ParquetWriter(str(path), EXPORT_SCHEMA, compression="zstd")
+
+    def write(self, rows: List[Dict]):
+        columns = {name: [row[name] for row in rows] for name in EXPORT_COLUMNS}
+        columns["extra_data"] = [
+            json.dumps(value) if value is not None else None
+            for value in columns["extra_data"]
+        ]
+        self._writer.write_table(pa.Table.from_pydict(columns, schema=EXPORT_SCHEMA))
+
+    def close(self):
+        self._writer.close()
+
+class _CsvWriter:
+    """Writes row batches to a gzip-compressed CSV file"""
+    suffix = ".csv.gz"
+
+    def __init__(self, path: Path):
+        self._file = gzip.open(path, "wt", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows: List[Dict]):
+        for row in rows:
+            self._writer.writerow([_csv_value(name, row[name]) for name in EXPORT_COLUMNS])
+
+    def close(self):
+        self._file.close()
+
+def _csv_value(name: str, value):
+    """Encode a single column value for CSV output"""
+    if value is None:
+        return ""
+    if name == "extra_data":
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def _write_batches(writer, batches: Iterator[List[Dict]]) -> Tuple[int, Optional[int], Optional[int]]:
+    """Write row batches; returns the row count and the first and last id written"""
+    rows_written = 0
+    first_id = last_id = None
+    for batch in batches:
+        writer.write(batch)
+        rows_written += len(batch)
+        if first_id is None:
+            first_id = batch[0]["id"]
+        last_id = batch[-1]["id"]
+    return rows_written, first_id, last_id
+
+def export_activity_logs(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    export_dir: Path = EXPORT_DIR,
+    fmt: Optional[str] = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    db: Optional[Session] = None
+) -> Dict:
+    """
+    Export activity history to a Parquet or gzip CSV file in bounded memory
+
+    Exports are append-only: each run resumes after the highest id already
+    exported to export_dir, so export files never overlap and readers need no
+    deduplication. since/until narrow a run; rows that `since` skips below
+    the resume point are not picked up by later runs.
+
+    Args:
+        since: Inclusive lower bound on created_at
+        until: Exclusive upper bound on created_at
+        export_dir: Directory for export files
+        fmt: "parquet" or "csv" (defaults to the best available)
+        batch_size: Rows fetched and written per page
+        db: Optional database session (a new one is opened otherwise)
+
+    Returns:
+        Manifest with the output path (None if there was nothing new to
+        export), format, row count and exported id range
+    """
+    since = _naive_utc(since)
+    until = _naive_utc(until)
+    fmt = fmt or default_format()
+    if fmt == "parquet" and pq is None:
+        raise ValueError("Parquet export requires pyarrow")
+    if fmt not in ("parquet", "csv"):
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    writer_class = _ParquetWriter if fmt == "parquet" else _CsvWriter
+    start = since.strftime("%Y%m%d") if since else "start"
+    end = until.strftime("%Y%m%d") if until else datetime.utcnow().strftime("%Y%m%d")
+
+    export_dir.mkdir(parents=True, exist_ok=True)
+    after_id = last_exported_id(export_dir)
+    tmp_path = export_dir / f"activity_logs_{start}_{end}{writer_class.suffix}.tmp"
+
+    writer = writer_class(tmp_path)
+    try:
+        if db is None:
+            with get_db_context() as session:
+                rows_written, first_id, last_id = _write_batches(
+                    writer, iter_activity_batches(session, since, until, batch_size, after_id)
+                )
+        else:
+            rows_written, first_id, last_id = _write_batches(
+                writer, iter_activity_batches(db, since, until, batch_size, after_id)
+            )
+    except Exception:
+        writer.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    writer.close()
+
+    path = None
+    if rows_written:
+        path = export_dir / f"activity_logs_{start}_{end}_{first_id}-{last_id}{writer_class.suffix}"
+        tmp_path.replace(path)
+    else:
+        tmp_path.unlink(missing_ok=True)
+
+    return {
+        "path": str(path) if path else None,
+        "format": fmt,
+        "rows": rows_written,
+        "after_id": after_id,
+        "last_id": last_id,
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat() if until else None
+    }
+
+def list_exports(export_dir: Path = EXPORT_DIR) -> List[Path]:
+    """List export files in a directory, in id order"""
+    if not export_dir.exists():
+        return []
+    exports = []
+    for path in export_dir.iterdir():
+        match = _EXPORT_NAME.match(path.name)
+        if match:
+            exports.append((int(match.group(1)), path))
+    return [path for _, path in sorted(exports)]
+
+def last_exported_id(export_dir: Path = EXPORT_DIR) -> Optional[int]:
+    """Highest activity_logs id already exported to a directory (None if nothing was)"""
+    last_ids = [int(_EXPORT_NAME.match(path.name).group(2)) for path in list_exports(export_dir)]
+    return max(last_ids, default=None)
+
+def iter_exported_activity(
+    export_dir: Path = EXPORT_DIR,
+    student_id: Optional[int] = None,
+    activity_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Iterator[Dict]:
+    """
+    Iterate over exported activity rows matching the given filters
+
+    Parquet files are scanned with predicate pushdown so only matching row
+    groups are decoded; CSV files are streamed row by row. Export files
+    cover disjoint id ranges (see export_activity_logs), so every row is
+    read once and nothing is kept per row. since/until may be naive UTC or
+    timezone-aware.
+
+    Yields:
+        Row dictionaries keyed by EXPORT_COLUMNS
+    """
+    since = _naive_utc(since)
+    until = _naive_utc(until)
+    for path in list_exports(export_dir):
+        if path.name.endswith(".parquet"):
+            yield from _iter_parquet(path, student_id, activity_type, since, until)
+        else:
+            yield from _iter_csv(path, student_id, activity_type, since, until)
+
+def _iter_parquet(path, student_id, activity_type, since, until):
+    if pa_dataset is None:
+        print(f"⚠️  Skipping {path.name}: pyarrow is not installed")
+        return
+
+    field = pa_dataset.field
+    conditions = []
+    if student_id is not None:
+        conditions.append(field("student_id") == student_id)
+    if activity_type is not None:
+        conditions.append(field("activity_type") == activity_type)
+    if since is not None:
+        conditions.append(field("created_at") >= pa.scalar(since, pa.timestamp("us")))
+    if until is not None:
+        conditions.append(field("created_at") < pa.scalar(until, pa.timestamp("us")))
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    dataset = pa_dataset.dataset(str(path), format="parquet")
+    for batch in dataset.to_batches(filter=expression):
+        for row in batch.to_pylist():
+            if row["extra_data"] is not None:
+                row["extra_data"] = json.loads(row["extra_data"])
+            yield row
+
+def _iter_csv(path, student_id, activity_type, since, until):
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as archive:
+        for raw in csv.DictReader(archive):
+            row = {
+                "id": int(raw["id"]),
+                "student_id": int(raw["student_id"]) if raw["student_id"] else None,
+                "lesson_id": raw["lesson_id"],
+                "activity_type": raw["activity_type"] or None,
+                "score": float(raw["score"]) if raw["score"] else None,
+                "duration_seconds": int(raw["duration_seconds"]) if raw["duration_seconds"] else None,
+                "extra_data": json.loads(raw["extra_data"]) if raw["extra_data"] else None,
+                "created_at": _naive_utc(datetime.fromisoformat(raw["created_at"])) if raw["created_at"] else None
+            }
+            if student_id is not None and row["student_id"] != student_id:
+                continue
+            if activity_type is not None and row["activity_type"] != activity_type:
+                continue
+            if since is not None and (row["created_at"] is None or row["created_at"] < since):
+                continue
+            if until is not None and (row["created_at"] is None or row["created_at"] >= until):
+                continue
+            yield row
+
+def summarize_exported_activity(
+    student_id: int,
+    export_dir: Path = EXPORT_DIR,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+) -> Dict:
+    """
+    Compute a student's activity summary from exported files
+
+    Mirrors the activity figures of /tracking/student/{id}/summary without
+    touching the primary database.
+    """
+    total_activities = 0
+    lessons_completed = set()
+    score_total = 0.0
+    score_count = 0
+    total_time = 0
+
+    for row in iter_exported_activity(export_dir, student_id=student_id, since=since, until=until):
+        total_activities += 1
+        if row["activity_type"] == "lesson_complete":
+            lessons_completed.add(row["lesson_id"])
+        if row["score"] is not None:
+            score_total += row["score"]
+            score_count += 1
+        total_time += row["duration_seconds"] or 0
+
+    return {
+        "student_id": student_id,
+        "total_activities": total_activities,
+        "lessons_completed": len(lessons_completed),
+        "average_score": round(score_total / score_count, 2) if score_count else 0,
+        "total_time_minutes": total_time // 60,
+        "source": "export"
+    }
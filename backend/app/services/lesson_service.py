@@ -1369,8 +1369,9 @@ class RecordingService:
     """Service for recording management"""
 
     @staticmethod
-    async def save_recording(user_id: str, lesson_id: str, duration_ms: int, file_path: str):
-        """Save recording metadata"""
+    async def save_recording(user_id: str, lesson_id: str, duration_ms: int, file_path: str,
+                             size_bytes: int = None, sha256: str = None):
+        """Save recording metadata (size and checksum as computed during upload)"""
         recording_id = f"recording_{uuid.uuid4().hex[:8]}"
         
         recording = {
@@ -1379,6 +1380,8 @@ class RecordingService:
             "lesson_id": lesson_id,
             "duration_ms": duration_ms,
             "file_path": file_path,
+            "size_bytes": size_bytes,
+            "sha256": sha256,
             "created_at": datetime.utcnow().isoformat(),
         }
         
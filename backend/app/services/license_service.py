@@ -2,9 +2,24 @@
 License Management System for PhonicsLearn
 """
 from datetime import datetime, timedelta
-from enum import Enum
-from typing import Optional, Dict
+from enum import Enum, IntFlag
+from typing import Optional, Dict, List, NamedTuple, Tuple
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
+import asyncio
+import bisect
+import os
+import threading
+import time
+
+from ..db.database import get_db_context
+from ..db.models import License as LicenseRecord
+from .auth_cache import TTLCache
+
+LICENSE_CACHE_TTL_SECONDS = float(os.getenv("LICENSE_CACHE_TTL_SECONDS", 60))
+LICENSE_NEGATIVE_CACHE_TTL_SECONDS = float(os.getenv("LICENSE_NEGATIVE_CACHE_TTL_SECONDS", 5))
+LICENSE_CACHE_MAX_ENTRIES = int(os.getenv("LICENSE_CACHE_MAX_ENTRIES", 50000))
+LICENSE_SWEEP_INTERVAL_SECONDS = int(os.getenv("LICENSE_SWEEP_INTERVAL_SECONDS", 300))
 
 class LicenseType(str, Enum):
     FREE_TRIAL = "free_trial"
@@ -33,6 +48,55 @@ class License(BaseModel):
     max_students: int
     features: LicenseFeatures
 
+class Feature(IntFlag):
+    """Boolean license features as bits of an entitlement mask"""
+    PROGRESS_TRACKING = 1 << 0
+    TEACHER_DASHBOARD = 1 << 1
+    CUSTOM_LESSONS = 1 << 2
+    ANALYTICS = 1 << 3
+    PRIORITY_SUPPORT = 1 << 4
+    API_ACCESS = 1 << 5
+
+# Feature name (as used by check_feature_access and the API) -> bit
+FEATURE_FLAGS: Dict[str, Feature] = {flag.name.lower(): flag for flag in Feature}
+
+class Entitlements(NamedTuple):
+    """A license compiled down to a feature mask, its limits and its validity window"""
+    features: int
+    max_students: int
+    max_lessons: int
+    valid_until: float  # Unix timestamp; 0 for deactivated or expired licenses
+
+    def is_valid(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) < self.valid_until
+
+    def allows(self, mask: int, now: Optional[float] = None) -> bool:
+        """True if the license is valid and has every feature in the mask"""
+        return self.is_valid(now) and self.features & mask == mask
+
+NO_ENTITLEMENTS = Entitlements(features=0, max_students=0, max_lessons=0, valid_until=0)
+
+def feature_mask(features: LicenseFeatures) -> int:
+    """Pack the boolean fields of a feature set into a Feature mask"""
+    mask = 0
+    for name, flag in FEATURE_FLAGS.items():
+        if getattr(features, name):
+            mask |= flag
+    return mask
+
+def compile_entitlements(license: License) -> Entitlements:
+    """Compile a license into its entitlement mask and limits"""
+    if not license.is_active or license.license_type == LicenseType.EXPIRED:
+        valid_until = 0.0
+    else:
+        valid_until = license.end_date.timestamp()
+    return Entitlements(
+        features=feature_mask(license.features),
+        max_students=license.max_students,
+        max_lessons=license.features.max_lessons,
+        valid_until=valid_until
+    )
+
 # License tier definitions
 LICENSE_TIERS = {
     LicenseType.FREE_TRIAL: LicenseFeatures(
@@ -77,8 +141,270 @@ LICENSE_TIERS = {
     )
 }
 
-# In-memory license storage (replace with database in production)
-licenses_db: Dict[str, License] = {}
+# Default feature mask per tier (stored licenses carry their own feature set)
+TIER_FEATURE_MASKS: Dict[LicenseType, int] = {
+    license_type: feature_mask(features) for license_type, features in LICENSE_TIERS.items()
+}
+
+_NOT_FOUND = object()
+
+class LicenseRepository:
+    """
+    Database-backed license store with a read-through cache and an expiry index
+
+    Lookups are served from memory once a key has been read, so validation
+    does not touch the database on the hot path. Active licenses are also kept
+    in a list sorted by end_date; expiry sweeps take the expired prefix of that
+    list (and the matching end_date range in the table) instead of checking
+    every license on every validation.
+    """
+    def __init__(self, cache_ttl: float = LICENSE_CACHE_TTL_SECONDS, max_entries: int = LICENSE_CACHE_MAX_ENTRIES):
+        self.cache_ttl = cache_ttl
+        self._cache = TTLCache(max_entries)
+        self._expiry_index: List[Tuple[datetime, str]] = []
+        self._indexed_end_dates: Dict[str, datetime] = {}
+        # Licenses that could not be written (database unavailable); served from memory
+        self._unpersisted: Dict[str, License] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _from_record(row: LicenseRecord) -> License:
+        license_type = LicenseType(row.license_type)
+        if row.features:
+            features = LicenseFeatures(**row.features)
+        else:
+            features = LICENSE_TIERS.get(license_type, LICENSE_TIERS[LicenseType.FREE_TRIAL])
+        return License(
+            license_key=row.license_key,
+            license_type=license_type,
+            user_email=row.user_email or "",
+            start_date=row.start_date,
+            end_date=row.end_date,
+            is_active=bool(row.is_active),
+            max_students=row.max_students if row.max_students is not None else features.max_students,
+            features=features
+        )
+
+    def _index(self, license: License):
+        """Keep the expiry index in step with a license's current state"""
+        with self._lock:
+            previous = self._indexed_end_dates.pop(license.license_key, None)
+            if previous is not None:
+                position = bisect.bisect_left(self._expiry_index, (previous, license.license_key))
+                if position < len(self._expiry_index) and self._expiry_index[position] == (previous, license.license_key):
+                    del self._expiry_index[position]
+            if license.is_active and license.license_type != LicenseType.EXPIRED:
+                bisect.insort(self._expiry_index, (license.end_date, license.license_key))
+                self._indexed_end_dates[license.license_key] = license.end_date
+
+    def _lookup(self, license_key: str) -> Optional[Tuple[License, Entitlements]]:
+        cached = self._cache.get(license_key)
+        if cached is not None:
+            return None if cached is _NOT_FOUND else cached
+
+        if license_key in self._unpersisted:
+            license = self._unpersisted[license_key]
+            return license, compile_entitlements(license)
+
+        try:
+            with get_db_context() as db:
+                row = db.query(LicenseRecord).filter(LicenseRecord.license_key == license_key).first()
+                license = self._from_record(row) if row else None
+        except Exception as e:
+            print(f"⚠️  License lookup failed for {license_key[:8]}...: {e}")
+            return None
+
+        if license is None:
+            self._cache.set(license_key, _NOT_FOUND, LICENSE_NEGATIVE_CACHE_TTL_SECONDS)
+            return None
+
+        entry = (license, compile_entitlements(license))
+        self._cache.set(license_key, entry, self.cache_ttl)
+        self._index(license)
+        return entry
+
+    def get(self, license_key: str) -> Optional[License]:
+        """
+        Look up a license, reading through to the database on a cache miss
+
+        Returns:
+            The license, or None if the key does not exist
+        """
+        entry = self._lookup(license_key)
+        return entry[0] if entry else None
+
+    def get_entitlements(self, license_key: str) -> Entitlements:
+        """
+        Compiled entitlements for a license, cached alongside it
+
+        Returns:
+            The license's entitlements, or NO_ENTITLEMENTS if the key does not exist
+        """
+        entry = self._lookup(license_key)
+        return entry[1] if entry else NO_ENTITLEMENTS
+
+    @staticmethod
+    def _write(db: Session, license: License, user_id: Optional[int], stripe_subscription_id: Optional[str]):
+        values = {
+            "license_type": license.license_type.value,
+            "user_email": license.user_email,
+            "start_date": license.start_date,
+            "end_date": license.end_date,
+            "is_active": license.is_active,
+            "max_students": license.max_students,
+            "max_lessons": license.features.max_lessons,
+            "features": license.features.model_dump(),
+        }
+        if user_id is not None:
+            values["user_id"] = user_id
+        if stripe_subscription_id is not None:
+            values["stripe_subscription_id"] = stripe_subscription_id
+
+        row = db.query(LicenseRecord).filter(LicenseRecord.license_key == license.license_key).first()
+        if row is None:
+            db.add(LicenseRecord(license_key=license.license_key, **values))
+        else:
+            for key, value in values.items():
+                setattr(row, key, value)
+
+    def save(self, license: License, user_id: Optional[int] = None,
+             stripe_subscription_id: Optional[str] = None, db: Optional[Session] = None) -> License:
+        """
+        Insert or update a license and refresh its cache and index entries
+
+        Args:
+            license: License to store
+            user_id: Owning user, if known
+            stripe_subscription_id: Subscription that pays for the license, if any
+            db: Caller's session. The license is written into the caller's
+                transaction and not committed; call remember() after the
+                caller commits. Errors are raised instead of keeping the
+                license in memory.
+
+        Returns:
+            The stored license
+        """
+        if db is not None:
+            self._write(db, license, user_id, stripe_subscription_id)
+            db.flush()
+            return license
+
+        try:
+            with get_db_context() as session:
+                self._write(session, license, user_id, stripe_subscription_id)
+                session.commit()
+            self._unpersisted.pop(license.license_key, None)
+        except Exception as e:
+            print(f"⚠️  License {license.license_key[:8]}... kept in memory only: {e}")
+            self._unpersisted[license.license_key] = license
+
+        self.remember(license)
+        return license
+
+    def remember(self, license: License):
+        """Cache and index a license that was committed by the caller (see save)"""
+        self._cache.set(license.license_key, (license, compile_entitlements(license)), self.cache_ttl)
+        self._index(license)
+
+    def invalidate(self, license_key: str):
+        """Drop a cached license after it was changed outside the repository"""
+        self._cache.pop(license_key)
+
+    def load_expiry_index(self):
+        """Rebuild the expiry index from every active license in the database"""
+        with get_db_context() as db:
+            rows = db.query(LicenseRecord.end_date, LicenseRecord.license_key).filter(
+                LicenseRecord.is_active == True,
+                LicenseRecord.license_type != LicenseType.EXPIRED.value
+            ).order_by(LicenseRecord.end_date, LicenseRecord.license_key).all()
+
+        with self._lock:
+            self._expiry_index = [(end_date, key) for end_date, key in rows]
+            self._indexed_end_dates = {key: end_date for end_date, key in rows}
+            for license in self._unpersisted.values():
+                if license.is_active and license.license_type != LicenseType.EXPIRED:
+                    bisect.insort(self._expiry_index, (license.end_date, license.license_key))
+                    self._indexed_end_dates[license.license_key] = license.end_date
+        print(f"✓ License expiry index loaded ({len(rows)} active licenses)")
+
+    def expiring_between(self, start: datetime, end: datetime) -> List[str]:
+        """Keys of active licenses whose end_date falls in [start, end)"""
+        with self._lock:
+            low = bisect.bisect_left(self._expiry_index, (start, ""))
+            high = bisect.bisect_left(self._expiry_index, (end, ""))
+            return [key for _, key in self._expiry_index[low:high]]
+
+    def sweep_expired(self, now: Optional[datetime] = None) -> List[str]:
+        """
+        Mark every license whose end_date has passed as expired
+
+        Only the expired prefix of the index and the matching end_date range of
+        the table are touched. Safe to run from several workers at once.
+
+        Returns:
+            Keys of the licenses that were expired by this sweep
+        """
+        now = now or datetime.now()
+        with self._lock:
+            cutoff = bisect.bisect_right(self._expiry_index, (now, "\uffff"))
+            expired = [key for _, key in self._expiry_index[:cutoff]]
+            del self._expiry_index[:cutoff]
+            for key in expired:
+                self._indexed_end_dates.pop(key, None)
+
+        try:
+            with get_db_context() as db:
+                query = db.query(LicenseRecord).filter(
+                    LicenseRecord.is_active == True,
+                    LicenseRecord.end_date <= now
+                )
+                stored = [key for (key,) in query.with_entities(LicenseRecord.license_key)]
+                query.update(
+                    {"is_active": False, "license_type": LicenseType.EXPIRED.value},
+                    synchronize_session=False
+                )
+                db.commit()
+        except Exception as e:
+            print(f"⚠️  License expiry sweep could not update storage: {e}")
+            stored = []
+
+        swept = sorted(set(expired) | set(stored))
+        for key in swept:
+            license = self._unpersisted.get(key)
+            if license is not None:
+                self._unpersisted[key] = license.model_copy(
+                    update={"is_active": False, "license_type": LicenseType.EXPIRED}
+                )
+            self._cache.pop(key)
+        return swept
+
+    def get_stats(self) -> dict:
+        return {
+            "cached": len(self._cache),
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "indexed_active": len(self._expiry_index),
+            "unpersisted": len(self._unpersisted),
+            "next_expiry": self._expiry_index[0][0].isoformat() if self._expiry_index else None
+        }
+
+license_store = LicenseRepository()
+
+async def license_expiry_sweep_loop(interval_seconds: int = LICENSE_SWEEP_INTERVAL_SECONDS):
+    """Load the expiry index, then expire lapsed licenses on a fixed interval"""
+    try:
+        await asyncio.to_thread(license_store.load_expiry_index)
+    except Exception as e:
+        print(f"⚠️  License expiry index not loaded: {e}")
+
+    while True:
+        try:
+            swept = await asyncio.to_thread(license_store.sweep_expired)
+            if swept:
+                print(f"✓ Expired {len(swept)} licenses")
+        except Exception as e:
+            print(f"⚠️  License expiry sweep failed: {e}")
+        await asyncio.sleep(interval_seconds)
 
 def generate_license_key(email: str, license_type: LicenseType) -> str:
     """Generate a unique license key"""
@@ -88,8 +414,10 @@ def generate_license_key(email: str, license_type: LicenseType) -> str:
     raw = f"{email}{license_type.value}{timestamp}{secrets.token_hex(8)}"
     return hashlib.sha256(raw.encode()).hexdigest()[:32].upper()
 
-def create_license(email: str, license_type: LicenseType, duration_days: int = 14) -> License:
-    """Create a new license"""
+def create_license(email: str, license_type: LicenseType, duration_days: int = 14,
+                   user_id: Optional[int] = None, stripe_subscription_id: Optional[str] = None,
+                   db: Optional[Session] = None) -> License:
+    """Create a new license (in the caller's transaction if db is given; see LicenseRepository.save)"""
     license_key = generate_license_key(email, license_type)
     start_date = datetime.now()
     end_date = start_date + timedelta(days=duration_days)
@@ -105,67 +433,93 @@ def create_license(email: str, license_type: LicenseType, duration_days: int = 1
         features=LICENSE_TIERS[license_type]
     )
     
-    licenses_db[license_key] = license
-    return license
+    return license_store.save(license, user_id=user_id, stripe_subscription_id=stripe_subscription_id, db=db)
 
 def validate_license(license_key: str) -> tuple[bool, Optional[License], str]:
-    """Validate a license key and return status"""
-    if license_key not in licenses_db:
+    """
+    Validate a license key and return status
+
+    Read-only: licenses past their end_date are reported as expired here and
+    marked expired in storage by the periodic sweep.
+    """
+    license = license_store.get(license_key)
+    if not license:
         return False, None, "Invalid license key"
     
-    license = licenses_db[license_key]
+    if license.license_type == LicenseType.EXPIRED:
+        return False, license, "License has expired"
     
     if not license.is_active:
         return False, license, "License has been deactivated"
     
     if datetime.now() > license.end_date:
-        license.is_active = False
-        license.license_type = LicenseType.EXPIRED
         return False, license, "License has expired"
     
     return True, license, "License is valid"
 
 def check_feature_access(license_key: str, feature: str) -> bool:
     """Check if a license has access to a specific feature"""
-    is_valid, license, _ = validate_license(license_key)
-    
-    if not is_valid or not license:
+    flag = FEATURE_FLAGS.get(feature)
+    if flag is None:
         return False
     
-    return getattr(license.features, feature, False)
+    return license_store.get_entitlements(license_key).allows(flag)
+
+def check_features_batch(license_keys: List[str], features: List[str]) -> Dict[str, Dict[str, bool]]:
+    """
+    Check many features for many licenses in one pass
+
+    Each license is looked up once; every feature check is a mask test.
+
+    Returns:
+        license_key -> feature -> has_access (unknown features are False)
+    """
+    flags = [(feature, FEATURE_FLAGS.get(feature)) for feature in features]
+    now = time.time()
+    results = {}
+    for license_key in license_keys:
+        entitlements = license_store.get_entitlements(license_key)
+        results[license_key] = {
+            feature: flag is not None and entitlements.allows(flag, now)
+            for feature, flag in flags
+        }
+    return results
 
 def get_days_remaining(license_key: str) -> int:
     """Get days remaining on license"""
-    if license_key not in licenses_db:
+    license = license_store.get(license_key)
+    if not license:
         return 0
     
-    license = licenses_db[license_key]
     remaining = (license.end_date - datetime.now()).days
     return max(0, remaining)
 
 def upgrade_license(license_key: str, new_type: LicenseType, duration_days: int = 30) -> Optional[License]:
     """Upgrade an existing license"""
-    if license_key not in licenses_db:
+    license = license_store.get(license_key)
+    if not license:
         return None
     
-    license = licenses_db[license_key]
-    license.license_type = new_type
-    license.end_date = datetime.now() + timedelta(days=duration_days)
-    license.is_active = True
-    license.features = LICENSE_TIERS[new_type]
-    license.max_students = LICENSE_TIERS[new_type].max_students
+    # Cached licenses are shared between requests, so change a copy
+    upgraded = license.model_copy(update={
+        "license_type": new_type,
+        "end_date": datetime.now() + timedelta(days=duration_days),
+        "is_active": True,
+        "features": LICENSE_TIERS[new_type],
+        "max_students": LICENSE_TIERS[new_type].max_students
+    })
     
-    return license
+    return license_store.save(upgraded)
 
 def extend_license(license_key: str, days: int) -> Optional[License]:
     """Extend license duration"""
-    if license_key not in licenses_db:
+    license = license_store.get(license_key)
+    if not license:
         return None
     
-    license = licenses_db[license_key]
-    license.end_date += timedelta(days=days)
+    extended = license.model_copy(update={"end_date": license.end_date + timedelta(days=days)})
     
-    return license
+    return license_store.save(extended)
 
 def get_license_info(license_key: str) -> Optional[Dict]:
     """Get detailed license information"""
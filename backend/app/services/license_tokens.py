@@ -0,0 +1,236 @@
+"""
+Signed License Tokens
+Compact tokens embedding a license's tier, expiry and feature mask, so clients
+and edge middleware can verify a license without calling the API
+
+Token format: PL1.<base64url JSON claims>.<base64url signature>
+The signature covers "PL1.<claims>" and is HMAC-SHA256 (LICENSE_TOKEN_ALGORITHM=HS256)
+or Ed25519 (LICENSE_TOKEN_ALGORITHM=EdDSA; verifiers only need the public key).
+Revoked licenses are published as a versioned list that clients delta-sync.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+from ..db.database import get_db_context
+from ..db.models import LicenseRevocation
+from .auth_service import SECRET_KEY
+from .license_service import Entitlements, License, compile_entitlements
+
+try:
+    from cryptography.exceptions import InvalidSignature
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:  # HS256 tokens still work without cryptography
+    Ed25519PrivateKey = None
+
+TOKEN_PREFIX = "PL1"
+
+LICENSE_TOKEN_ALGORITHM = os.getenv("LICENSE_TOKEN_ALGORITHM", "HS256")  # HS256 or EdDSA
+LICENSE_TOKEN_SECRET = os.getenv("LICENSE_TOKEN_SECRET", SECRET_KEY)
+LICENSE_TOKEN_PRIVATE_KEY = os.getenv("LICENSE_TOKEN_PRIVATE_KEY")  # base64url Ed25519 seed (32 bytes)
+LICENSE_REVOCATION_SYNC_SECONDS = float(os.getenv("LICENSE_REVOCATION_SYNC_SECONDS", 30))
+
+class LicenseTokenError(ValueError):
+    """Raised when a license token is malformed, forged, expired or revoked"""
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _load_signing_key():
+    if LICENSE_TOKEN_ALGORITHM == "HS256":
+        return None
+    if LICENSE_TOKEN_ALGORITHM != "EdDSA":
+        raise ValueError(f"Unsupported LICENSE_TOKEN_ALGORITHM: {LICENSE_TOKEN_ALGORITHM}")
+    if Ed25519PrivateKey is None:
+        raise ImportError("EdDSA license tokens require the cryptography package")
+    if LICENSE_TOKEN_PRIVATE_KEY:
+        return Ed25519PrivateKey.from_private_bytes(_b64decode(LICENSE_TOKEN_PRIVATE_KEY))
+    print("⚠️  LICENSE_TOKEN_PRIVATE_KEY not set; license tokens will not survive a restart")
+    return Ed25519PrivateKey.generate()
+
+_signing_key = _load_signing_key()
+
+def _sign(message: bytes) -> bytes:
+    if _signing_key is None:
+        return hmac.new(LICENSE_TOKEN_SECRET.encode(), message, hashlib.sha256).digest()
+    return _signing_key.sign(message)
+
+def _signature_matches(message: bytes, signature: bytes) -> bool:
+    if _signing_key is None:
+        return hmac.compare_digest(_sign(message), signature)
+    try:
+        _signing_key.public_key().verify(signature, message)
+        return True
+    except InvalidSignature:
+        return False
+
+def get_public_key() -> Optional[str]:
+    """Base64url raw Ed25519 public key for offline verifiers (None for HS256)"""
+    if _signing_key is None:
+        return None
+    raw = _signing_key.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw
+    )
+    return _b64encode(raw)
+
+def issue_license_token(license: License) -> str:
+    """
+    Issue a signed token for a license
+
+    The token expires with the license; revocation covers earlier deactivation.
+
+    Args:
+        license: License to encode
+
+    Returns:
+        Compact token string
+    """
+    entitlements = compile_entitlements(license)
+    claims = {
+        "k": license.license_key,
+        "t": license.license_type.value,
+        "f": entitlements.features,
+        "s": entitlements.max_students,
+        "l": entitlements.max_lessons,
+        "iat": int(time.time()),
+        "exp": int(entitlements.valid_until),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    signing_input = f"{TOKEN_PREFIX}.{payload}".encode()
+    return f"{TOKEN_PREFIX}.{payload}.{_b64encode(_sign(signing_input))}"
+
+def verify_license_token(token: str, check_revocation: bool = True, now: Optional[float] = None) -> dict:
+    """
+    Verify a license token without touching the license store
+
+    Args:
+        token: Token from issue_license_token
+        check_revocation: Also check the (periodically synced) revocation list
+        now: Override the current Unix time
+
+    Returns:
+        Token claims
+
+    Raises:
+        LicenseTokenError: If the token is malformed, forged, expired or revoked
+    """
+    try:
+        prefix, payload, signature = token.split(".")
+        if prefix != TOKEN_PREFIX:
+            raise ValueError("unknown token version")
+        signature_bytes = _b64decode(signature)
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        raise LicenseTokenError("Malformed license token")
+
+    if not _signature_matches(f"{prefix}.{payload}".encode(), signature_bytes):
+        raise LicenseTokenError("Invalid license token signature")
+
+    if claims.get("exp", 0) <= (now or time.time()):
+        raise LicenseTokenError("License token has expired")
+
+    if check_revocation and revocation_list.is_revoked(claims.get("k", "")):
+        raise LicenseTokenError("License has been revoked")
+
+    return claims
+
+def entitlements_from_claims(claims: dict) -> Entitlements:
+    """Entitlements carried by a verified token"""
+    return Entitlements(
+        features=claims["f"],
+        max_students=claims["s"],
+        max_lessons=claims["l"],
+        valid_until=float(claims["exp"])
+    )
+
+class RevocationList:
+    """
+    Local copy of the license revocation list
+
+    Revocation row ids are monotonically increasing, so the highest id seen is
+    the list version and a sync only fetches rows newer than it.
+    """
+    def __init__(self, sync_interval: float = LICENSE_REVOCATION_SYNC_SECONDS):
+        self.sync_interval = sync_interval
+        self.version = 0
+        self._revoked: Dict[str, int] = {}
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    def apply(self, entries: List[dict]):
+        """Merge revocation entries ({"license_key", "version"}) into the local list"""
+        with self._lock:
+            for entry in entries:
+                self._revoked[entry["license_key"]] = entry["version"]
+                self.version = max(self.version, entry["version"])
+
+    def sync(self, force: bool = False):
+        """Fetch revocations newer than the local version, at most once per sync interval"""
+        if not force and time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+        try:
+            self.apply(get_revocations_since(self.version))
+        except Exception as e:
+            print(f"⚠️  License revocation sync failed: {e}")
+
+    def is_revoked(self, license_key: str) -> bool:
+        self.sync()
+        return license_key in self._revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+revocation_list = RevocationList()
+
+def get_revocations_since(version: int, limit: int = 10000) -> List[dict]:
+    """
+    Revocations added after a list version, oldest first
+
+    Args:
+        version: Last version the caller has applied (0 for the full list)
+        limit: Maximum entries to return; callers page by passing the last version
+
+    Returns:
+        List of {"license_key", "version", "revoked_at"} entries
+    """
+    with get_db_context() as db:
+        rows = db.query(LicenseRevocation).filter(
+            LicenseRevocation.id > version
+        ).order_by(LicenseRevocation.id).limit(limit).all()
+
+        return [
+            {
+                "license_key": row.license_key,
+                "version": row.id,
+                "revoked_at": row.revoked_at.isoformat() if row.revoked_at else None
+            }
+            for row in rows
+        ]
+
+def revoke_license(license_key: str, reason: Optional[str] = None) -> int:
+    """
+    Add a license to the revocation list
+
+    Returns:
+        The new revocation list version
+    """
+    with get_db_context() as db:
+        revocation = LicenseRevocation(license_key=license_key, reason=reason, revoked_at=datetime.utcnow())
+        db.add(revocation)
+        db.commit()
+        version = revocation.id
+
+    revocation_list.apply([{"license_key": license_key, "version": version}])
+    return version
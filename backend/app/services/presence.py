@@ -0,0 +1,173 @@
+"""
+Student Presence
+Moves students from active to idle to offline as they stop sending activity,
+using a hashed timing wheel so every touch and every expiry is O(1), and
+sends the resulting status changes to teacher dashboards once per tick
+
+Classes keep per-status counters (see teacher.TeacherClass.set_status), so
+"who is online" is a counter read rather than a scan of the class.
+"""
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+import asyncio
+import math
+import os
+import time
+
+from .pubsub import broadcast
+
+PRESENCE_TICK_SECONDS = float(os.getenv("PRESENCE_TICK_SECONDS", 1))
+PRESENCE_IDLE_SECONDS = float(os.getenv("PRESENCE_IDLE_SECONDS", 60))  # No activity -> idle
+PRESENCE_OFFLINE_SECONDS = float(os.getenv("PRESENCE_OFFLINE_SECONDS", 300))  # No activity -> offline
+
+class TimingWheel:
+    """
+    Hashed timing wheel: a ring of slots, one per tick
+
+    A key scheduled `delay` seconds ahead goes into the slot that many ticks
+    past the current one; advancing the wheel expires whole slots at once.
+    Delays longer than the wheel's span are clamped to it.
+    """
+    def __init__(self, tick_seconds: float, span_seconds: float):
+        self.tick_seconds = tick_seconds
+        self.slots: List[Set[Hashable]] = [set() for _ in range(int(math.ceil(span_seconds / tick_seconds)) + 1)]
+        self.position = 0
+        self._slot_of: Dict[Hashable, int] = {}
+        self._last_tick = time.monotonic()
+
+    def schedule(self, key: Hashable, delay: float):
+        """(Re)schedule a key to expire after delay seconds"""
+        self.cancel(key)
+        ticks = min(len(self.slots) - 1, max(1, math.ceil(delay / self.tick_seconds)))
+        slot = (self.position + ticks) % len(self.slots)
+        self.slots[slot].add(key)
+        self._slot_of[key] = slot
+
+    def cancel(self, key: Hashable):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self.slots[slot].discard(key)
+
+    def advance(self, now: Optional[float] = None) -> List[Hashable]:
+        """
+        Move the wheel up to the current time
+
+        Returns:
+            Keys whose time has come
+        """
+        now = time.monotonic() if now is None else now
+        ticks = int((now - self._last_tick) / self.tick_seconds)
+        if ticks <= 0:
+            return []
+        self._last_tick += ticks * self.tick_seconds
+
+        expired = []
+        for _ in range(min(ticks, len(self.slots))):
+            self.position = (self.position + 1) % len(self.slots)
+            slot = self.slots[self.position]
+            if slot:
+                expired.extend(slot)
+                for key in slot:
+                    del self._slot_of[key]
+                self.slots[self.position] = set()
+        return expired
+
+    def __len__(self):
+        return len(self._slot_of)
+
+ClassResolver = Callable[[str], Optional[object]]
+
+class PresenceTracker:
+    """Inactivity timers for (teacher_id, student_id) sessions"""
+    def __init__(self, idle_after: float = PRESENCE_IDLE_SECONDS, offline_after: float = PRESENCE_OFFLINE_SECONDS,
+                 tick_seconds: float = PRESENCE_TICK_SECONDS):
+        self.idle_after = idle_after
+        self.offline_after = offline_after
+        self.wheel = TimingWheel(tick_seconds, max(idle_after, offline_after - idle_after))
+        self.resolve_class: Optional[ClassResolver] = None
+        self.channel_for: Callable[[str], str] = str
+        self._changes: Dict[str, Dict[str, str]] = {}  # teacher_id -> student_id -> new status
+        self.metrics = {"touches": 0, "went_idle": 0, "went_offline": 0}
+
+    def attach(self, resolve_class: ClassResolver, channel_for: Callable[[str], str]):
+        """
+        Connect the tracker to the live classes
+
+        Args:
+            resolve_class: Live class (with students, set_status, presence_counts) for a teacher id
+            channel_for: Dashboard channel for a teacher id
+        """
+        self.resolve_class = resolve_class
+        self.channel_for = channel_for
+
+    def _set_status(self, teacher_id: str, student_id: str, status: str) -> bool:
+        teacher_class = self.resolve_class(teacher_id) if self.resolve_class else None
+        if teacher_class is None or not teacher_class.set_status(student_id, status):
+            return False
+        self._changes.setdefault(teacher_id, {})[student_id] = status
+        return True
+
+    def touch(self, teacher_id: str, student_id: str, status: str = "active"):
+        """Record activity: mark the student active and restart their idle timer"""
+        self.metrics["touches"] += 1
+        self._set_status(teacher_id, student_id, status)
+        self.wheel.schedule((teacher_id, student_id), self.idle_after)
+
+    def disconnect(self, teacher_id: str, student_id: str):
+        """The student's app closed its connection: offline until it is active again"""
+        self.wheel.cancel((teacher_id, student_id))
+        self._set_status(teacher_id, student_id, "offline")
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """
+        Apply inactivity transitions that are due
+
+        Returns:
+            Number of students whose status changed
+        """
+        changed = 0
+        for teacher_id, student_id in self.wheel.advance(now):
+            teacher_class = self.resolve_class(teacher_id) if self.resolve_class else None
+            session = teacher_class.students.get(student_id) if teacher_class else None
+            if session is None:
+                continue
+            if session.status in ("active", "practicing"):
+                if self._set_status(teacher_id, student_id, "idle"):
+                    changed += 1
+                    self.metrics["went_idle"] += 1
+                self.wheel.schedule((teacher_id, student_id), self.offline_after - self.idle_after)
+            elif session.status == "idle":
+                if self._set_status(teacher_id, student_id, "offline"):
+                    changed += 1
+                    self.metrics["went_offline"] += 1
+        return changed
+
+    def drain(self) -> List[Tuple[str, dict]]:
+        """One presence frame per dashboard channel with status changes since the last drain"""
+        changes, self._changes = self._changes, {}
+        frames = []
+        for teacher_id, students in changes.items():
+            teacher_class = self.resolve_class(teacher_id) if self.resolve_class else None
+            if teacher_class is None:
+                continue
+            frames.append((self.channel_for(teacher_id), {
+                "type": "presence",
+                "changes": [{"student_id": sid, "status": status} for sid, status in students.items()],
+                "counts": teacher_class.presence_counts()
+            }))
+        return frames
+
+    def get_stats(self) -> dict:
+        return {"tracked": len(self.wheel), "pending_classes": len(self._changes), **self.metrics}
+
+presence_tracker = PresenceTracker()
+
+async def presence_loop(tick_seconds: float = PRESENCE_TICK_SECONDS):
+    """Expire inactive students and publish presence deltas every tick"""
+    while True:
+        await asyncio.sleep(tick_seconds)
+        try:
+            presence_tracker.expire()
+            for channel, frame in presence_tracker.drain():
+                await broadcast(channel, frame)
+        except Exception as e:
+            print(f"⚠️  Presence update failed: {e}")
@@ -0,0 +1,398 @@
+"""
+Pub/Sub Bus
+Carries dashboard broadcasts between uvicorn workers (and nodes), so a student
+update reaches the teacher's socket whichever worker holds it
+
+Backends (PUBSUB_BACKEND):
+    memory - single process; messages go straight to the local hub
+    unix   - local broker on a Unix socket, run by whichever worker holds the
+             lock file; the others connect to it (one machine, many workers)
+    redis  - any Redis-compatible server, spoken to over RESP (many nodes)
+
+Every worker subscribes only to the channels its own sockets are on, and a
+published message reaches local sockets through the bus like any other.
+
+Only dashboard traffic goes over the bus. Live class state (students added
+to a class, their sessions and the class aggregates in routes/teacher.py)
+stays in each worker's memory. With several workers, a student added on one
+worker and reporting progress through another is not in that worker's
+class. The progress is still relayed to the dashboard, but it is missing
+from that worker's class stats. Run one worker per class, or pin clients
+to a worker, if the stats must be exact.
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import quote, unquote, urlparse
+import asyncio
+import fcntl
+import os
+
+from .ws_hub import BroadcastHub, hub, serialize
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")  # memory, unix or redis (class state stays per worker, see above)
+PUBSUB_SOCKET_PATH = os.getenv("PUBSUB_SOCKET_PATH", "/tmp/phonics-pubsub.sock")
+PUBSUB_REDIS_URL = os.getenv("PUBSUB_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+PUBSUB_RECONNECT_SECONDS = float(os.getenv("PUBSUB_RECONNECT_SECONDS", 1))
+PUBSUB_MAX_MESSAGE_BYTES = int(os.getenv("PUBSUB_MAX_MESSAGE_BYTES", 1024 * 1024))
+PUBSUB_BROKER_MAX_BUFFER = int(os.getenv("PUBSUB_BROKER_MAX_BUFFER", 4 * 1024 * 1024))  # Per subscriber
+
+Handler = Callable[[str, str], None]
+
+class PubSubBus:
+    """Publish serialized messages to channels; deliver subscribed channels to a handler"""
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.channels: Set[str] = set()
+        self.metrics = {"published": 0, "received": 0, "local_fallback": 0, "reconnects": 0}
+
+    def attach(self, target: BroadcastHub):
+        """Deliver messages to a hub and follow the channels it has sockets on"""
+        self.handler = target.publish_serialized
+        target.channel_listener = self.set_subscribed
+        for channel in list(target.channels):
+            self.set_subscribed(channel, True)
+
+    def set_subscribed(self, channel: str, subscribed: bool):
+        if subscribed:
+            self.channels.add(channel)
+        else:
+            self.channels.discard(channel)
+
+    def _deliver(self, channel: str, payload: str):
+        self.metrics["received"] += 1
+        if self.handler is not None and channel in self.channels:
+            self.handler(channel, payload)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def publish(self, channel: str, payload: str):
+        self.metrics["published"] += 1
+        self._deliver(channel, payload)
+
+    def get_stats(self) -> dict:
+        return {"backend": type(self).__name__, "subscribed_channels": len(self.channels), **self.metrics}
+
+MemoryBus = PubSubBus
+
+class StreamBus(PubSubBus, ABC):
+    """
+    Bus over a stream connection to a broker, with one connection for
+    subscriptions and one for publishing; both reconnect on failure and
+    subscriptions are replayed after a reconnect
+
+    Subclasses implement the protocol hooks (_open, _encode_subscribe,
+    _encode_publish, _read_message).
+    """
+    def __init__(self):
+        super().__init__()
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._publisher: Optional[asyncio.StreamWriter] = None
+        self._publisher_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    # Protocol hooks
+    @abstractmethod
+    async def _open(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a connection to the broker"""
+
+    @abstractmethod
+    def _encode_subscribe(self, channels: List[str], subscribed: bool) -> bytes:
+        """Bytes that (un)subscribe the connection from channels"""
+
+    @abstractmethod
+    def _encode_publish(self, channel: str, payload: str) -> bytes:
+        """Bytes that publish a payload on a channel"""
+
+    @abstractmethod
+    async def _read_message(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str]]:
+        """Next (channel, payload), None for non-message replies; raises on EOF"""
+
+    async def _drain_replies(self, reader: asyncio.StreamReader):
+        """Consume publish acknowledgements; return when the connection closes"""
+        while await reader.read(65536):
+            pass
+
+    async def _before_connect(self):
+        pass
+
+    def set_subscribed(self, channel: str, subscribed: bool):
+        if subscribed == (channel in self.channels):
+            return
+        super().set_subscribed(channel, subscribed)
+        if self._subscriber is not None:
+            self._subscriber.write(self._encode_subscribe([channel], subscribed))
+
+    async def start(self):
+        self._tasks.append(asyncio.create_task(self._subscriber_loop()))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        for writer in (self._subscriber, self._publisher):
+            if writer is not None:
+                writer.close()
+        self._subscriber = self._publisher = None
+
+    async def _subscriber_loop(self):
+        while True:
+            try:
+                await self._before_connect()
+                reader, writer = await self._open()
+                if self.channels:
+                    writer.write(self._encode_subscribe(sorted(self.channels), True))
+                self._subscriber = writer
+                while True:
+                    message = await self._read_message(reader)
+                    if message is not None:
+                        self._deliver(*message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self._subscriber is not None:
+                    print(f"⚠️  Pub/sub connection lost, reconnecting: {e}")
+                self._subscriber = None
+                self.metrics["reconnects"] += 1
+                await asyncio.sleep(PUBSUB_RECONNECT_SECONDS)
+
+    async def _publisher_writer(self) -> asyncio.StreamWriter:
+        async with self._publisher_lock:
+            if self._publisher is None or self._publisher.is_closing():
+                await self._before_connect()
+                reader, writer = await self._open()
+                self._publisher = writer
+                self._tasks = [task for task in self._tasks if not task.done()]
+                self._tasks.append(asyncio.create_task(self._watch_publisher(reader, writer)))
+            return self._publisher
+
+    async def _watch_publisher(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            await self._drain_replies(reader)
+        except Exception:
+            pass
+        writer.close()
+        if self._publisher is writer:
+            self._publisher = None
+
+    async def publish(self, channel: str, payload: str):
+        self.metrics["published"] += 1
+        try:
+            writer = await self._publisher_writer()
+            writer.write(self._encode_publish(channel, payload))
+            await writer.drain()
+        except (OSError, ConnectionError) as e:
+            # Broker unreachable: at least reach the sockets on this worker
+            self.metrics["local_fallback"] += 1
+            print(f"⚠️  Pub/sub publish failed, delivering locally: {e}")
+            self._deliver(channel, payload)
+
+class LocalBroker:
+    """
+    Fan-out broker for workers on one machine
+
+    Line protocol (channels are percent-encoded, payloads are JSON so contain
+    no newlines): SUB <channel>, UNSUB <channel>, PUB <channel> <payload>;
+    subscribers receive MSG <channel> <payload>.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.subscriptions: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self.clients: Set[asyncio.StreamWriter] = set()
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left by a crashed broker; we hold the lock
+        self.server = await asyncio.start_unix_server(
+            self._handle_client, path=self.path, limit=PUBSUB_MAX_MESSAGE_BYTES
+        )
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        for writer in list(self.clients):
+            writer.close()
+        await asyncio.sleep(0.01)  # Let client handlers see EOF and exit
+
+    def _unsubscribe_all(self, writer: asyncio.StreamWriter):
+        for channel in [c for c, members in self.subscriptions.items() if writer in members]:
+            members = self.subscriptions[channel]
+            members.discard(writer)
+            if not members:
+                del self.subscriptions[channel]
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                command, _, rest = line.rstrip(b"\n").partition(b" ")
+                if command == b"PUB":
+                    channel, _, payload = rest.partition(b" ")
+                    frame = b"MSG " + rest + b"\n"
+                    for subscriber in list(self.subscriptions.get(channel.decode(), ())):
+                        if subscriber.transport.get_write_buffer_size() > PUBSUB_BROKER_MAX_BUFFER:
+                            # A worker that stopped reading must not grow the broker's memory
+                            self._unsubscribe_all(subscriber)
+                            subscriber.close()
+                            continue
+                        subscriber.write(frame)
+                elif command == b"SUB":
+                    self.subscriptions.setdefault(rest.decode(), set()).add(writer)
+                elif command == b"UNSUB":
+                    members = self.subscriptions.get(rest.decode())
+                    if members is not None:
+                        members.discard(writer)
+                        if not members:
+                            del self.subscriptions[rest.decode()]
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            self._unsubscribe_all(writer)
+            writer.close()
+
+class UnixSocketBus(StreamBus):
+    """Bus through a LocalBroker; the worker holding <socket>.lock runs the broker"""
+    def __init__(self, path: str = PUBSUB_SOCKET_PATH):
+        super().__init__()
+        self.path = path
+        self.broker: Optional[LocalBroker] = None
+        self._lock_file = None
+
+    async def _before_connect(self):
+        if self.broker is not None:
+            return
+        lock_file = open(f"{self.path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()  # Another worker runs the broker
+            return
+        self._lock_file = lock_file
+        self.broker = LocalBroker(self.path)
+        await self.broker.start()
+        print(f"✓ Pub/sub broker listening on {self.path} (pid {os.getpid()})")
+
+    async def _open(self):
+        return await asyncio.open_unix_connection(self.path, limit=PUBSUB_MAX_MESSAGE_BYTES)
+
+    def _encode_subscribe(self, channels: List[str], subscribed: bool) -> bytes:
+        command = "SUB" if subscribed else "UNSUB"
+        return "".join(f"{command} {quote(channel, safe='')}\n" for channel in channels).encode()
+
+    def _encode_publish(self, channel: str, payload: str) -> bytes:
+        return f"PUB {quote(channel, safe='')} {payload}\n".encode()
+
+    async def _read_message(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("broker closed the connection")
+        command, _, rest = line.rstrip(b"\n").partition(b" ")
+        if command != b"MSG":
+            return None
+        channel, _, payload = rest.partition(b" ")
+        return unquote(channel.decode()), payload.decode()
+
+    async def close(self):
+        await super().close()
+        if self.broker is not None:
+            await self.broker.close()
+            self.broker = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+def encode_resp(*args: str) -> bytes:
+    """Encode a command in the Redis serialization protocol"""
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg.encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+async def read_resp(reader: asyncio.StreamReader):
+    """
+    Read one RESP reply
+
+    Raises:
+        ConnectionError: On EOF or an error reply
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        raise ConnectionError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2].decode()
+    if kind == b"*":
+        count = int(body)
+        return [await read_resp(reader) for _ in range(count)] if count >= 0 else None
+    raise ConnectionError(f"Unexpected RESP reply: {line!r}")
+
+class RedisBus(StreamBus):
+    """Bus over a Redis-compatible server (PUBLISH / SUBSCRIBE)"""
+    def __init__(self, url: str = PUBSUB_REDIS_URL):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = parsed.username
+        self.password = parsed.password
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port, limit=PUBSUB_MAX_MESSAGE_BYTES)
+        if self.password:
+            credentials = (self.username, self.password) if self.username else (self.password,)
+            writer.write(encode_resp("AUTH", *credentials))
+            await read_resp(reader)
+        return reader, writer
+
+    def _encode_subscribe(self, channels: List[str], subscribed: bool) -> bytes:
+        return encode_resp("SUBSCRIBE" if subscribed else "UNSUBSCRIBE", *channels)
+
+    def _encode_publish(self, channel: str, payload: str) -> bytes:
+        return encode_resp("PUBLISH", channel, payload)
+
+    async def _read_message(self, reader: asyncio.StreamReader):
+        reply = await read_resp(reader)
+        if isinstance(reply, list) and len(reply) == 3 and reply[0] == "message":
+            return reply[1], reply[2]
+        return None
+
+    async def _drain_replies(self, reader: asyncio.StreamReader):
+        while True:
+            await read_resp(reader)
+
+def create_bus(backend: str = PUBSUB_BACKEND) -> PubSubBus:
+    """
+    Build the configured bus
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == "memory":
+        return MemoryBus()
+    if backend == "unix":
+        return UnixSocketBus()
+    if backend == "redis":
+        return RedisBus()
+    raise ValueError(f"Unknown PUBSUB_BACKEND: {backend}")
+
+bus = create_bus()
+bus.attach(hub)
+
+async def broadcast(channel: str, message: dict):
+    """Serialize a message once and publish it to every worker's sockets on a channel"""
+    await bus.publish(channel, serialize(message))
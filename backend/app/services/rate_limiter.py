@@ -0,0 +1,220 @@
+"""
+Rate Limiting Service
+Token-bucket and sliding-window-counter limiters with constant state per key,
+kept in a pluggable backend (in-process LRU store, standing in for Redis)
+"""
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request, status
+import math
+import os
+import threading
+import time
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+# Per-route limits ("<count>/<second|minute|hour|day>")
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "5/minute")  # Per account (submitted email)
+# Per client IP; loose because a whole classroom can share one school NAT address
+RATE_LIMIT_LOGIN_IP = os.getenv("RATE_LIMIT_LOGIN_IP", "120/minute")
+RATE_LIMIT_REGISTER = os.getenv("RATE_LIMIT_REGISTER", "5/minute")
+RATE_LIMIT_FEEDBACK = os.getenv("RATE_LIMIT_FEEDBACK", "30/minute")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """
+    Parse a rate string such as "5/minute"
+
+    Returns:
+        (limit, period_seconds)
+
+    Raises:
+        ValueError: If the rate string is malformed
+    """
+    try:
+        count, period = rate.strip().split("/")
+        return int(count), _PERIODS[period.strip().lower().rstrip("s")]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate: {rate!r} (expected e.g. '5/minute')")
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # seconds until the next request would be allowed (0 if allowed)
+
+class MemoryBackend:
+    """
+    In-process limiter state with an atomic read-modify-write per key
+
+    Keys untouched for longer than their TTL are dropped, and the least recently
+    used keys are evicted beyond max_keys. A shared backend (e.g. Redis running
+    the same update as a Lua script) only needs to provide transact().
+    """
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def transact(self, key: str, update: Callable[[Any, float], Tuple[Any, Any]], ttl: float) -> Any:
+        """
+        Apply update(state, now) -> (new_state, result) to a key atomically
+
+        Returns:
+            The result returned by update
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            state = entry[0] if entry and entry[1] > now else None
+            new_state, result = update(state, now)
+            self._entries[key] = (new_state, now + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return result
+
+    def reset(self, key: Optional[str] = None):
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+class TokenBucket:
+    """
+    Allows bursts of up to `capacity` requests, refilled at `limit` per `period`
+
+    State per key: (tokens, last_refill)
+    """
+    def __init__(self, limit: int, period: float, capacity: Optional[int] = None):
+        self.limit = limit
+        self.capacity = capacity or limit
+        self.refill_rate = limit / period
+        self.ttl = self.capacity / self.refill_rate
+
+    def update(self, state, now: float, cost: int = 1):
+        tokens, last = state if state else (float(self.capacity), now)
+        tokens = min(self.capacity, tokens + (now - last) * self.refill_rate)
+        if tokens >= cost:
+            return (tokens - cost, now), RateLimitResult(True, int(tokens - cost), 0.0)
+        return (tokens, now), RateLimitResult(False, 0, (cost - tokens) / self.refill_rate)
+
+class SlidingWindowCounter:
+    """
+    Approximates a sliding window of `period` seconds from two fixed-window counts
+
+    The previous window's count is weighted by how much of it still overlaps
+    the sliding window. State per key: (window_start, current, previous)
+    """
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self.ttl = 2 * period
+
+    def update(self, state, now: float, cost: int = 1):
+        window_start = math.floor(now / self.period) * self.period
+        if state is None:
+            current, previous = 0, 0
+        else:
+            start, current, previous = state
+            if start != window_start:
+                # One window later the current count becomes the previous one;
+                # after a longer gap both are stale
+                previous = current if window_start - start == self.period else 0
+                current = 0
+
+        overlap = 1 - (now - window_start) / self.period
+        estimated = previous * overlap + current
+        if estimated + cost <= self.limit:
+            current += cost
+            remaining = int(self.limit - estimated - cost)
+            return (window_start, current, previous), RateLimitResult(True, remaining, 0.0)
+
+        # Time until enough of the previous window has slid out (or the window rolls over)
+        if previous and current + cost <= self.limit:
+            needed = estimated + cost - self.limit
+            retry_after = needed / previous * self.period
+        else:
+            retry_after = window_start + self.period - now
+        return (window_start, current, previous), RateLimitResult(False, 0, retry_after)
+
+class RateLimiter:
+    """A named limit applied to request keys (client IPs by default)"""
+    def __init__(self, name: str, algorithm, backend: Optional[MemoryBackend] = None):
+        self.name = name
+        self.algorithm = algorithm
+        self.backend = backend if backend is not None else rate_limit_backend
+
+    def hit(self, key: str, cost: int = 1) -> RateLimitResult:
+        """Count a request against the limit"""
+        return self.backend.transact(
+            f"{self.name}:{key}",
+            lambda state, now: self.algorithm.update(state, now, cost),
+            self.algorithm.ttl
+        )
+
+rate_limit_backend = MemoryBackend()
+
+def make_limiter(name: str, rate: str, algorithm: str = "sliding_window") -> RateLimiter:
+    """
+    Build a limiter from a rate string
+
+    Args:
+        name: Key namespace (e.g. "login")
+        rate: Limit such as "5/minute"
+        algorithm: "sliding_window" or "token_bucket"
+    """
+    limit, period = parse_rate(rate)
+    if algorithm == "token_bucket":
+        return RateLimiter(name, TokenBucket(limit, period))
+    if algorithm == "sliding_window":
+        return RateLimiter(name, SlidingWindowCounter(limit, period))
+    raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+def enforce(limiter: RateLimiter, key: str, detail: str = "Too many requests, please slow down"):
+    """
+    Count a request and reject it if the limit is exhausted
+
+    Raises:
+        HTTPException: 429 with a Retry-After header
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    result = limiter.hit(key)
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))}
+        )
+
+def rate_limit(rate: str, scope: str, algorithm: str = "sliding_window",
+               key_func: Callable[[Request], str] = client_ip):
+    """
+    Route dependency enforcing a rate limit
+
+    Usage:
+        @router.post("/login", dependencies=[Depends(rate_limit("5/minute", "login"))])
+
+    Args:
+        rate: Limit such as "5/minute"
+        scope: Name of the limit; each scope counts separately
+        algorithm: "sliding_window" or "token_bucket"
+        key_func: Maps a request to the key being limited (client IP by default)
+    """
+    limiter = make_limiter(scope, rate, algorithm)
+
+    async def check_rate_limit(request: Request):
+        enforce(limiter, key_func(request))
+
+    return check_rate_limit
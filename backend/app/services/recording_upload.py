@@ -0,0 +1,295 @@
+"""
+Recording Uploads
+Streams a multipart recording upload from the request body straight to disk:
+the audio part is written with aiofiles chunk by chunk as it arrives, the
+size and duration limits are checked on every chunk, and the SHA-256 is
+computed on the way through. An upload holds about one network chunk in
+memory and never blocks the event loop on file I/O.
+
+Duration is measured from the WAV header when the recording is a WAV file;
+for other formats (webm/ogg from MediaRecorder) only the client's declared
+duration can be checked.
+"""
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import os
+import re
+import struct
+import uuid
+
+import aiofiles
+import aiofiles.os
+import multipart
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request, status
+
+RECORDING_UPLOAD_DIR = Path(os.getenv("RECORDING_UPLOAD_DIR", "./uploads"))
+RECORDING_MAX_BYTES = int(os.getenv("RECORDING_MAX_BYTES", 10 * 1024 * 1024))
+RECORDING_MAX_DURATION_MS = int(os.getenv("RECORDING_MAX_DURATION_MS", 60000))
+RECORDING_MAX_FIELD_BYTES = 4096  # Per text field (lesson_id, user_id, ...)
+RECORDING_MULTIPART_OVERHEAD = 64 * 1024  # Boundaries, part headers and text fields
+
+RECORDING_UPLOAD_DIR.mkdir(exist_ok=True)
+
+WAV_HEADER_SCAN_BYTES = 4096  # fmt/data chunks must start within this many bytes
+_SAFE_EXTENSION = re.compile(r"^[A-Za-z0-9]{1,8}$")
+
+# OpenAPI description of the form, since the route reads the body itself
+RECORDING_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["lesson_id", "duration_ms", "audio"],
+                    "properties": {
+                        "lesson_id": {"type": "string"},
+                        "duration_ms": {"type": "integer"},
+                        "user_id": {"type": "string", "default": "demo_user"},
+                        "audio": {"type": "string", "format": "binary"}
+                    }
+                }
+            }
+        }
+    }
+}
+
+class StoredRecording(NamedTuple):
+    path: Path
+    size_bytes: int
+    sha256: str
+    duration_ms: Optional[int]  # Measured from the file, when the format allows
+
+def _too_large(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+
+def _bad_upload(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def recording_extension(filename: Optional[str]) -> str:
+    """File extension to store a recording under ("wav" unless the client's is plain alphanumeric)"""
+    extension = filename.rsplit(".", 1)[-1] if filename and "." in filename else ""
+    return extension.lower() if _SAFE_EXTENSION.match(extension) else "wav"
+
+class RecordingSink:
+    """Writes one recording to disk, hashing and enforcing limits as chunks arrive"""
+    def __init__(self, path: Path, max_bytes: int = RECORDING_MAX_BYTES,
+                 max_duration_ms: int = RECORDING_MAX_DURATION_MS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_duration_ms = max_duration_ms
+        self.size = 0
+        self.hasher = hashlib.sha256()
+        self.byte_rate: Optional[int] = None
+        self.data_offset: Optional[int] = None
+        self._header = bytearray()
+        self._file = None
+
+    async def open(self):
+        self._file = await aiofiles.open(self.path, "wb")
+
+    def _scan_wav_header(self):
+        header = bytes(self._header)
+        if len(header) < 12:
+            return
+        if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            self._header = bytearray()  # Not WAV: stop scanning
+            self.data_offset = -1
+            return
+        offset = 12
+        byte_rate = None
+        while offset + 8 <= len(header):
+            chunk_id, chunk_size = struct.unpack_from("<4sI", header, offset)
+            if chunk_id == b"fmt ":
+                if offset + 20 > len(header):
+                    break  # byte_rate not received yet: rescan after the next chunk
+                (byte_rate,) = struct.unpack_from("<I", header, offset + 16)
+            if chunk_id == b"data":
+                if byte_rate:
+                    self.byte_rate = byte_rate
+                    self.data_offset = offset + 8
+                else:
+                    self.data_offset = -1
+                self._header = bytearray()
+                return
+            offset += 8 + chunk_size + (chunk_size & 1)
+        if len(header) >= WAV_HEADER_SCAN_BYTES:
+            self._header = bytearray()
+            self.data_offset = -1
+
+    @property
+    def duration_ms(self) -> Optional[int]:
+        if not self.byte_rate:
+            return None
+        return int(max(0, self.size - self.data_offset) * 1000 / self.byte_rate)
+
+    async def write(self, chunk: bytes):
+        """
+        Append a chunk
+
+        Raises:
+            HTTPException: 413 once the recording exceeds the size or duration limit
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise _too_large(f"Recording too large. Maximum size is {self.max_bytes / 1024 / 1024:g}MB")
+        if self.data_offset is None:
+            self._header += chunk[:WAV_HEADER_SCAN_BYTES - len(self._header)]
+            self._scan_wav_header()
+        if self.byte_rate and self.duration_ms > self.max_duration_ms:
+            raise _too_large(f"Recording too long. Maximum length is {self.max_duration_ms / 1000:g}s")
+        self.hasher.update(chunk)
+        await self._file.write(chunk)
+
+    async def close(self) -> StoredRecording:
+        await self._file.close()
+        return StoredRecording(self.path, self.size, self.hasher.hexdigest(), self.duration_ms)
+
+    async def discard(self):
+        """Close and delete a partial or rejected recording"""
+        if self._file is not None:
+            await self._file.close()
+        try:
+            await aiofiles.os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class _FormStream:
+    """
+    Collects python-multipart callbacks (which are synchronous) as events,
+    then applies them asynchronously after each body chunk
+    """
+    def __init__(self, file_field: str, upload_dir: Path, max_bytes: int, max_duration_ms: int):
+        self.file_field = file_field
+        self.upload_dir = upload_dir
+        self.max_bytes = max_bytes
+        self.max_duration_ms = max_duration_ms
+        self.events: List[tuple] = []
+        self.fields: Dict[str, str] = {}
+        self.sink: Optional[RecordingSink] = None
+        self.recording: Optional[StoredRecording] = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._part: Optional[Tuple[str, Optional[str]]] = None
+        self._field_value = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_part_data": lambda data, start, end: self.events.append(("data", bytes(data[start:end]))),
+            "on_part_end": lambda: self.events.append(("end",)),
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": lambda: self.events.append(("headers", self._headers)),
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}  # Headers are collected here before apply() sees the part
+        self.events.append(("begin",))
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    async def apply(self):
+        events, self.events = self.events, []
+        for event in events:
+            kind = event[0]
+            if kind == "begin":
+                self._field_value = bytearray()
+            elif kind == "headers":
+                _, options = parse_options_header(event[1].get(b"content-disposition", b""))
+                if b"name" not in options:
+                    raise _bad_upload("Form part without a name")
+                name = options[b"name"].decode("latin-1")
+                filename = options[b"filename"].decode("latin-1") if b"filename" in options else None
+                self._part = (name, filename)
+                if filename is not None:
+                    if name != self.file_field or self.sink is not None:
+                        raise _bad_upload(f"Unexpected file field: {name}")
+                    path = self.upload_dir / f"{uuid.uuid4().hex}.{recording_extension(filename)}"
+                    self.sink = RecordingSink(path, self.max_bytes, self.max_duration_ms)
+                    await self.sink.open()
+            elif kind == "data":
+                if self._part[1] is not None:
+                    await self.sink.write(event[1])
+                else:
+                    self._field_value += event[1]
+                    if len(self._field_value) > RECORDING_MAX_FIELD_BYTES:
+                        raise _too_large(f"Form field {self._part[0]} too large")
+            elif kind == "end":
+                if self._part[1] is not None:
+                    self.recording = await self.sink.close()
+                else:
+                    self.fields[self._part[0]] = self._field_value.decode("utf-8", errors="replace")
+                self._part = None
+
+async def receive_recording(request: Request, file_field: str = "audio",
+                            upload_dir: Path = RECORDING_UPLOAD_DIR,
+                            max_bytes: int = RECORDING_MAX_BYTES,
+                            max_duration_ms: int = RECORDING_MAX_DURATION_MS) -> Tuple[Dict[str, str], StoredRecording]:
+    """
+    Stream a multipart/form-data upload with one recording file to disk
+
+    Args:
+        request: The incoming request (its body must not have been read yet)
+        file_field: Form field holding the recording
+        upload_dir: Directory to store recordings in
+        max_bytes: Largest recording accepted
+        max_duration_ms: Longest recording accepted (checked while streaming for WAV files)
+
+    Returns:
+        The text form fields and the stored recording
+
+    Raises:
+        HTTPException: 400 for a malformed form or missing recording,
+            413 if a limit is exceeded (the partial file is deleted)
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise _bad_upload("Expected a multipart/form-data upload")
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + RECORDING_MULTIPART_OVERHEAD:
+        raise _too_large(f"Recording too large. Maximum size is {max_bytes / 1024 / 1024:g}MB")
+
+    form = _FormStream(file_field, upload_dir, max_bytes, max_duration_ms)
+    parser = multipart.MultipartParser(params[b"boundary"], form.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await form.apply()
+        parser.finalize()
+        await form.apply()
+    except MultipartParseError as e:
+        if form.sink is not None:
+            await form.sink.discard()
+        raise _bad_upload(f"Malformed upload: {e}")
+    except BaseException:
+        if form.sink is not None:
+            await form.sink.discard()
+        raise
+
+    if form.recording is None:
+        if form.sink is not None:
+            await form.sink.discard()
+        raise _bad_upload(f"Missing recording file ({file_field})")
+    return form.fields, form.recording
+
+async def discard_recording(recording: StoredRecording):
+    """Delete a stored recording that was rejected after upload"""
+    try:
+        await aiofiles.os.remove(recording.path)
+    except FileNotFoundError:
+        pass
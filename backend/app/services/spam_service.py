@@ -4,13 +4,16 @@ Email verification, honeypot detection, and bot prevention
 """
 from fastapi import HTTPException, status, Request
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime
 import secrets
 import hashlib
-from typing import Optional
+from typing import Iterable, Optional
+import os
 import re
 
 from ..db.models import User
+from .rate_limiter import RateLimiter, SlidingWindowCounter, TokenBucket, client_ip, enforce
+from .ttl_store import TTLStore
 
 # Spam detection configuration
 SPAM_PATTERNS = [
@@ -19,13 +22,77 @@ SPAM_PATTERNS = [
     r'\[url\]', r'\[link\]', r'http.*http', r'www\..*www\.'
 ]
 
+def compile_spam_matcher(patterns: Iterable[str]) -> "re.Pattern":
+    """Combine spam patterns into one alternation so text is scanned in a single pass"""
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+
+SPAM_MATCHER = compile_spam_matcher(SPAM_PATTERNS)
+
+# Common disposable email domains; extend with DISPOSABLE_DOMAINS_FILE (one domain per line)
+DEFAULT_DISPOSABLE_DOMAINS = (
+    'tempmail.com', '10minutemail.com', 'guerrillamail.com',
+    'mailinator.com', 'throwaway.email', 'temp-mail.org',
+    'fakeinbox.com', 'trashmail.com', 'yopmail.com'
+)
+DISPOSABLE_DOMAINS_FILE = os.getenv("DISPOSABLE_DOMAINS_FILE")
+
+def load_disposable_domains(path: Optional[str] = None) -> frozenset:
+    """
+    Build the disposable domain blocklist
+
+    Args:
+        path: Optional file with one domain per line (blank lines and # comments ignored)
+
+    Returns:
+        Frozenset of lowercase domains
+    """
+    domains = set(DEFAULT_DISPOSABLE_DOMAINS)
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    domain = line.split("#", 1)[0].strip().lower().lstrip("@.")
+                    if domain:
+                        domains.add(domain)
+            print(f"✓ Loaded {len(domains)} disposable email domains")
+        except OSError as e:
+            print(f"⚠️  Could not load disposable domains from {path}: {e}")
+    return frozenset(domains)
+
+DISPOSABLE_DOMAINS = load_disposable_domains(DISPOSABLE_DOMAINS_FILE)
+
+def is_disposable_domain(domain: str, blocklist: frozenset = None) -> bool:
+    """
+    Check a domain and each of its parent domains against the blocklist
+
+    "mx.mailinator.com" matches "mailinator.com"; each check is one set lookup
+    per domain label.
+    """
+    blocklist = DISPOSABLE_DOMAINS if blocklist is None else blocklist
+    domain = domain.lower().rstrip(".")
+    while domain:
+        if domain in blocklist:
+            return True
+        _, _, domain = domain.partition(".")
+    return False
+
 EMAIL_VERIFICATION_EXPIRE_HOURS = 24
+REGISTRATION_TOKEN_EXPIRE_SECONDS = 1800
 MAX_REGISTRATIONS_PER_IP_PER_DAY = 100  # Increased for testing
 MIN_TIME_BETWEEN_REGISTRATIONS = 0  # Disabled for testing
 
-# In-memory storage (use Redis in production)
-verification_codes = {}
-registration_timestamps = {}
+# Short-lived token storage (expired entries are swept in the background)
+verification_codes = TTLStore("email_verification", EMAIL_VERIFICATION_EXPIRE_HOURS * 3600)
+used_registration_tokens = TTLStore("registration_tokens", REGISTRATION_TOKEN_EXPIRE_SECONDS)
+
+# Registration limits per IP: a daily sliding window plus a minimum spacing
+registration_daily_limiter = RateLimiter(
+    "register_daily", SlidingWindowCounter(MAX_REGISTRATIONS_PER_IP_PER_DAY, 86400)
+)
+registration_spacing_limiter = (
+    RateLimiter("register_spacing", TokenBucket(1, MIN_TIME_BETWEEN_REGISTRATIONS))
+    if MIN_TIME_BETWEEN_REGISTRATIONS > 0 else None
+)
 
 def generate_verification_code() -> str:
     """
@@ -47,11 +114,10 @@ def generate_email_token(email: str) -> str:
         URL-safe verification token
     """
     token = secrets.token_urlsafe(32)
-    verification_codes[token] = {
+    verification_codes.set(token, {
         'email': email,
-        'code': generate_verification_code(),
-        'expires': datetime.utcnow() + timedelta(hours=EMAIL_VERIFICATION_EXPIRE_HOURS)
-    }
+        'code': generate_verification_code()
+    })
     return token
 
 def verify_email_token(token: str) -> Optional[str]:
@@ -64,17 +130,8 @@ def verify_email_token(token: str) -> Optional[str]:
     Returns:
         Email address if token is valid, None otherwise
     """
-    if token not in verification_codes:
-        return None
-    
-    data = verification_codes[token]
-    if datetime.utcnow() > data['expires']:
-        del verification_codes[token]
-        return None
-    
-    email = data['email']
-    del verification_codes[token]
-    return email
+    data = verification_codes.pop(token)
+    return data['email'] if data else None
 
 def check_honeypot(honeypot_field: Optional[str]) -> bool:
     """
@@ -112,13 +169,11 @@ def detect_spam_content(text: str) -> bool:
     if not text:
         return False
     
-    text_lower = text.lower()
-    for pattern in SPAM_PATTERNS:
-        if re.search(pattern, text_lower):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Content contains prohibited patterns"
-            )
+    if SPAM_MATCHER.search(text.lower()):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Content contains prohibited patterns"
+        )
     
     return False
 
@@ -135,36 +190,17 @@ def check_registration_rate(request: Request) -> bool:
     Raises:
         HTTPException: If rate limit exceeded
     """
-    client_ip = request.client.host
-    current_time = datetime.utcnow()
-    
-    if client_ip not in registration_timestamps:
-        registration_timestamps[client_ip] = []
-    
-    # Clean old timestamps (older than 24 hours)
-    registration_timestamps[client_ip] = [
-        ts for ts in registration_timestamps[client_ip]
-        if current_time - ts < timedelta(days=1)
-    ]
-    
-    # Check daily limit
-    if len(registration_timestamps[client_ip]) >= MAX_REGISTRATIONS_PER_IP_PER_DAY:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"Maximum {MAX_REGISTRATIONS_PER_IP_PER_DAY} registrations per day exceeded"
-        )
+    ip = client_ip(request)
     
     # Check minimum time between registrations
-    if registration_timestamps[client_ip]:
-        last_registration = registration_timestamps[client_ip][-1]
-        if (current_time - last_registration).total_seconds() < MIN_TIME_BETWEEN_REGISTRATIONS:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Please wait before registering again"
-            )
+    if registration_spacing_limiter:
+        enforce(registration_spacing_limiter, ip, "Please wait before registering again")
     
-    # Record this registration
-    registration_timestamps[client_ip].append(current_time)
+    # Check daily limit
+    enforce(
+        registration_daily_limiter, ip,
+        f"Maximum {MAX_REGISTRATIONS_PER_IP_PER_DAY} registrations per day exceeded"
+    )
     return True
 
 def detect_disposable_email(email: str) -> bool:
@@ -180,15 +216,8 @@ def detect_disposable_email(email: str) -> bool:
     Raises:
         HTTPException: If disposable email detected
     """
-    # Common disposable email domains
-    disposable_domains = [
-        'tempmail.com', '10minutemail.com', 'guerrillamail.com',
-        'mailinator.com', 'throwaway.email', 'temp-mail.org',
-        'fakeinbox.com', 'trashmail.com', 'yopmail.com'
-    ]
-    
-    domain = email.split('@')[1].lower()
-    if domain in disposable_domains:
+    domain = email.rpartition('@')[2]
+    if is_disposable_domain(domain):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Disposable email addresses are not allowed"
@@ -292,12 +321,20 @@ def verify_registration_token(token: str, timestamp_str: str, provided_hash: str
             )
         
         # Check if token is expired (30 minutes)
-        if (datetime.utcnow() - timestamp).total_seconds() > 1800:
+        if (datetime.utcnow() - timestamp).total_seconds() > REGISTRATION_TOKEN_EXPIRE_SECONDS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Registration token expired"
             )
         
+        # Each token may be submitted once; remembered until it would expire anyway
+        if token in used_registration_tokens:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Registration token already used"
+            )
+        used_registration_tokens.set(token, True)
+        
         return True
     except Exception:
         raise HTTPException(
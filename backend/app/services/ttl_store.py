@@ -0,0 +1,117 @@
+"""
+TTL Store
+Bounded key/value store for short-lived tokens (email verification codes,
+used registration tokens and verified CAPTCHA tokens) with an expiry heap
+swept in the background, so abandoned entries do not accumulate
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import os
+import threading
+import time
+
+TTL_STORE_SWEEP_INTERVAL_SECONDS = float(os.getenv("TTL_STORE_SWEEP_INTERVAL_SECONDS", 60))
+TTL_STORE_MAX_ENTRIES = int(os.getenv("TTL_STORE_MAX_ENTRIES", 100000))
+
+class TTLStore:
+    """
+    Dictionary whose entries expire after a time-to-live
+
+    Expired entries are never returned, and sweep() removes them in expiry
+    order by popping from a heap. When the store is full, the entries closest
+    to expiry are evicted first.
+    """
+    def __init__(self, name: str, default_ttl: float, max_entries: int = TTL_STORE_MAX_ENTRIES):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[Any, float]] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self.metrics = {"sets": 0, "hits": 0, "misses": 0, "expired": 0, "evicted": 0}
+        _stores.append(self)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value for ttl seconds (default_ttl if omitted)"""
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            heapq.heappush(self._heap, (expires_at, key))
+            self.metrics["sets"] += 1
+            while len(self._entries) > self.max_entries:
+                self._pop_earliest("evicted")
+            # Overwritten keys leave stale heap entries behind
+            if len(self._heap) > 2 * len(self._entries) + 64:
+                self._heap = [(exp, k) for k, (_, exp) in self._entries.items()]
+                heapq.heapify(self._heap)
+
+    def _pop_earliest(self, reason: str):
+        expires_at, key = heapq.heappop(self._heap)
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] == expires_at:
+            del self._entries[key]
+            self.metrics[reason] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a live value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["hits"] += 1
+            return entry[0]
+
+    def pop(self, key: str) -> Optional[Any]:
+        """Remove and return a live value (single-use tokens), or None"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[1] <= time.monotonic():
+                self.metrics["misses"] += 1
+                return None
+            self.metrics["hits"] += 1
+            return entry[0]
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Remove every expired entry
+
+        Returns:
+            Number of entries removed
+        """
+        now = time.monotonic() if now is None else now
+        removed = 0
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                before = len(self._entries)
+                self._pop_earliest("expired")
+                removed += before - len(self._entries)
+        return removed
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self) -> dict:
+        return {"size": len(self._entries), "max_entries": self.max_entries, **self.metrics}
+
+_stores: List[TTLStore] = []
+
+def sweep_all_stores() -> int:
+    """Sweep every TTLStore created in this process"""
+    return sum(store.sweep() for store in _stores)
+
+async def ttl_store_sweeper_loop(interval_seconds: float = TTL_STORE_SWEEP_INTERVAL_SECONDS):
+    """Periodically drop expired entries from every TTLStore"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            sweep_all_stores()
+        except Exception as e:
+            print(f"⚠️  TTL store sweep failed: {e}")
+
+def get_ttl_store_stats() -> dict:
+    return {store.name: store.get_stats() for store in _stores}
@@ -0,0 +1,200 @@
+"""
+WebSocket Message Codecs
+Wire encodings for dashboard and student sockets, chosen per connection via
+the WebSocket subprotocol the client offers
+
+    phonics.msgpack - MessagePack binary frames (needs the msgpack package)
+    phonics.struct  - fixed struct layouts for progress events and class
+                      deltas, tagged JSON for anything else
+    (none)          - JSON text frames, as before
+
+permessage-deflate is negotiated by the ASGI server (uvicorn's
+ws_per_message_deflate) and applies on top of any codec.
+"""
+from typing import Dict, List, Optional, Union
+import json
+import math
+import os
+import struct
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+try:
+    import msgpack
+except ImportError:  # JSON and struct frames still work without msgpack
+    msgpack = None
+
+WS_CODECS = [name.strip() for name in os.getenv("WS_CODECS", "msgpack,struct,json").split(",")]
+
+Frame = Union[str, bytes]
+
+def serialize(message: dict) -> str:
+    """Encode a message as compact JSON"""
+    return json.dumps(message, separators=(",", ":"), default=str)
+
+class JSONCodec:
+    name = "json"
+    subprotocol: Optional[str] = None
+    binary = False
+
+    def encode(self, message: dict) -> Frame:
+        return serialize(message)
+
+    def decode(self, data: Frame) -> dict:
+        return json.loads(data)
+
+    def transcode(self, payload: str, message: Optional[dict]) -> Frame:
+        """Re-encode a JSON payload (message is its parsed form, if already parsed)"""
+        return payload
+
+class MsgpackCodec(JSONCodec):
+    name = "msgpack"
+    subprotocol = "phonics.msgpack"
+    binary = True
+
+    def encode(self, message: dict) -> Frame:
+        return msgpack.packb(message, use_bin_type=True, default=str)
+
+    def decode(self, data: Frame) -> dict:
+        if isinstance(data, str):
+            return json.loads(data)
+        return msgpack.unpackb(data, raw=False)
+
+    def transcode(self, payload: str, message: Optional[dict]) -> Frame:
+        return self.encode(message if message is not None else json.loads(payload))
+
+# Struct frames start with a tag byte; strings are <length byte><UTF-8>
+TAG_JSON = 0
+TAG_PROGRESS = 1
+TAG_CLASS_DELTA = 2
+
+_PROGRESS = struct.Struct("<BBf")  # tag, quality, accuracy; then teacher_id, phoneme, activity
+_DELTA_HEADER = struct.Struct("<BIIH")  # tag, seq, events, students; then stream
+_DELTA_ENTRY = struct.Struct("<HHHbf")  # events, attempts, high_quality, quality, accuracy; then student_id, phoneme, activity
+
+PROGRESS_FIELDS = ("teacher_id", "phoneme", "activity", "quality", "accuracy")
+DELTA_FIELDS = frozenset(("type", "stream", "seq", "events", "students"))
+DELTA_ENTRY_FIELDS = frozenset(
+    ("student_id", "events", "attempts", "high_quality", "phoneme", "activity", "quality", "accuracy")
+)
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode()
+    if len(data) > 255:
+        raise ValueError("string too long for struct frame")
+    return bytes((len(data),)) + data
+
+def _unpack_strs(data: bytes, offset: int, count: int):
+    values = []
+    for _ in range(count):
+        length = data[offset]
+        values.append(data[offset + 1:offset + 1 + length].decode())
+        offset += 1 + length
+    return values, offset
+
+class StructCodec(JSONCodec):
+    """Fixed layouts for the high-volume messages; anything else is tagged JSON"""
+    name = "struct"
+    subprotocol = "phonics.struct"
+    binary = True
+
+    def encode(self, message: dict) -> Frame:
+        try:
+            if message.get("type") == "progress" and set(message) == {"type", *PROGRESS_FIELDS}:
+                return (
+                    _PROGRESS.pack(TAG_PROGRESS, message["quality"], message["accuracy"])
+                    + _pack_str(message["teacher_id"]) + _pack_str(message["phoneme"]) + _pack_str(message["activity"])
+                )
+            if message.get("type") == "class_delta" and set(message) == DELTA_FIELDS and all(
+                DELTA_ENTRY_FIELDS.issuperset(entry) for entry in message["students"]
+            ):
+                parts = [
+                    _DELTA_HEADER.pack(TAG_CLASS_DELTA, message["seq"], message["events"], len(message["students"])),
+                    _pack_str(message["stream"])
+                ]
+                for entry in message["students"]:
+                    parts.append(_DELTA_ENTRY.pack(
+                        entry["events"], entry.get("attempts", 0), entry.get("high_quality", 0),
+                        entry.get("quality", -1), entry.get("accuracy", math.nan)
+                    ))
+                    parts.append(_pack_str(entry["student_id"]) + _pack_str(entry.get("phoneme", ""))
+                                 + _pack_str(entry.get("activity", "")))
+                return b"".join(parts)
+        except (KeyError, TypeError, ValueError, struct.error):
+            pass
+        return bytes((TAG_JSON,)) + serialize(message).encode()
+
+    def decode(self, data: Frame) -> dict:
+        if isinstance(data, str):
+            return json.loads(data)
+        tag = data[0]
+        if tag == TAG_PROGRESS:
+            _, quality, accuracy = _PROGRESS.unpack_from(data)
+            (teacher_id, phoneme, activity), _ = _unpack_strs(data, _PROGRESS.size, 3)
+            return {
+                "type": "progress", "teacher_id": teacher_id, "phoneme": phoneme,
+                "activity": activity, "quality": quality, "accuracy": round(accuracy, 4)
+            }
+        if tag == TAG_CLASS_DELTA:
+            _, seq, events, count = _DELTA_HEADER.unpack_from(data)
+            (stream,), offset = _unpack_strs(data, _DELTA_HEADER.size, 1)
+            students = []
+            for _ in range(count):
+                entry_events, attempts, high_quality, quality, accuracy = _DELTA_ENTRY.unpack_from(data, offset)
+                (student_id, phoneme, activity), offset = _unpack_strs(data, offset + _DELTA_ENTRY.size, 3)
+                entry = {"student_id": student_id, "events": entry_events}
+                if attempts:
+                    entry.update(attempts=attempts, high_quality=high_quality)
+                if quality >= 0:
+                    entry.update(phoneme=phoneme, activity=activity, quality=quality, accuracy=round(accuracy, 4))
+                students.append(entry)
+            return {"type": "class_delta", "stream": stream, "seq": seq, "events": events, "students": students}
+        if tag == TAG_JSON:
+            return json.loads(data[1:])
+        raise ValueError(f"Unknown struct frame tag: {tag}")
+
+    def transcode(self, payload: str, message: Optional[dict]) -> Frame:
+        return self.encode(message if message is not None else json.loads(payload))
+
+JSON_CODEC = JSONCodec()
+
+CODECS: Dict[str, JSONCodec] = {
+    codec.subprotocol: codec
+    for codec in (MsgpackCodec() if msgpack else None, StructCodec())
+    if codec is not None and codec.name in WS_CODECS
+}
+
+def negotiate(websocket: WebSocket) -> JSONCodec:
+    """Pick the first codec the client offered that this server supports"""
+    offered: List[str] = websocket.scope.get("subprotocols") or []
+    for subprotocol in offered:
+        codec = CODECS.get(subprotocol)
+        if codec is not None:
+            return codec
+    return JSON_CODEC
+
+async def accept(websocket: WebSocket) -> JSONCodec:
+    """Accept a socket with the negotiated codec's subprotocol"""
+    codec = negotiate(websocket)
+    await websocket.accept(subprotocol=codec.subprotocol)
+    return codec
+
+async def receive_message(websocket: WebSocket, codec: JSONCodec) -> dict:
+    """
+    Receive and decode one text or binary frame
+
+    Raises:
+        WebSocketDisconnect: When the client disconnects
+        ValueError: If the frame cannot be decoded to a message object
+    """
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    data = message.get("bytes")
+    try:
+        decoded = codec.decode(data if data is not None else message.get("text"))
+    except Exception as e:
+        raise ValueError(f"Undecodable {codec.name} frame: {e}") from e
+    if not isinstance(decoded, dict):
+        raise ValueError(f"Expected a message object, got {type(decoded).__name__}")
+    return decoded
@@ -0,0 +1,228 @@
+"""
+WebSocket Broadcast Hub
+Fans messages out to every socket subscribed to a channel (e.g. a teacher's
+dashboard) without letting one slow or dead socket hold up the rest
+
+Each connection has a bounded send queue drained by its own sender task, so
+publishing never awaits a socket. A message is serialized once and the same
+string is queued for every recipient (re-encoded once per codec for
+clients that negotiated a binary one, see ws_codec). A connection whose queue overflows, or
+whose send stalls, is evicted as a slow consumer.
+
+Clients are not required to answer the heartbeat: a connection counts as
+alive while the server receives messages from it or manages to send to it
+(the periodic heartbeat frame guarantees a send every interval). Dead peers
+are detected by the ASGI server's protocol-level ping/pong (uvicorn's
+ws_ping_interval/ws_ping_timeout), which ends the receive loop. Reaping past
+the heartbeat timeout is the backstop for a connection that neither sends
+nor can be sent to.
+"""
+from typing import Callable, Dict, Optional, Set
+import asyncio
+import json
+import os
+import time
+
+from fastapi import WebSocket
+
+from .ws_codec import JSON_CODEC, Frame, JSONCodec, serialize
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 256))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", 10))
+WS_HEARTBEAT_INTERVAL_SECONDS = float(os.getenv("WS_HEARTBEAT_INTERVAL_SECONDS", 20))
+WS_HEARTBEAT_TIMEOUT_SECONDS = float(os.getenv("WS_HEARTBEAT_TIMEOUT_SECONDS", 75))  # Silence before a socket is reaped
+
+# Close codes sent to evicted clients
+CLOSE_SLOW_CONSUMER = 1013  # Try again later
+CLOSE_HEARTBEAT_TIMEOUT = 1001  # Going away
+
+HEARTBEAT_MESSAGE = {"type": "ping"}  # Keepalive; clients may ignore it
+
+class Connection:
+    """A subscribed socket with its own bounded send queue and sender task"""
+    def __init__(self, hub: "BroadcastHub", websocket: WebSocket, channel: str, queue_size: int,
+                 codec: JSONCodec = JSON_CODEC):
+        self.hub = hub
+        self.websocket = websocket
+        self.channel = channel
+        self.codec = codec
+        self.heartbeat = codec.encode(HEARTBEAT_MESSAGE)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.sender_task: Optional[asyncio.Task] = None
+
+    def touch(self):
+        """Record that the client is alive (on every received message and completed send)"""
+        self.last_seen = time.monotonic()
+
+    def offer(self, payload: Frame) -> bool:
+        """Queue an encoded message; False if the connection cannot keep up"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def send(self, message: dict) -> bool:
+        """Queue a message for this connection only (replies to the client)"""
+        if self.offer(self.codec.encode(message)):
+            return True
+        self.hub.evict(self, CLOSE_SLOW_CONSUMER, "slow_consumer")
+        return False
+
+    async def _sender(self):
+        try:
+            while True:
+                payload = await self.queue.get()
+                send = self.websocket.send_bytes if isinstance(payload, bytes) else self.websocket.send_text
+                await asyncio.wait_for(send(payload), WS_SEND_TIMEOUT_SECONDS)
+                self.touch()
+        except asyncio.TimeoutError:
+            self.hub.evict(self, CLOSE_SLOW_CONSUMER, "slow_consumer")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket already gone; the receive loop will see the disconnect too
+            self.hub.evict(self, None, "send_failed")
+
+class BroadcastHub:
+    """Channel -> connections registry with non-blocking fan-out"""
+    def __init__(self, queue_size: int = WS_SEND_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.channels: Dict[str, Set[Connection]] = {}
+        # Called with (channel, True) when a channel gets its first socket and
+        # (channel, False) when it loses its last (see pubsub.PubSubBus.attach)
+        self.channel_listener: Optional[Callable[[str, bool], None]] = None
+        self.metrics = {
+            "published": 0,
+            "delivered": 0,
+            "evicted_slow_consumer": 0,
+            "evicted_send_failed": 0,
+            "evicted_heartbeat": 0,
+        }
+
+    def register(self, websocket: WebSocket, channel: str, codec: JSONCodec = JSON_CODEC) -> Connection:
+        """Subscribe an accepted socket to a channel and start its sender"""
+        connection = Connection(self, websocket, channel, self.queue_size, codec)
+        connection.sender_task = asyncio.create_task(connection._sender())
+        if channel not in self.channels:
+            self.channels[channel] = set()
+            if self.channel_listener is not None:
+                self.channel_listener(channel, True)
+        self.channels[channel].add(connection)
+        return connection
+
+    def _remove(self, connection: Connection):
+        connection.closed = True
+        members = self.channels.get(connection.channel)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self.channels[connection.channel]
+                if self.channel_listener is not None:
+                    self.channel_listener(connection.channel, False)
+
+    async def unregister(self, connection: Connection):
+        """Remove a connection whose client disconnected"""
+        self._remove(connection)
+        if connection.sender_task is not None and connection.sender_task is not asyncio.current_task():
+            connection.sender_task.cancel()
+
+    def evict(self, connection: Connection, close_code: Optional[int], reason: str):
+        """Drop a connection and close its socket in the background"""
+        if connection.closed:
+            return
+        self._remove(connection)
+        self.metrics[f"evicted_{reason}"] += 1
+        asyncio.create_task(self._close(connection, close_code))
+
+    async def _close(self, connection: Connection, close_code: Optional[int]):
+        task = connection.sender_task
+        if task is not None and task is not asyncio.current_task():
+            task.cancel()
+        if close_code is None:
+            return
+        try:
+            await asyncio.wait_for(connection.websocket.close(code=close_code), WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+
+    def publish_serialized(self, channel: str, payload: str, message: Optional[dict] = None) -> int:
+        """
+        Queue an already serialized (JSON) message for every connection on a channel
+
+        Returns:
+            Number of connections the message was queued for
+        """
+        members = self.channels.get(channel)
+        if not members:
+            return 0
+        self.metrics["published"] += 1
+        delivered = 0
+        encoded: Dict[JSONCodec, Frame] = {}
+        for connection in list(members):
+            frame = encoded.get(connection.codec)
+            if frame is None:
+                if connection.codec.binary and message is None:
+                    message = json.loads(payload)
+                frame = encoded[connection.codec] = connection.codec.transcode(payload, message)
+            if connection.offer(frame):
+                delivered += 1
+            else:
+                self.evict(connection, CLOSE_SLOW_CONSUMER, "slow_consumer")
+        self.metrics["delivered"] += delivered
+        return delivered
+
+    def publish(self, channel: str, message: dict) -> int:
+        """Serialize a message once and queue it for every connection on a channel"""
+        if not self.channels.get(channel):
+            return 0
+        return self.publish_serialized(channel, serialize(message), message)
+
+    def connection_count(self, channel: Optional[str] = None) -> int:
+        if channel is not None:
+            return len(self.channels.get(channel, ()))
+        return sum(len(members) for members in self.channels.values())
+
+    def reap(self, now: Optional[float] = None) -> int:
+        """
+        Evict connections with no traffic either way for longer than the
+        heartbeat timeout and queue a heartbeat for the rest
+
+        Returns:
+            Number of connections reaped
+        """
+        now = time.monotonic() if now is None else now
+        reaped = 0
+        for members in list(self.channels.values()):
+            for connection in list(members):
+                if now - connection.last_seen > WS_HEARTBEAT_TIMEOUT_SECONDS:
+                    self.evict(connection, CLOSE_HEARTBEAT_TIMEOUT, "heartbeat")
+                    reaped += 1
+                elif not connection.offer(connection.heartbeat):
+                    self.evict(connection, CLOSE_SLOW_CONSUMER, "slow_consumer")
+        return reaped
+
+    def get_stats(self) -> dict:
+        return {
+            "channels": len(self.channels),
+            "connections": self.connection_count(),
+            "queued": sum(c.queue.qsize() for members in self.channels.values() for c in members),
+            **self.metrics
+        }
+
+hub = BroadcastHub()
+
+async def ws_heartbeat_loop(interval_seconds: float = WS_HEARTBEAT_INTERVAL_SECONDS):
+    """Send heartbeats to subscribed sockets and reap the ones nothing got through to"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            reaped = hub.reap()
+            if reaped:
+                print(f"✓ Reaped {reaped} dead WebSocket connections")
+        except Exception as e:
+            print(f"⚠️  WebSocket heartbeat failed: {e}")
@@ -0,0 +1,115 @@
+"""
+Benchmark dashboard traffic with and without per-class coalescing
+Replays a timestamped stream of student progress events and compares the
+frames and bytes a teacher's dashboard would receive per second
+
+Usage:
+    python benchmark_dashboard_stream.py [--students N] [--seconds S] [--rate EVENTS_PER_STUDENT_PER_SEC]
+                                         [--tick SECONDS] [--seed N] [--record FILE | --replay FILE]
+
+--record writes the generated events as JSON lines so a run can be replayed
+exactly (or a production capture replayed) with --replay.
+"""
+import argparse
+import json
+import random
+import time
+
+from app.services.dashboard_stream import ProgressCoalescer
+from app.services.ws_hub import serialize
+
+PHONEMES = ['a', 'e', 'i', 'o', 'u', 'b', 'c', 'd', 'f', 'g', 'h', 'j', 'k', 'l', 'm']
+ACTIVITIES = ["listen", "repeat", "match", "spell"]
+
+def generate_events(students: int, seconds: float, rate: float, seed: int):
+    """Poisson arrivals per student; a few fast tappers make the load bursty"""
+    rng = random.Random(seed)
+    events = []
+    for index in range(students):
+        student_rate = rate * (5 if index % 10 == 0 else 1)
+        t = rng.expovariate(student_rate)
+        while t < seconds:
+            events.append({
+                "t": round(t, 4),
+                "student_id": f"student{index:03d}",
+                "phoneme": rng.choice(PHONEMES),
+                "activity": rng.choice(ACTIVITIES),
+                "quality": rng.randint(0, 5),
+                "accuracy": round(rng.uniform(40, 100), 1)
+            })
+            t += rng.expovariate(student_rate)
+    events.sort(key=lambda event: event["t"])
+    return events
+
+def per_event_frames(events):
+    """The previous behaviour: one broadcast per event"""
+    return [
+        serialize({
+            "type": "student_progress",
+            "student_id": event["student_id"],
+            "phoneme": event["phoneme"],
+            "accuracy": event["accuracy"],
+            "quality": event["quality"]
+        })
+        for event in events
+    ]
+
+def coalesced_frames(events, tick: float):
+    frames = []
+    coalescer = ProgressCoalescer(publish=None)
+    next_tick = tick
+    for event in events:
+        while event["t"] >= next_tick:
+            frames.extend(serialize(frame) for _, frame in coalescer.drain())
+            next_tick += tick
+        coalescer.record(
+            "teacher:bench",
+            event["student_id"],
+            {key: event[key] for key in ("phoneme", "activity", "accuracy", "quality")},
+            {"attempts": 1, "high_quality": int(event["quality"] >= 4)}
+        )
+    frames.extend(serialize(frame) for _, frame in coalescer.drain())
+    return frames
+
+def report(label: str, frames, seconds: float, elapsed: float):
+    total_bytes = sum(len(frame.encode()) for frame in frames)
+    print(
+        f"  {label}: {len(frames) / seconds:,.1f} frames/s, {total_bytes / seconds / 1024:,.1f} KiB/s "
+        f"({len(frames):,} frames, built in {elapsed * 1000:.1f} ms)"
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--rate", type=float, default=2, help="Events per student per second")
+    parser.add_argument("--tick", type=float, default=0.25)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record")
+    parser.add_argument("--replay")
+    args = parser.parse_args()
+
+    if args.replay:
+        with open(args.replay) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        seconds = max(event["t"] for event in events) if events else args.seconds
+    else:
+        events = generate_events(args.students, args.seconds, args.rate, args.seed)
+        seconds = args.seconds
+        if args.record:
+            with open(args.record, "w") as f:
+                f.writelines(json.dumps(event) + "\n" for event in events)
+
+    students = len({event["student_id"] for event in events})
+    print(f"{len(events):,} events from {students} students over {seconds:.0f}s, tick {args.tick}s:")
+
+    start = time.perf_counter()
+    frames = per_event_frames(events)
+    report("per event", frames, seconds, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    frames = coalesced_frames(events, args.tick)
+    report("coalesced", frames, seconds, time.perf_counter() - start)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark email template rendering at campaign scale
+Compares compiled rendering against substituting into the full template source per message
+
+Usage: python benchmark_email_templates.py [recipients]
+"""
+import html
+import sys
+import time
+
+from app.services.email_templates import TEMPLATE_SOURCES, inline_css, render_email, render_many
+
+def render_uncompiled(values: dict) -> str:
+    """Per-message work without precompilation: inline CSS, then substitute every field"""
+    source = inline_css(TEMPLATE_SOURCES["trial_reminder"]["html"])
+    for field, value in values.items():
+        source = source.replace("{{ " + field + " }}", html.escape(str(value)))
+    return source
+
+def measure(label: str, func, count: int):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label}: {count / elapsed:,.0f} renders/s ({elapsed:.2f}s)")
+
+def main():
+    recipients = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rows = [
+        {"days_remaining": 3, "license_key": f"{i:032X}"}
+        for i in range(recipients)
+    ]
+    sample = max(1, recipients // 20)
+
+    print(f"Trial reminder, {recipients:,} recipients:")
+    measure("uncompiled (sampled)", lambda: [render_uncompiled(row) for row in rows[:sample]], sample)
+    measure("render_email", lambda: [render_email("trial_reminder", **row) for row in rows], recipients)
+    measure("render_many", lambda: render_many("trial_reminder", rows), recipients)
+
+if __name__ == "__main__":
+    main()
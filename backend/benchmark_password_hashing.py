@@ -0,0 +1,61 @@
+"""
+Benchmark bcrypt work factors and the password hashing pool
+Picks the highest BCRYPT_ROUNDS that keeps login p99 under a target during a login storm
+
+Usage: python benchmark_password_hashing.py [target_p99_ms] [concurrent_logins]
+"""
+import asyncio
+import sys
+import time
+
+from passlib.context import CryptContext
+from app.services.auth_service import PasswordHashPool, PASSWORD_HASH_WORKERS, benchmark_work_factor
+
+async def simulate_login_storm(rounds: int, concurrent_logins: int) -> dict:
+    """
+    Fire a burst of logins through a fresh hashing pool and measure end-to-end latency
+    """
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    hashed = context.hash("Benchmark1Password")
+    pool = PasswordHashPool(max_pending=concurrent_logins, login_reserve=0, max_wait=3600)
+
+    async def login():
+        start = time.perf_counter()
+        await pool.run(context.verify, "Benchmark1Password", hashed, priority=PasswordHashPool.LOGIN)
+        return (time.perf_counter() - start) * 1000
+
+    started = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(login() for _ in range(concurrent_logins))))
+    elapsed = time.perf_counter() - started
+    await pool.close()
+
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2], 1),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))], 1),
+        "logins_per_sec": round(concurrent_logins / elapsed, 1)
+    }
+
+def main():
+    target_p99_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 500
+    concurrent_logins = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    print(f"Single verification (target p99 {target_p99_ms}ms):")
+    single = benchmark_work_factor(target_p99_ms)
+    for rounds, timing in single["rounds"].items():
+        print(f"  rounds={rounds}: p50 {timing['p50_ms']}ms, p99 {timing['p99_ms']}ms")
+
+    print(f"\nLogin storm: {concurrent_logins} concurrent logins, {PASSWORD_HASH_WORKERS} workers")
+    recommended = None
+    for rounds in single["rounds"]:
+        storm = asyncio.run(simulate_login_storm(rounds, concurrent_logins))
+        print(f"  rounds={rounds}: p50 {storm['p50_ms']}ms, p99 {storm['p99_ms']}ms, {storm['logins_per_sec']} logins/s")
+        if storm["p99_ms"] <= target_p99_ms:
+            recommended = rounds
+
+    if recommended is None:
+        print("\n⚠️  No work factor meets the target under load; add workers or raise the target")
+    else:
+        print(f"\n✓ Recommended: BCRYPT_ROUNDS={recommended}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark the /ws/student -> /ws/teacher relay path per codec
+Measures messages/sec on one core from decoding a student frame to queueing
+and sending the teacher's frames, plus frame sizes with and without
+permessage-deflate
+
+Usage: python benchmark_ws_relay.py [messages] [students] [dashboards]
+"""
+import asyncio
+import random
+import sys
+import time
+import zlib
+
+from app.routes.teacher import apply_student_progress, live_classes, teacher_channel, TeacherClass, CLASS_PHONEMES
+from app.services.class_registry import ClassRecord, encode_class_code
+from app.services.dashboard_stream import coalescer
+from app.services.ws_codec import JSON_CODEC, CODECS, serialize
+from app.services.ws_hub import hub
+
+TEACHER_ID = "benchteacher"
+MESSAGES_PER_TICK = 200  # Student messages between dashboard flushes
+
+class NullWebSocket:
+    """Accepts frames and counts bytes (stands in for a dashboard socket)"""
+    def __init__(self):
+        self.frames = []
+        self.deflate = zlib.compressobj(wbits=-15)  # permessage-deflate with context takeover
+        self.bytes = 0
+        self.deflated_bytes = 0
+
+    async def send_text(self, data: str):
+        await self.send_bytes(data.encode())
+
+    async def send_bytes(self, data: bytes):
+        self.bytes += len(data)
+        self.deflated_bytes += len(self.deflate.compress(data) + self.deflate.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+def make_updates(count: int, students: int):
+    rng = random.Random(7)
+    return [
+        (f"student{rng.randrange(students):04d}", {
+            "type": "progress",
+            "teacher_id": TEACHER_ID,
+            "phoneme": rng.choice(CLASS_PHONEMES),
+            "activity": rng.choice(["listen", "repeat", "match", "spell"]),
+            "quality": rng.randint(0, 5),
+            "accuracy": round(rng.uniform(40, 100), 1)
+        })
+        for _ in range(count)
+    ]
+
+async def run(codec, updates, students: int, dashboards: int):
+    record = ClassRecord(1, TEACHER_ID, "Benchmark", encode_class_code(1), None, students, True, persisted=False)
+    live_classes[TEACHER_ID] = teacher_class = TeacherClass(record)
+    for index in range(students):
+        teacher_class.add_student(f"student{index:04d}", f"Student {index}")
+
+    sockets = [NullWebSocket() for _ in range(dashboards)]
+    connections = [hub.register(socket, teacher_channel(TEACHER_ID), codec) for socket in sockets]
+    frames = [(student_id, codec.encode(update)) for student_id, update in updates]
+    inbound_bytes = sum(len(frame if isinstance(frame, bytes) else frame.encode()) for _, frame in frames)
+
+    start = time.process_time()
+    for index, (student_id, frame) in enumerate(frames, 1):
+        update = codec.decode(frame)
+        apply_student_progress(
+            update["teacher_id"], student_id, update["phoneme"], update["activity"],
+            update["quality"], update["accuracy"]
+        )
+        if index % MESSAGES_PER_TICK == 0:
+            for channel, delta in coalescer.drain():
+                hub.publish_serialized(channel, serialize(delta), delta)
+            await asyncio.sleep(0)  # Let the per-connection senders run
+    for channel, delta in coalescer.drain():
+        hub.publish_serialized(channel, serialize(delta), delta)
+    while any(connection.queue.qsize() for connection in connections):
+        await asyncio.sleep(0)
+    elapsed = time.process_time() - start
+
+    for connection in connections:
+        await hub.unregister(connection)
+    outbound = sockets[0]
+    print(
+        f"  {codec.name:8s} {len(frames) / elapsed:>10,.0f} msgs/s/core | "
+        f"in {inbound_bytes / len(frames):5.1f} B/msg | "
+        f"out per dashboard {outbound.bytes / 1024:7.1f} KiB ({outbound.deflated_bytes / 1024:6.1f} KiB deflated)"
+    )
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    students = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    dashboards = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    updates = make_updates(count, students)
+
+    print(f"{count:,} progress messages from {students} students to {dashboards} dashboards:")
+    for codec in [JSON_CODEC, *CODECS.values()]:
+        await run(codec, updates, students, dashboards)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,38 @@
+"""
+Database migration for email campaigns
+Adds email_logs.dedupe_key, used to avoid sending a campaign email twice
+"""
+from sqlalchemy import text
+from app.db.database import get_db
+
+def migrate_email_logs_table():
+    """
+    Add the dedupe_key column and its index to an existing email_logs table
+    """
+    db = next(get_db())
+
+    try:
+        result = db.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'email_logs' AND column_name = 'dedupe_key'
+        """))
+
+        if result.first() is None:
+            db.execute(text("ALTER TABLE email_logs ADD COLUMN dedupe_key VARCHAR"))
+            print("✓ Added dedupe_key column")
+
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_email_logs_dedupe_key ON email_logs (dedupe_key)"))
+        print("✓ Indexed dedupe_key")
+
+        db.commit()
+        print("✅ Migration completed successfully")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Migration failed: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_email_logs_table()
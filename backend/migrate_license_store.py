@@ -0,0 +1,45 @@
+"""
+Database migration for the persistent license store
+Adds licenses.user_email and the end_date index used by expiry sweeps
+"""
+from sqlalchemy import text
+from app.db.database import get_db
+
+def migrate_licenses_table():
+    """
+    Add the user_email column (backfilled from users) and index end_date
+    """
+    db = next(get_db())
+
+    try:
+        result = db.execute(text("""
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'licenses' AND column_name = 'user_email'
+        """))
+
+        if result.first() is None:
+            db.execute(text("ALTER TABLE licenses ADD COLUMN user_email VARCHAR"))
+            db.execute(text("""
+                UPDATE licenses
+                SET user_email = users.email
+                FROM users
+                WHERE users.id = licenses.user_id
+            """))
+            print("✓ Added user_email column")
+
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_licenses_user_email ON licenses (user_email)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS ix_licenses_end_date ON licenses (end_date)"))
+        print("✓ Indexed user_email and end_date")
+
+        db.commit()
+        print("✅ Migration completed successfully")
+
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Migration failed: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_licenses_table()
@@ -0,0 +1,78 @@
+"""
+Database migration to convert activity_logs and usage_logs to monthly partitions
+Run this once on databases created before the tables were partitioned
+"""
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint
+from app.db.database import engine
+from app.db.models import ActivityLog, UsageLog
+from app.db.partitions import ensure_partitions
+
+def is_partitioned(conn, table_name: str) -> bool:
+    """Check whether a table is already a partitioned table"""
+    result = conn.execute(text("""
+        SELECT 1
+        FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = :table
+    """), {"table": table_name})
+    return result.first() is not None
+
+def migrate_table(conn, table):
+    """
+    Swap an unpartitioned table for a partitioned copy and move its rows over
+
+    The original table is kept as <name>_legacy so it can be dropped by hand
+    once the migrated data has been checked.
+    """
+    name = table.name
+    legacy = f"{name}_legacy"
+
+    if is_partitioned(conn, name):
+        print(f"✓ {name} is already partitioned")
+        return
+
+    # Move the old table (and its index/constraint names) out of the way
+    conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{legacy}"'))
+    conn.execute(text(f'ALTER TABLE "{legacy}" RENAME CONSTRAINT "{name}_pkey" TO "{legacy}_pkey"'))
+    for index in table.indexes:
+        conn.execute(text(f'ALTER INDEX IF EXISTS "{index.name}" RENAME TO "{index.name}_legacy"'))
+
+    # LIKE ... INCLUDING DEFAULTS keeps the existing id sequence
+    conn.execute(text(
+        f'CREATE TABLE "{name}" (LIKE "{legacy}" INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+    ))
+    conn.execute(text(f'UPDATE "{legacy}" SET created_at = now() WHERE created_at IS NULL'))
+    conn.execute(text(f'ALTER TABLE "{name}" ALTER COLUMN created_at SET NOT NULL'))
+    conn.execute(text(f'ALTER TABLE "{name}" ADD PRIMARY KEY (id, created_at)'))
+    conn.execute(text(f'ALTER SEQUENCE IF EXISTS "{name}_id_seq" OWNED BY "{name}".id'))
+    for constraint in table.foreign_key_constraints:
+        conn.execute(AddConstraint(constraint))
+    for index in table.indexes:
+        index.create(conn)
+
+    # Partitions covering the legacy rows, then copy them in
+    oldest = conn.execute(text(f'SELECT min(created_at) FROM "{legacy}"')).scalar()
+    ensure_partitions(conn, start=oldest)
+    conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM "{legacy}"'))
+
+    print(f"✓ Migrated {name} (old rows kept in {legacy})")
+
+def migrate_log_partitions():
+    """
+    Convert activity_logs and usage_logs to monthly range partitions
+    """
+    if engine.dialect.name != "postgresql":
+        print("⚠️  Partitioning requires PostgreSQL, nothing to do")
+        return
+
+    try:
+        with engine.begin() as conn:
+            for model in (ActivityLog, UsageLog):
+                migrate_table(conn, model.__table__)
+        print("✅ Migration completed successfully")
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+
+if __name__ == "__main__":
+    migrate_log_partitions()
@@ -0,0 +1,37 @@
+import asyncio
+
+from app.services import captcha_service
+from app.services.captcha_service import CircuitBreaker
+
+class _HangingClient:
+    is_closed = False
+
+    async def post(self, url, data):
+        await asyncio.sleep(3600)
+
+def test_cancelled_trial_does_not_wedge_half_open_breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    monkeypatch.setattr(captcha_service, "CAPTCHA_PROVIDER", "recaptcha")
+    monkeypatch.setattr(captcha_service, "captcha_breaker", breaker)
+    monkeypatch.setattr(captcha_service, "get_http_client", lambda: _HangingClient())
+
+    async def scenario():
+        trial = asyncio.create_task(captcha_service._siteverify("https://example.invalid", "secret", "token"))
+        await asyncio.sleep(0.01)
+        assert not breaker.allow_request()  # The trial is in flight
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert breaker.allow_request()
+
+def test_half_open_trial_outcome():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.allow_request() and not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
@@ -0,0 +1,49 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import teacher
+from app.services import class_registry as registry_module
+from app.services.class_registry import ClassRegistry, encode_class_code
+
+@pytest.fixture
+def no_database(monkeypatch):
+    def fail():
+        raise AssertionError("the database must not be touched")
+    monkeypatch.setattr(registry_module, "get_db_context", fail)
+
+def test_class_codes_are_distinct():
+    ids = list(range(1, 5000)) + [registry_module._LOCAL_ID_BASE + n for n in range(5000)]
+    assert len({encode_class_code(class_id) for class_id in ids}) == len(ids)
+
+def test_unpersisted_class_stays_in_memory(no_database):
+    registry = ClassRegistry()
+    record = registry.create_class("42", "Reading", persist=False)
+    assert not record.persisted
+    assert registry.get_by_code(record.class_code) == record
+
+def test_workers_hand_out_different_local_codes(no_database):
+    first = ClassRegistry().create_class("42", "Reading", persist=False)
+    second = ClassRegistry().create_class("42", "Reading", persist=False)
+    assert first.class_code != second.class_code
+
+def test_dashboard_endpoints_do_not_persist_classes(no_database, monkeypatch):
+    monkeypatch.setattr(teacher, "class_registry", ClassRegistry())
+    monkeypatch.setattr(teacher.class_registry, "get_for_teacher", lambda teacher_id: None)
+    app = FastAPI()
+    app.include_router(teacher.router)
+    client = TestClient(app)
+    try:
+        response = client.post("/api/teacher/class/create", params={"teacher_id": "1001"})
+        assert response.status_code == 200
+        response = client.post(
+            "/api/teacher/class/1002/add-student",
+            params={"student_id": "s1", "student_name": "Student"}
+        )
+        assert response.status_code == 200
+        unpersisted = teacher.class_registry._unpersisted
+        assert teacher.live_classes["1001"].class_code in unpersisted
+        assert teacher.live_classes["1002"].class_code in unpersisted
+    finally:
+        teacher.live_classes.pop("1001", None)
+        teacher.live_classes.pop("1002", None)
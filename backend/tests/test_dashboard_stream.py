@@ -0,0 +1,50 @@
+from app.services.dashboard_stream import ProgressCoalescer
+from app.services.ws_codec import StructCodec
+
+CHANNEL = "teacher:t1"
+
+def _progress(coalescer, student_id="s1"):
+    coalescer.record(CHANNEL, student_id, {"phoneme": "a", "activity": "listen", "quality": 4, "accuracy": 90.0},
+                     {"attempts": 1, "high_quality": 1})
+
+def test_workers_publish_distinct_streams_with_consecutive_seq():
+    workers = [ProgressCoalescer(publish=None), ProgressCoalescer(publish=None)]
+    frames = []
+    for _ in range(3):
+        for worker in workers:
+            _progress(worker)
+            frames.extend(frame for _, frame in worker.drain(now=0))
+
+    by_stream = {}
+    for frame in frames:
+        by_stream.setdefault(frame["stream"], []).append(frame["seq"])
+    assert len(by_stream) == 2
+    assert all(seqs == [1, 2, 3] for seqs in by_stream.values())
+
+def test_idle_streams_are_forgotten():
+    coalescer = ProgressCoalescer(publish=None, stream_idle_seconds=10)
+    for index in range(100):
+        coalescer.record(f"teacher:stray{index}", "s1", {"data": {}})
+    coalescer.drain(now=0)
+    assert coalescer.get_stats()["streams"] == 100
+
+    _progress(coalescer)
+    coalescer.drain(now=5)
+    _progress(coalescer)
+    (_, frame), = coalescer.drain(now=12)
+    assert coalescer.get_stats()["streams"] == 1
+    assert frame["seq"] == 2  # The active channel keeps its stream
+
+    _progress(coalescer)
+    (_, restarted), = coalescer.drain(now=30)
+    assert restarted["seq"] == 1 and restarted["stream"] != frame["stream"]
+
+def test_struct_codec_round_trips_stream():
+    coalescer = ProgressCoalescer(publish=None)
+    _progress(coalescer)
+    _progress(coalescer, "s2")
+    (_, frame), = coalescer.drain()
+    codec = StructCodec()
+    encoded = codec.encode(frame)
+    assert encoded[0] == 2  # Fixed class_delta layout, not tagged JSON
+    assert codec.decode(encoded) == frame
@@ -0,0 +1,35 @@
+import pytest
+
+from app.services.email_service import FakeTransport, SendGridTransport
+
+class _Response:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {"X-Message-Id": "sg-1"}
+
+class _Client:
+    """SendGrid client that answers every send with a fixed status"""
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(message)
+        return _Response(self.status_code)
+
+def test_sendgrid_transport_returns_message_id():
+    transport = SendGridTransport(_Client(202))
+    assert transport.send("kid@example.com", "Hi", "<p>Hi</p>") == "sg-1"
+
+@pytest.mark.parametrize("status_code", [400, 429, 500])
+def test_sendgrid_transport_raises_on_rejected_send(status_code):
+    transport = SendGridTransport(_Client(status_code))
+    with pytest.raises(RuntimeError, match=f"SendGrid returned {status_code}"):
+        transport.send("kid@example.com", "Hi", "<p>Hi</p>")
+
+def test_fake_transport_failure():
+    transport = FakeTransport()
+    transport.fail_recipients.add("bounce@example.com")
+    with pytest.raises(RuntimeError):
+        transport.send("bounce@example.com", "Hi", "<p>Hi</p>")
+    assert transport.sent == []
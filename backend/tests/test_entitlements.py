@@ -0,0 +1,55 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import get_db
+from app.db.models import Base, Student, StudentProgress
+from app.routes import tracking
+from app.services.license_service import FEATURE_FLAGS, NO_ENTITLEMENTS, Entitlements, license_store
+
+KEYS = {
+    "analytics-key": FEATURE_FLAGS["progress_tracking"] | FEATURE_FLAGS["analytics"],
+    "basic-key": FEATURE_FLAGS["progress_tracking"],
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[Student.__table__, StudentProgress.__table__])
+    Session = sessionmaker(bind=engine)
+
+    def db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    def get_entitlements(license_key):
+        if license_key not in KEYS:
+            return NO_ENTITLEMENTS
+        return Entitlements(features=KEYS[license_key], max_students=10, max_lessons=10,
+                            valid_until=time.time() + 3600)
+
+    monkeypatch.setattr(license_store, "get_entitlements", get_entitlements)
+    app = FastAPI()
+    app.include_router(tracking.router)
+    app.dependency_overrides[get_db] = db
+    return TestClient(app)
+
+def test_feature_gated_routes_need_a_license(client):
+    assert client.get("/tracking/student/1/progress").status_code == 403
+    assert client.get("/tracking/student/1/progress", headers={"X-License-Key": "unknown"}).status_code == 403
+    assert client.get("/tracking/student/1/progress", headers={"X-License-Key": "basic-key"}).status_code == 200
+
+def test_exports_need_analytics(client):
+    response = client.get("/tracking/export/student/1/summary", headers={"X-License-Key": "basic-key"})
+    assert response.status_code == 403
+    assert "analytics" in response.json()["detail"]
+    response = client.get("/tracking/export/student/1/summary", headers={"X-License-Key": "analytics-key"})
+    assert response.status_code != 403
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import ActivityLog
+from app.services import export_service
+from app.services.export_service import (
+    export_activity_logs,
+    iter_exported_activity,
+    list_exports,
+    summarize_exported_activity
+)
+
+BASE = datetime(2024, 3, 1, 12, 0)
+
+def _row(row_id: int, student_id: int = 7, minutes: int = 0):
+    return {
+        "id": row_id,
+        "student_id": student_id,
+        "lesson_id": f"lesson-{row_id}",
+        "activity_type": "lesson_complete",
+        "score": 80.0,
+        "duration_seconds": 60,
+        "extra_data": {"attempt": row_id},
+        "created_at": BASE + timedelta(minutes=minutes)
+    }
+
+def _write(export_dir, name, rows, writer_class):
+    path = export_dir / f"{name}{writer_class.suffix}"
+    writer = writer_class(path)
+    writer.write(rows)
+    writer.close()
+
+WRITERS = [export_service._CsvWriter]
+FORMATS = ["csv"]
+if export_service.pq is not None:
+    WRITERS.append(export_service._ParquetWriter)
+    FORMATS.append("parquet")
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    with engine.begin() as connection:
+        # The Postgres table is partitioned on (id, created_at); SQLite cannot autoincrement that key
+        connection.exec_driver_sql(
+            "CREATE TABLE activity_logs (id INTEGER, student_id INTEGER, lesson_id VARCHAR NOT NULL, "
+            "activity_type VARCHAR, score FLOAT, duration_seconds INTEGER, extra_data JSON, "
+            "created_at DATETIME, PRIMARY KEY (id, created_at))"
+        )
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+def _log(db, *row_ids):
+    db.add_all(ActivityLog(**_row(row_id, minutes=row_id)) for row_id in row_ids)
+    db.commit()
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_exports_resume_after_last_exported_id(tmp_path, db, fmt):
+    _log(db, 1, 2)
+    first = export_activity_logs(export_dir=tmp_path, fmt=fmt, batch_size=1, db=db)
+    assert (first["rows"], first["after_id"], first["last_id"]) == (2, None, 2)
+
+    # A second open-ended run (e.g. the next day) only picks up new rows
+    _log(db, 3)
+    second = export_activity_logs(export_dir=tmp_path, fmt=fmt, db=db)
+    assert (second["rows"], second["after_id"], second["last_id"]) == (1, 2, 3)
+    assert [path.name for path in list_exports(tmp_path)] == [Path(first["path"]).name, Path(second["path"]).name]
+
+    nothing_new = export_activity_logs(export_dir=tmp_path, fmt=fmt, db=db)
+    assert nothing_new["rows"] == 0 and nothing_new["path"] is None
+    assert len(list_exports(tmp_path)) == 2
+
+    assert [row["id"] for row in iter_exported_activity(tmp_path)] == [1, 2, 3]
+    summary = summarize_exported_activity(7, export_dir=tmp_path)
+    assert summary["total_activities"] == 3
+    assert summary["total_time_minutes"] == 3
+
+@pytest.mark.parametrize("writer_class", WRITERS)
+def test_timezone_aware_bounds(tmp_path, writer_class):
+    _write(tmp_path, "activity_logs_start_20240301_1-3", [_row(1), _row(2, minutes=30), _row(3, minutes=90)], writer_class)
+
+    # 13:00 UTC expressed in UTC+2
+    since = datetime(2024, 3, 1, 12, 15, tzinfo=timezone.utc)
+    until = datetime(2024, 3, 1, 15, 0, tzinfo=timezone(timedelta(hours=2)))
+    summary = summarize_exported_activity(7, export_dir=tmp_path, since=since, until=until)
+    assert summary["total_activities"] == 1
@@ -0,0 +1,48 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import get_db
+from app.db.models import Base, User
+from app.routes import auth
+from app.services.rate_limiter import parse_rate, rate_limit_backend, RATE_LIMIT_LOGIN
+
+@pytest.fixture
+def client():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    Session = sessionmaker(bind=engine)
+
+    def db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.dependency_overrides[get_db] = db
+    rate_limit_backend.reset()
+    yield TestClient(app)
+    rate_limit_backend.reset()
+
+def _login(client, email):
+    return client.post("/auth/login", json={"email": email, "password": "Wrong12345"})
+
+def test_classroom_behind_one_address_can_log_in(client):
+    # Thirty students logging in at once from the same school NAT address
+    statuses = {_login(client, f"student{i}@school.example").status_code for i in range(30)}
+    assert statuses == {401}
+
+def test_repeated_attempts_on_one_account_are_limited(client):
+    limit, _ = parse_rate(RATE_LIMIT_LOGIN)
+    for _ in range(limit):
+        assert _login(client, "student@school.example").status_code == 401
+    response = _login(client, "Student@School.example")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert _login(client, "other@school.example").status_code == 401
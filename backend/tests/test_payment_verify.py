@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.models import Base, License, Payment, User
+from app.routes import payment
+from app.services.license_service import license_store
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[User.__table__, License.__table__, Payment.__table__])
+    session = sessionmaker(bind=engine)()
+    session.add(User(email="parent@example.com", password_hash="x", role="parent"))
+    session.commit()
+
+    async def no_email(**kwargs):
+        return None
+    monkeypatch.setattr(payment, "send_payment_success_email", no_email)
+    yield session
+    session.close()
+
+def _checkout(monkeypatch, **session_data):
+    async def verify(session_id):
+        return {"email": "parent@example.com", "plan_type": "parent_monthly", **session_data}
+    monkeypatch.setattr(payment, "verify_checkout_session", verify)
+
+def test_verify_stores_license_and_payment_together(db, monkeypatch):
+    _checkout(monkeypatch, amount_total=999)
+    result = asyncio.run(payment.verify_payment(payment.PaymentVerification(session_id="cs_1"), db))
+
+    assert db.query(Payment).count() == 1
+    assert db.query(License).filter(License.license_key == result["license_key"]).count() == 1
+    assert license_store.get(result["license_key"]) is not None
+
+def test_failed_payment_insert_leaves_no_license(db, monkeypatch):
+    _checkout(monkeypatch, amount_total=None)  # Payment.amount is NOT NULL
+    with pytest.raises(HTTPException):
+        asyncio.run(payment.verify_payment(payment.PaymentVerification(session_id="cs_2"), db))
+
+    assert db.query(Payment).count() == 0
+    assert db.query(License).count() == 0
@@ -0,0 +1,107 @@
+import pytest
+
+from app.routes.teacher import TeacherClass
+from app.services.class_registry import ClassRecord, encode_class_code
+from app.services.presence import PresenceTracker, TimingWheel
+
+TEACHER_ID = "presence-teacher"
+
+def _wheel(span: float = 5):
+    wheel = TimingWheel(tick_seconds=1, span_seconds=span)
+    return wheel, wheel._last_tick  # Times below are relative to the wheel's start
+
+def test_schedule_expires_after_delay():
+    wheel, t0 = _wheel()
+    wheel.schedule("a", 3)
+    assert wheel.advance(now=t0 + 0.5) == []
+    assert wheel.advance(now=t0 + 2) == []
+    assert wheel.advance(now=t0 + 3) == ["a"]
+    assert len(wheel) == 0
+
+def test_cancel_and_reschedule():
+    wheel, t0 = _wheel()
+    wheel.schedule("a", 2)
+    wheel.schedule("b", 2)
+    wheel.cancel("a")
+    wheel.schedule("b", 4)  # Rescheduling moves the key
+    assert wheel.advance(now=t0 + 2) == []
+    assert wheel.advance(now=t0 + 4) == ["b"]
+    wheel.cancel("missing")
+    assert len(wheel) == 0
+
+def test_wrap_around():
+    wheel, t0 = _wheel()  # 6 slots
+    assert wheel.advance(now=t0 + 4) == []
+    wheel.schedule("a", 4)  # Lands past the end of the ring
+    assert wheel.advance(now=t0 + 7) == []
+    assert wheel.advance(now=t0 + 8) == ["a"]
+
+def test_delay_is_clamped_to_span():
+    wheel, t0 = _wheel()
+    wheel.schedule("a", 100)
+    assert wheel.advance(now=t0 + 5) == ["a"]
+
+def test_skipping_more_ticks_than_slots():
+    wheel, t0 = _wheel()
+    wheel.schedule("a", 1)
+    wheel.schedule("b", 5)
+    assert sorted(wheel.advance(now=t0 + 100)) == ["a", "b"]
+    assert len(wheel) == 0
+
+    # The wheel stays usable from the new time
+    wheel.schedule("c", 2)
+    assert wheel.advance(now=t0 + 101) == []
+    assert wheel.advance(now=t0 + 102) == ["c"]
+
+@pytest.fixture
+def teacher_class():
+    record = ClassRecord(1, TEACHER_ID, "Test", encode_class_code(1), None, 30, True, persisted=False)
+    teacher_class = TeacherClass(record)
+    teacher_class.add_student("s1", "Student 1")
+    teacher_class.add_student("s2", "Student 2")
+    return teacher_class
+
+@pytest.fixture
+def tracker(teacher_class):
+    tracker = PresenceTracker(idle_after=3, offline_after=10, tick_seconds=1)
+    tracker.attach(lambda teacher_id: teacher_class if teacher_id == TEACHER_ID else None,
+                   lambda teacher_id: f"teacher:{teacher_id}")
+    return tracker
+
+def test_active_to_idle_to_offline(tracker, teacher_class):
+    t0 = tracker.wheel._last_tick
+    tracker.touch(TEACHER_ID, "s1")
+    tracker.touch(TEACHER_ID, "s2")
+
+    assert tracker.expire(now=t0 + 2) == 0
+    assert tracker.expire(now=t0 + 3) == 2
+    assert teacher_class.presence_counts() == {"online": 2, "active": 0, "idle": 2, "offline": 0}
+
+    tracker.touch(TEACHER_ID, "s2")  # Back to active, idle timer restarted
+    assert teacher_class.students["s2"].status == "active"
+
+    assert tracker.expire(now=t0 + 5) == 0
+    assert tracker.expire(now=t0 + 6) == 1  # s2 idle again
+    assert tracker.expire(now=t0 + 9) == 0
+    assert tracker.expire(now=t0 + 10) == 1  # s1: 7s more of inactivity, offline
+    assert teacher_class.students["s1"].status == "offline"
+    assert teacher_class.presence_counts() == {"online": 1, "active": 0, "idle": 1, "offline": 1}
+    assert tracker.expire(now=t0 + 13) == 1
+    assert teacher_class.presence_counts() == {"online": 0, "active": 0, "idle": 0, "offline": 2}
+    assert len(tracker.wheel) == 0
+    assert tracker.get_stats()["went_idle"] == 3 and tracker.get_stats()["went_offline"] == 2
+
+def test_drain_sends_latest_status_once(tracker, teacher_class):
+    t0 = tracker.wheel._last_tick
+    tracker.touch(TEACHER_ID, "s1")
+    tracker.expire(now=t0 + 3)
+    tracker.disconnect(TEACHER_ID, "s2")
+
+    (channel, frame), = tracker.drain()
+    assert channel == f"teacher:{TEACHER_ID}"
+    assert sorted((c["student_id"], c["status"]) for c in frame["changes"]) == [("s1", "idle"), ("s2", "offline")]
+    assert frame["counts"] == {"online": 1, "active": 0, "idle": 1, "offline": 1}
+    assert tracker.drain() == []
+
+    # A disconnected student has no timer left
+    assert tracker.expire(now=t0 + 20) == 1  # Only s1 (idle -> offline)
@@ -0,0 +1,157 @@
+"""
+Multi-process delivery over the Unix socket bus: workers share one
+PUBSUB_SOCKET_PATH, the first to take the lock runs the broker, and another
+worker takes over when the broker's process dies
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+from app.services import pubsub
+from app.services.pubsub import LocalBroker, RedisBus, StreamBus, UnixSocketBus
+from app.services.ws_hub import BroadcastHub
+
+CHANNEL = "teacher:t1"
+
+class RecordingSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, data: str):
+        self.frames.append(data)
+
+    async def close(self, code: int = 1000):
+        pass
+
+def _worker(path: str, conn):
+    """A uvicorn worker stand-in: one hub, one dashboard socket, one bus"""
+    pubsub.PUBSUB_RECONNECT_SECONDS = 0.1
+
+    async def main():
+        hub = BroadcastHub()
+        bus = UnixSocketBus(path)
+        bus.attach(hub)
+        socket = RecordingSocket()
+        hub.register(socket, CHANNEL)
+        await bus.start()
+        while bus._subscriber is None:
+            await asyncio.sleep(0.01)
+        loop = asyncio.get_running_loop()
+        conn.send("ready")
+        while True:
+            command, arg = await loop.run_in_executor(None, conn.recv)
+            if command == "publish":
+                await bus.publish(CHANNEL, arg)
+                conn.send(None)
+            elif command == "frames":
+                await asyncio.sleep(0.05)
+                conn.send(list(socket.frames))
+            elif command == "is_broker":
+                conn.send(bus.broker is not None)
+            elif command == "stop":
+                await bus.close()
+                conn.send(None)
+                return
+
+    asyncio.run(main())
+
+class Worker:
+    def __init__(self, path: str):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context("fork").Process(target=_worker, args=(path, child), daemon=True)
+        self.process.start()
+        assert self.conn.poll(10), "worker did not start"
+        assert self.conn.recv() == "ready"
+
+    def call(self, command: str, arg=None):
+        self.conn.send((command, arg))
+        assert self.conn.poll(10), f"worker did not answer {command}"
+        return self.conn.recv()
+
+    def kill(self):
+        os.kill(self.process.pid, signal.SIGKILL)
+        self.process.join(5)
+
+    def stop(self):
+        if self.process.is_alive():
+            self.call("stop")
+            self.process.join(5)
+
+def _wait_for(worker: Worker, payload: str, timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if payload in worker.call("frames"):
+            return True
+    return False
+
+def _publish_until_received(publisher: Worker, receiver: Worker, payload: str, timeout: float = 10) -> bool:
+    """Publish (again, while subscriptions settle after a reconnect) until the receiver has it"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        publisher.call("publish", payload)
+        if payload in receiver.call("frames"):
+            return True
+    return False
+
+@pytest.fixture
+def socket_path(tmp_path):
+    return str(tmp_path / "pubsub.sock")
+
+def test_local_broker_fans_out(socket_path):
+    async def scenario():
+        broker = LocalBroker(socket_path)
+        await broker.start()
+        sub_reader, sub_writer = await asyncio.open_unix_connection(socket_path)
+        _, pub_writer = await asyncio.open_unix_connection(socket_path)
+        sub_writer.write(b"SUB teacher%3At1\n")
+        await sub_writer.drain()
+        await asyncio.sleep(0.05)
+        pub_writer.write(b'PUB teacher%3At1 {"n":1}\nPUB teacher%3At2 {"n":2}\n')
+        await pub_writer.drain()
+        line = await asyncio.wait_for(sub_reader.readline(), 5)
+        for writer in (sub_writer, pub_writer):
+            writer.close()
+        await broker.close()
+        return line
+
+    assert asyncio.run(scenario()) == b'MSG teacher%3At1 {"n":1}\n'
+
+def test_delivery_across_processes_and_broker_failover(socket_path):
+    first = Worker(socket_path)
+    assert first.call("is_broker")
+    second = Worker(socket_path)
+    assert not second.call("is_broker")
+    workers = [first, second]
+    try:
+        second.call("publish", '{"n":1}')
+        assert _wait_for(first, '{"n":1}')
+        assert _wait_for(second, '{"n":1}')
+
+        first.kill()
+        third = Worker(socket_path)
+        workers.append(third)
+        assert _publish_until_received(third, second, '{"n":2}')
+        assert second.call("is_broker") != third.call("is_broker")
+        assert _publish_until_received(second, third, '{"n":3}')
+    finally:
+        for worker in workers[1:]:
+            worker.stop()
+
+def test_stream_bus_requires_every_protocol_hook():
+    class IncompleteBus(StreamBus):
+        async def _open(self):
+            return await asyncio.open_unix_connection("/nonexistent")
+
+        def _encode_subscribe(self, channels, subscribed):
+            return b""
+
+        def _encode_publish(self, channel, payload):
+            return b""
+
+    with pytest.raises(TypeError, match="_read_message"):
+        IncompleteBus()
+    assert isinstance(RedisBus("redis://localhost:6379/0"), StreamBus)
@@ -0,0 +1,90 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import lazyload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import get_db
+from app.db.models import Base, License, User
+from app.db.query_budget import ENDPOINT_QUERY_BUDGETS, QueryBudgetExceeded, assert_query_budget
+from app.routes import auth
+from app.services.auth_cache import invalidate_user
+from app.services.auth_service import create_access_token, hash_password
+from app.services.rate_limiter import rate_limit_backend
+
+PASSWORD = "Teacher123"
+STUDENTS = 5
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine, tables=[User.__table__, License.__table__])
+    session = sessionmaker(bind=engine)()
+    teacher = User(email="teacher@example.com", password_hash=hash_password(PASSWORD), role="teacher")
+    session.add(teacher)
+    session.flush()
+    session.add_all(
+        User(email=f"student{i}@example.com", password_hash="x", role="student", teacher_id=teacher.id)
+        for i in range(STUDENTS)
+    )
+    session.commit()
+    session.close()
+    yield engine
+    invalidate_user(1)
+    rate_limit_backend.reset()
+
+@pytest.fixture
+def client(engine):
+    Session = sessionmaker(bind=engine)
+
+    def db():
+        session = Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app = FastAPI()
+    app.include_router(auth.router)
+    app.dependency_overrides[get_db] = db
+    return TestClient(app)
+
+def _login(client):
+    return client.post("/auth/login", json={"email": "teacher@example.com", "password": PASSWORD})
+
+def _teacher_headers():
+    return {"Authorization": f"Bearer {create_access_token({'user_id': 1, 'role': 'teacher'})}"}
+
+def test_login_within_budget(engine, client):
+    with assert_query_budget(engine, ENDPOINT_QUERY_BUDGETS["/auth/login"], "/auth/login"):
+        response = _login(client)
+    assert response.status_code == 200
+    assert len(response.json()["user"]["enrolled_students"]) == STUDENTS
+
+def test_enrolled_students_within_budget(engine, client):
+    path = "/auth/teacher/students"
+    with assert_query_budget(engine, ENDPOINT_QUERY_BUDGETS[path], path):
+        response = client.get(path, headers=_teacher_headers())
+    assert response.status_code == 200
+    assert response.json()["total_students"] == STUDENTS
+
+def test_n_plus_one_exceeds_budget(engine, client, monkeypatch):
+    # Without the explicit loading options, touching a relationship per student lazy-loads it
+    def query_with_lazy_relationships(db, teacher_id):
+        return db.query(User).options(lazyload("*")).filter(User.teacher_id == teacher_id)
+
+    serialize_student = auth.serialize_student
+
+    def serialize_with_licenses(student):
+        return {**serialize_student(student), "licenses": len(student.licenses)}
+
+    monkeypatch.setattr(auth, "query_enrolled_students", query_with_lazy_relationships)
+    monkeypatch.setattr(auth, "serialize_student", serialize_with_licenses)
+
+    path = "/auth/teacher/students"
+    with pytest.raises(QueryBudgetExceeded) as exceeded:
+        with assert_query_budget(engine, ENDPOINT_QUERY_BUDGETS[path], path):
+            response = client.get(path, headers=_teacher_headers())
+            assert response.status_code == 200, response.text
+    assert str(exceeded.value).count("FROM licenses") == STUDENTS
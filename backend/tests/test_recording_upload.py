@@ -0,0 +1,97 @@
+import asyncio
+import hashlib
+import struct
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.recording_upload import RecordingSink, receive_recording, recording_extension
+
+BOUNDARY = "recording-boundary"
+BYTE_RATE = 8000  # 8 kHz, 8-bit mono
+MAX_BYTES = 64 * 1024
+MAX_DURATION_MS = 2000
+
+def _wav(duration_ms: int) -> bytes:
+    data = bytes(BYTE_RATE * duration_ms // 1000)
+    fmt = struct.pack("<HHIIHH", 1, 1, 8000, BYTE_RATE, 1, 8)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+def _form(audio: bytes, filename: str = "take.wav") -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="lesson_id"\r\n\r\n'
+        "lesson_a\r\n"
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="audio"; filename="{filename}"\r\n'
+        "Content-Type: audio/wav\r\n\r\n"
+    ).encode() + audio + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+def _chunks(body: bytes, size: int = 1024):
+    # A generator body is sent without Content-Length, so limits are only caught while streaming
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+@pytest.fixture
+def client(tmp_path):
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        fields, recording = await receive_recording(
+            request, upload_dir=tmp_path, max_bytes=MAX_BYTES, max_duration_ms=MAX_DURATION_MS
+        )
+        return {"fields": fields, "name": recording.path.name, "size": recording.size_bytes,
+                "sha256": recording.sha256, "duration_ms": recording.duration_ms}
+
+    return TestClient(app)
+
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+def test_upload_is_stored_with_measured_duration(client, tmp_path):
+    audio = _wav(1500)
+    response = client.post("/upload", content=_chunks(_form(audio)), headers=HEADERS)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["fields"] == {"lesson_id": "lesson_a"}
+    assert result["duration_ms"] == 1500
+    assert result["size"] == len(audio)
+    assert result["sha256"] == hashlib.sha256(audio).hexdigest()
+    assert (tmp_path / result["name"]).read_bytes() == audio
+
+def test_too_long_wav_is_rejected_mid_stream(client, tmp_path):
+    response = client.post("/upload", content=_chunks(_form(_wav(3000))), headers=HEADERS)
+    assert response.status_code == 413
+    assert "too long" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []  # Partial file deleted
+
+def test_too_large_upload_is_rejected_mid_stream(client, tmp_path):
+    audio = b"OggS" + bytes(MAX_BYTES)
+    response = client.post("/upload", content=_chunks(_form(audio, "take.ogg")), headers=HEADERS)
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
+    assert list(tmp_path.iterdir()) == []
+
+def test_unsafe_extension_is_stored_as_wav(client, tmp_path):
+    response = client.post("/upload", content=_form(_wav(100), "../../x"), headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json()["name"].endswith(".wav")
+    assert [path.parent for path in tmp_path.iterdir()] == [tmp_path]
+    assert recording_extension("../../x") == "wav"
+    assert recording_extension("take.WEBM") == "webm"
+
+@pytest.mark.parametrize("split", [14, 30, 39])
+def test_wav_header_split_across_chunks(tmp_path, split):
+    # The first chunk ends inside the RIFF or fmt chunk, before byte_rate
+    audio = _wav(500)
+
+    async def write():
+        sink = RecordingSink(tmp_path / "take.wav", MAX_BYTES, MAX_DURATION_MS)
+        await sink.open()
+        await sink.write(audio[:split])
+        await sink.write(audio[split:])
+        return await sink.close()
+
+    assert asyncio.run(write()).duration_ms == 500
@@ -0,0 +1,89 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import teacher
+from app.routes.teacher import TeacherClass, live_classes
+from app.services.class_registry import ClassRecord, encode_class_code
+from app.services.dashboard_stream import coalescer
+
+TEACHER_ID = "progress-teacher"
+
+@pytest.fixture
+def teacher_class():
+    record = ClassRecord(1, TEACHER_ID, "Test", encode_class_code(1), None, 30, True, persisted=False)
+    live_classes[TEACHER_ID] = teacher_class = TeacherClass(record)
+    teacher_class.add_student("s1", "Student 1")
+    teacher_class.add_student("s2", "Student 2")
+    yield teacher_class
+    live_classes.pop(TEACHER_ID, None)
+    coalescer.drain()
+
+def test_invalid_progress_leaves_aggregates_untouched(teacher_class):
+    before = (dict(teacher_class.status_counts), teacher_class.accuracy_sum, teacher_class.mastery_sum)
+    with pytest.raises(ValueError):
+        teacher_class.record_progress("s1", "a", "listen", "five", 90)
+    with pytest.raises(TypeError):
+        teacher_class.record_progress("s1", "a", "listen", 5, None)
+    assert (dict(teacher_class.status_counts), teacher_class.accuracy_sum, teacher_class.mastery_sum) == before
+    assert teacher_class.get_stats().active_students == 2
+
+def test_student_socket_drops_bad_frames(teacher_class):
+    app = FastAPI()
+    app.include_router(teacher.router)
+    with TestClient(app) as client, client.websocket_connect("/api/teacher/ws/student/s1") as ws:
+        ws.send_text("not json")
+        ws.send_text("[1, 2]")
+        ws.send_json({"type": "progress", "teacher_id": TEACHER_ID, "phoneme": "a"})
+        ws.send_json({"type": "progress", "teacher_id": TEACHER_ID, "phoneme": "a", "activity": "listen",
+                      "quality": "five", "accuracy": 90})
+        ws.send_json({"type": "progress", "teacher_id": TEACHER_ID, "phoneme": "a", "activity": "listen",
+                      "quality": "5", "accuracy": 90})
+
+    # Leaving the block waits for the endpoint to process every frame and finish
+    session = teacher_class.students["s1"]
+    assert session.mastered_phonemes == {"a"}
+    assert session.accuracy == 90.0
+    stats = teacher_class.get_stats()
+    assert stats.total_students == 2
+    assert teacher_class.phoneme_mastered["a"] == 1
+
+def test_out_of_range_progress_leaves_aggregates_untouched(teacher_class):
+    teacher_class.record_progress("s1", "a", "listen", 3, 80)
+    before = (teacher_class.accuracy_sum, teacher_class.mastery_sum, dict(teacher_class.phoneme_practicing))
+    for quality, accuracy in [(3, float("nan")), (3, float("inf")), (3, 101), (3, -1), (6, 80), (-1, 80)]:
+        with pytest.raises(ValueError):
+            teacher_class.record_progress("s1", "b", "listen", quality, accuracy)
+    assert (teacher_class.accuracy_sum, teacher_class.mastery_sum, dict(teacher_class.phoneme_practicing)) == before
+    assert teacher_class.students["s1"].current_phoneme == "a"
+
+def test_update_progress_endpoint_rejects_non_finite_accuracy(teacher_class):
+    app = FastAPI()
+    app.include_router(teacher.router)
+    client = TestClient(app)
+    url = "/api/teacher/student/s1/update-progress"
+    params = {"teacher_id": TEACHER_ID, "phoneme": "a", "activity": "listen", "quality": 3}
+    assert client.post(url, params={**params, "accuracy": "nan"}).status_code == 422
+    assert client.post(url, params={**params, "quality": 9, "accuracy": 50}).status_code == 422
+    assert client.post(url, params={**params, "accuracy": 50}).json()["success"] is True
+
+    stats = client.get(f"/api/teacher/class/{TEACHER_ID}/stats")
+    assert stats.status_code == 200
+    assert stats.json()["average_accuracy"] == 25.0
+
+def test_student_socket_relays_other_messages_one_by_one(teacher_class, monkeypatch):
+    relayed = []
+    async def record(channel, message):
+        relayed.append((channel, message))
+    monkeypatch.setattr(teacher, "broadcast", record)
+
+    app = FastAPI()
+    app.include_router(teacher.router)
+    with TestClient(app) as client, client.websocket_connect("/api/teacher/ws/student/s1") as ws:
+        ws.send_json({"type": "hand_raised", "teacher_id": TEACHER_ID})
+        ws.send_json({"type": "chat", "teacher_id": TEACHER_ID, "text": "done!"})
+
+    assert [message["data"]["type"] for _, message in relayed] == ["hand_raised", "chat"]
+    assert all(channel == teacher.teacher_channel(TEACHER_ID) and message["type"] == "student_update"
+               and message["student_id"] == "s1" for channel, message in relayed)
+    assert coalescer.drain() == []
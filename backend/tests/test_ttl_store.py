@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ttl_store
+from app.services.ttl_store import TTLStore, ttl_store_sweeper_loop
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    # Only the store's clock: asyncio keeps using the real time.monotonic
+    monkeypatch.setattr(ttl_store, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+def test_entries_expire(clock):
+    store = TTLStore("test_expiry", default_ttl=10)
+    store.set("code", "123456")
+    store.set("short", "x", ttl=1)
+    assert store.get("code") == "123456" and "short" in store
+
+    clock.now += 1
+    assert store.get("short") is None
+    assert store.pop("code") == "123456"
+    assert store.pop("code") is None  # Single use
+
+    store.set("code", "654321")
+    clock.now += 10
+    assert store.get("code") is None
+
+def test_full_store_evicts_entries_closest_to_expiry(clock):
+    store = TTLStore("test_bound", default_ttl=10, max_entries=3)
+    store.set("a", 1, ttl=30)
+    store.set("b", 2, ttl=5)
+    store.set("c", 3, ttl=20)
+    store.set("d", 4, ttl=40)
+    assert len(store) == 3
+    assert store.get("b") is None
+    assert [store.get(key) for key in "acd"] == [1, 3, 4]
+    assert store.get_stats()["evicted"] == 1
+
+def test_sweep_removes_expired_entries_in_order(clock):
+    store = TTLStore("test_sweep", default_ttl=10)
+    for i in range(5):
+        store.set(f"k{i}", i, ttl=i + 1)
+    store.set("k0", "renewed", ttl=100)  # Overwrite leaves a stale heap entry behind
+
+    assert store.sweep(now=clock.now + 3) == 2  # k1, k2; k0 was renewed
+    assert len(store) == 3
+    assert store.sweep(now=clock.now + 50) == 2
+    assert store.get("k0") == "renewed"
+    assert store.get_stats()["expired"] == 4
+
+def test_sweeper_loop_sweeps_every_store(clock):
+    stores = [TTLStore("test_loop_a", default_ttl=1), TTLStore("test_loop_b", default_ttl=1)]
+    for store in stores:
+        store.set("token", True)
+    clock.now += 2
+
+    async def run():
+        task = asyncio.create_task(ttl_store_sweeper_loop(interval_seconds=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(run())
+    assert [len(store) for store in stores] == [0, 0]
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from app.services import ws_hub
+from app.services.ws_hub import BroadcastHub
+
+class PassiveSocket:
+    """Dashboard that only listens (never sends an application message)"""
+    def __init__(self, stall: bool = False):
+        self.stall = stall
+        self.frames = []
+        self.close_code = None
+
+    async def send_text(self, data: str):
+        if self.stall:
+            await asyncio.sleep(3600)
+        self.frames.append(data)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+def test_passive_dashboard_is_kept_alive_by_sends(monkeypatch):
+    monkeypatch.setattr(ws_hub, "WS_HEARTBEAT_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        hub = BroadcastHub()
+        socket = PassiveSocket()
+        connection = hub.register(socket, "teacher:t1")
+        for _ in range(5):
+            await asyncio.sleep(0.03)
+            hub.reap()  # Queues a heartbeat; its successful send counts as liveness
+        alive = hub.connection_count("teacher:t1")
+        await hub.unregister(connection)
+        return alive, socket
+
+    alive, socket = asyncio.run(scenario())
+    assert alive == 1
+    assert socket.close_code is None
+    assert '{"type":"ping"}' in socket.frames
+
+def test_unreachable_dashboard_is_reaped(monkeypatch):
+    monkeypatch.setattr(ws_hub, "WS_HEARTBEAT_TIMEOUT_SECONDS", 0.05)
+
+    async def scenario():
+        hub = BroadcastHub()
+        socket = PassiveSocket(stall=True)
+        hub.register(socket, "teacher:t1")
+        await asyncio.sleep(0)
+        reaped = hub.reap(time.monotonic() + 1)
+        await asyncio.sleep(0.01)
+        return hub, socket, reaped
+
+    hub, socket, reaped = asyncio.run(scenario())
+    assert reaped == 1
+    assert hub.connection_count() == 0
+    assert socket.close_code == ws_hub.CLOSE_HEARTBEAT_TIMEOUT